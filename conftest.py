@@ -1,5 +1,6 @@
 import pytest
 from tests.core.test_sql import conn
+from tests import utils
 
 # this file is used to share fixtures
 
@@ -19,3 +20,11 @@ def qapp():
     app = QApplication.instance()
     app.setStyle(AppStyle())
     yield app
+
+
+@pytest.fixture
+def file_conn(tmp_path):
+    """Connection to the test project stored in a temporary file"""
+    conn = utils.create_file_conn(tmp_path / "test.db")
+    yield conn
+    conn.close()
@@ -19,6 +19,7 @@
 # https://github.com/labsquare/cutevariant/issues
 
 # Standard imports
+import multiprocessing
 import sys
 from pkg_resources import parse_version
 
@@ -250,4 +251,7 @@ def process_arguments(app):
 
 
 if __name__ == "__main__":
+    # Sample reports are created by "spawn" worker processes, which run the
+    # executable again when it is frozen by PyInstaller
+    multiprocessing.freeze_support()
     main()
@@ -4,6 +4,7 @@
 import json
 import os
 import shutil
+import sys
 
 from .bgzf import BgzfBlocks
 
@@ -91,6 +92,53 @@ def bytes_to_readable(size) -> str:
     return "%3.1f%s" % (size, "TB")
 
 
+def deep_getsizeof(obj, seen: set = None) -> int:
+    """Return the size in bytes of obj and of all the objects it contains
+
+    Unlike sys.getsizeof, which only counts the container, the size of the
+    items of lists, tuples, sets, dicts and slots objects is added.
+    An object referenced several times (like the column names shared by the
+    rows of a query) is counted once.
+
+    Args:
+        obj: Any python object
+        seen (set): ids of the objects already counted
+
+    Returns:
+        int: size in bytes
+    """
+    if seen is None:
+        seen = set()
+
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, (str, bytes, int, float)) or obj is None:
+        return size
+
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deep_getsizeof(key, seen) + deep_getsizeof(value, seen)
+
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deep_getsizeof(item, seen)
+
+    else:
+        for cls in type(obj).__mro__:
+            slots = getattr(cls, "__slots__", ())
+            for name in (slots,) if isinstance(slots, str) else slots:
+                if hasattr(obj, name):
+                    size += deep_getsizeof(getattr(obj, name), seen)
+        if hasattr(obj, "__dict__"):
+            size += deep_getsizeof(obj.__dict__, seen)
+
+    return size
+
+
 def snake_to_camel(name: str) -> str:
     """Convert snake_case name to CamelCase name
 
@@ -172,6 +220,44 @@ def recursive_overwrite(src: str, dest: str, ignore=None):
         shutil.copyfile(src, dest)
 
 
+def variant_name_pattern() -> str:
+    """Return the pattern of the variant names, from the settings"""
+    from cutevariant.config import Config
+
+    config = Config("variables") or {}
+    return config.get("variant_name_pattern") or "{chr}:{pos} - {ref}>{alt}"
+
+
+def format_variant_name(
+    variant: dict, pattern: str = None, troncate=False, troncate_len: int = 40
+) -> str:
+    """Return the name of a variant from its data
+
+    Args:
+        variant (dict): Variant fields; the "annotations" list is required if
+            the pattern uses annotation fields (ann.xxx)
+        pattern (str): Variant name pattern; read from the settings if None
+        troncate (bool, optional): If name need to be troncated
+        troncate_len (int, optional): max len of variant name if need to be troncated
+    """
+    name_pattern = pattern or variant_name_pattern()
+    variant = dict(variant)
+
+    with_annotations = re.findall("ann.", name_pattern)
+    if with_annotations and len(variant.get("annotations") or []):
+        for ann in variant["annotations"][0]:
+            variant["annotations___" + str(ann)] = variant["annotations"][0][ann]
+        name_pattern = name_pattern.replace("ann.", "annotations___")
+    variant_name = name_pattern.format(**variant)
+
+    # Troncate variant name
+    if troncate and len(variant_name) > troncate_len:
+        troncate_position = int(troncate_len / 2)
+        variant_name = variant_name[0:troncate_position] + "..." + variant_name[-troncate_position:]
+
+    return variant_name
+
+
 def find_variant_name(conn, variant_id: int, troncate=False, troncate_len: int = 40):
     """Find variant name from annotations and a pattern in settings
 
@@ -181,31 +267,15 @@ def find_variant_name(conn, variant_id: int, troncate=False, troncate_len: int =
         troncate (bool, optional): If name need to be troncated
         troncate_len (int, optional): max len of variant name if need to be troncated  
     """
-    from cutevariant.config import Config
     from cutevariant.core import sql
 
     if not conn:
         return "unknown"
 
-    # Get variant_name_pattern
-    config = Config("variables") or {}
-    variant_name_pattern = config.get("variant_name_pattern") or "{chr}:{pos} - {ref}>{alt}"
-
-    # Get fields
-    if variant_id:
-        with_annotations = re.findall("ann.", variant_name_pattern)
-        variant = sql.get_variant(conn, variant_id, with_annotations=with_annotations)
-        if len(variant["annotations"]) and with_annotations:
-            for ann in variant["annotations"][0]:
-                variant["annotations___" + str(ann)] = variant["annotations"][0][ann]
-            variant_name_pattern = variant_name_pattern.replace("ann.", "annotations___")
-        variant_name = variant_name_pattern.format(**variant)
-    else:
-        variant_name = "unknown"
+    if not variant_id:
+        return "unknown"
 
-    # Troncate variant name
-    if troncate and len(variant_name) > troncate_len:
-        troncate_position = int(troncate_len / 2)
-        variant_name = variant_name[0:troncate_position] + "..." + variant_name[-troncate_position:]
-    
-    return variant_name
+    pattern = variant_name_pattern()
+    with_annotations = re.findall("ann.", pattern)
+    variant = sql.get_variant(conn, variant_id, with_annotations=with_annotations)
+    return format_variant_name(variant, pattern, troncate, troncate_len)
@@ -1,14 +1,16 @@
 # Standard imports
 import argparse
 import os
+import signal
 import sys
 from functools import partial
 
 # Custom imports
 import progressbar
 from columnar import columnar
-from cutevariant.core import sql, vql, command
+from cutevariant.core import sql, vql, command, metrics, report, inheritance
 from cutevariant.core.readerfactory import create_reader
+from cutevariant.core.sql_progress import ProgressHandler, QueryCancelled, QueryTimeout
 from cutevariant.core.querybuilder import *
 from cutevariant import LOGGER
 
@@ -81,6 +83,13 @@ def show(args, conn):
     if args.table == "wordsets":
         display_sql_results((i.values() for i in sql.get_wordsets(conn)), ["id", "word_count"])
 
+    if args.table == "metrics":
+        project_metrics = metrics.get_metrics(conn)
+        display_sql_results(
+            ([key, value] for key, value in metrics.metrics_table(project_metrics).items()),
+            ["metric", "value"],
+        )
+
 
 def remove(args, conn):
     for name in args.names:
@@ -92,6 +101,43 @@ def remove(args, conn):
     return 0
 
 
+def create_reports(args, conn):
+    samples = {sample["name"]: sample["id"] for sample in sql.get_samples(conn)}
+    names = args.samples or list(samples)
+    unknown = [name for name in names if name not in samples]
+    if unknown:
+        print("Unknown sample(s):", ", ".join(unknown))
+        return 1
+
+    reports = report.create_sample_reports(
+        args.db,
+        [samples[name] for name in names],
+        args.template,
+        args.output,
+        threshold=args.threshold,
+        processes=args.processes,
+        progress_callback=print,
+    )
+    for path in reports.values():
+        print(path)
+    return 0
+
+
+def analyse_inheritance(args, conn):
+    selections = inheritance.create_family_selections(
+        conn, args.families or None, args.modes, progress_callback=print
+    )
+    display_sql_results(
+        (
+            [family_id, mode, f"{mode}_{family_id}" if selection_id else None]
+            for family_id, modes in selections.items()
+            for mode, selection_id in modes.items()
+        ),
+        ["family", "mode", "selection"],
+    )
+    return 0
+
+
 def select(args, conn):
     query = "".join(args.vql)
     vql_command = None
@@ -115,7 +161,7 @@ def select(args, conn):
             filters=cmd["filters"],
         )
 
-    try:
+    def execute(conn):
         # Is it redundant with check_vql ?
         # No because we also execute SQL statement here
         if vql_command:
@@ -124,10 +170,31 @@ def select(args, conn):
             ret = command.create_command_from_obj(conn, cmd)()
         if not isinstance(ret, dict):
             # For drop_cmd, import_cmd,
+            # Rows are fetched here, under the time budget
             ret = list(ret)
+        return ret
+
+    # Read only commands borrow a warm connection from the pool
+    pool = None
+    if cmd["cmd"] in ("select_cmd", "count_cmd") and not args.to_selection:
+        pool = sql.get_connection_pool(args.db)
+    query_conn = pool.acquire() if pool else conn
+
+    # Ctrl-C stops the query at the next call of the progress handler
+    handler = ProgressHandler(budget=args.timeout)
+    previous_sigint = signal.signal(signal.SIGINT, lambda signum, frame: handler.cancel())
+    try:
+        ret = handler.run(query_conn, execute)
+    except (QueryTimeout, QueryCancelled) as e:
+        print(e)
+        return 1
     except (sqlite3.DatabaseError, vql.VQLSyntaxError) as e:
         LOGGER.exception(e)
         return 1
+    finally:
+        signal.signal(signal.SIGINT, previous_sigint)
+        if pool:
+            pool.release(query_conn)
 
     LOGGER.debug("SQL result: %s", ret)
     LOGGER.debug("VQL command: %s", cmd["cmd"])
@@ -202,7 +269,7 @@ def main():
     )
     show_parser.add_argument(
         "table",
-        choices=["fields", "selections", "samples", "wordsets"],
+        choices=["fields", "selections", "samples", "wordsets", "metrics"],
         help="Possible names of tables.",
     )
     show_parser.set_defaults(func=show)
@@ -214,6 +281,44 @@ def main():
     remove_parser.add_argument("names", nargs="+", help="Name(s) of selection(s).")
     remove_parser.set_defaults(func=remove)
 
+    # Report parser ############################################################
+    report_parser = sub_parser.add_parser(
+        "report", help="Create the HTML reports of samples", parents=[parent_parser]
+    )
+    report_parser.add_argument(
+        "samples", nargs="*", help="Name(s) of sample(s). By default, all the samples."
+    )
+    report_parser.add_argument("-t", "--template", help="HTML template path", required=True)
+    report_parser.add_argument("-o", "--output", help="Output directory", required=True)
+    report_parser.add_argument(
+        "--threshold",
+        help="Minimal genotype classification of the reported variants.",
+        type=int,
+        default=1,
+    )
+    report_parser.add_argument(
+        "-p",
+        "--processes",
+        help="Number of reports created in parallel (default: number of CPUs).",
+        type=int,
+        default=None,
+    )
+    report_parser.set_defaults(func=create_reports)
+
+    # Inheritance parser #######################################################
+    inheritance_parser = sub_parser.add_parser(
+        "inheritance",
+        help="Create selections of the variants matching inheritance modes in families",
+        parents=[parent_parser],
+    )
+    inheritance_parser.add_argument(
+        "families", nargs="*", help="Family id(s) of the pedigree. By default, all the families."
+    )
+    inheritance_parser.add_argument(
+        "-m", "--modes", nargs="+", choices=list(inheritance.MODES), help="Inheritance modes."
+    )
+    inheritance_parser.set_defaults(func=analyse_inheritance)
+
     # VQL parser ###############################################################
     select_parser = sub_parser.add_parser(
         "exec",
@@ -254,6 +359,13 @@ def main():
     select_parser.add_argument(
         "-s", "--to-selection", help="Save SELECT query into a selection name."
     )
+    select_parser.add_argument(
+        "-t",
+        "--timeout",
+        help="Stop the query after the given number of seconds.",
+        type=float,
+        default=None,
+    )
     select_parser.set_defaults(func=select)
 
     # Set parser ###############################################################
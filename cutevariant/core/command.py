@@ -21,17 +21,81 @@
 import sqlite3
 import os
 import functools
+from collections.abc import Mapping
 
 
 # Custom imports
-from cutevariant.core.querybuilder import build_sql_query
-from cutevariant.core import sql, vql
+from cutevariant.core.querybuilder import build_sql_query, build_sql_query_with_params
+from cutevariant.core import sql, vql, parallel
 
 from cutevariant.core.reader import BedReader
 
 from cutevariant import LOGGER
 
 
+class Row(Mapping):
+    """Row of a query, stored as a tuple of values
+
+    All the rows of a query share the same column index ({name: position}),
+    so a row costs a tuple instead of a dict with its own keys.
+    A row behaves like a dict: `row["pos"]`, `row.get("ann.gene")`, `dict(row)`.
+
+    update() and `row[key] = value` replace the values of the row; a row
+    which receives a new column gets its own column index.
+    """
+
+    __slots__ = ("_columns", "_values")
+
+    def __init__(self, columns: dict, values: tuple):
+        self._columns = columns
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._columns[key]]
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self):
+        return len(self._columns)
+
+    def __contains__(self, key):
+        return key in self._columns
+
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+    def __or__(self, other):
+        return dict(self) | dict(other)
+
+    def __ror__(self, other):
+        return dict(other) | dict(self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def __reduce__(self):
+        return (Row, (self._columns, self._values))
+
+    def update(self, other: dict = (), **kwargs):
+        """Replace the values of the row with the values of other"""
+        other = dict(other, **kwargs)
+        new_columns = [key for key in other if key not in self._columns]
+        if new_columns:
+            columns = dict(self._columns)
+            for key in new_columns:
+                columns[key] = len(columns)
+            self._columns = columns
+
+        values = list(self._values) + [None] * len(new_columns)
+        for key, value in other.items():
+            values[self._columns[key]] = value
+        self._values = tuple(values)
+
+    def copy(self) -> dict:
+        return dict(self)
+
+
 def select_cmd(
     conn: sqlite3.Connection,
     fields={"variants": ["chr", "pos", "ref", "alt"]},
@@ -43,6 +107,7 @@ def select_cmd(
     having={},  # {"op":">", "value": 3  }
     limit=50,
     offset=0,
+    compact=False,
     **kwargs,
 ):
     """Select query Command
@@ -61,11 +126,13 @@ def select_cmd(
         order_desc (bool, optional): Descending or Ascending Order
         limit (int, optional): record count
         offset (int, optional): record count per page
+        compact (bool, optional): If True, yield :class:`Row` objects sharing
+            the same column index instead of dicts
 
     Yields:
         variants (dict)
     """
-    query = build_sql_query(
+    query, params = build_sql_query_with_params(
         conn,
         fields=fields,
         source=source,
@@ -78,14 +145,17 @@ def select_cmd(
         having=having,
         **kwargs,
     )
-    LOGGER.debug("command:select_cmd:: %s", query)
-    for i in conn.execute(query):
-        # THIS IS INSANE... SQLITE DOESNT RETURN ALIAS NAME WITH SQUARE BRACKET....
-        # I HAVE TO replace [] by () and go back after...
-        # TODO : Change VQL Syntax from [] to () would be a good alternative
-        # @See QUERYBUILDER
-        # See : https://stackoverflow.com/questions/41538952/issue-cursor-description-never-returns-square-bracket-in-column-name-python-2-7-sqlite3-alias
-        yield {k.replace("(", "[").replace(")", "]"): v for k, v in dict(i).items()}
+    LOGGER.debug("command:select_cmd:: %s %s", query, params)
+    cursor = conn.execute(query, params)
+    names = sql.column_names(cursor)
+
+    if compact:
+        columns = {name: i for i, name in enumerate(names)}
+        for values in cursor:
+            yield Row(columns, tuple(values))
+    else:
+        for values in cursor:
+            yield dict(zip(names, values))
 
 
 def count_cmd(
@@ -118,7 +188,11 @@ def count_cmd(
     # This leads to a fault in the pagination hiding the latest variants if
     # more than 50 must be displayed.
 
-    variants_fields = set(field["name"] for field in sql.get_field_by_category(conn, "variants"))
+    variants_fields = sql.cached_lookup(
+        conn,
+        "variants_fields",
+        lambda c: set(field["name"] for field in sql.get_field_by_category(c, "variants")),
+    )
 
     if set(fields).issubset(variants_fields) and not filters and not group_by:
         # All fields are in variants table
@@ -126,30 +200,22 @@ def count_cmd(
         LOGGER.debug("command:count_cmd:: cached from selections table")
         return {
             "count": conn.execute(
-                f"SELECT count FROM selections WHERE name = '{source}'"
+                "SELECT count FROM selections WHERE name = ?", (source,)
             ).fetchone()[0]
         }
 
-    query = build_sql_query(
+    # Large projects are counted on several threads, by ranges of variants
+    count = parallel.count(
         conn,
         fields=fields,
         source=source,
         filters=filters,
-        limit=None,
-        offset=None,
-        order_by=None,
         group_by=group_by,
         having=having,
         **kwargs,
     )
-
-    # THIS IS INSANE... SQLITE DOESNT RETURN ALIAS NAME WITH SQUARE BRACKET....
-    # I HAVE TO replace [] by () and go back after...
-    # TODO : Change VQL Syntax from [] to () would be a good alternative
-    # @See QUERYBUILDER
-    # See : https://stackoverflow.com/questions/41538952/issue-cursor-description-never-returns-square-bracket-in-column-name-python-2-7-sqlite3-alias
-    LOGGER.debug("command:count_cmd:: %s", query)
-    return {"count": sql.count_query(conn, query)}
+    LOGGER.debug("command:count_cmd:: %s variants", count)
+    return {"count": count}
 
 
 def drop_cmd(conn: sqlite3.Connection, feature: str, name: str, **kwargs):
@@ -238,44 +304,68 @@ def create_cmd(
     return dict() if selection_id is None else {"id": selection_id}
 
 
-def set_cmd(conn: sqlite3.Connection, target: str, first: str, second: str, operator, **kwargs):
-    """Perform set operation like intersection, union and difference between two table selection
+def set_cmd(
+    conn: sqlite3.Connection,
+    target: str,
+    first: str = None,
+    second: str = None,
+    operator: str = None,
+    expression=None,
+    **kwargs,
+):
+    """Perform set operations like intersection, union and difference between selections
 
     This following VQL command:
         `CREATE boby = raymond & charles`
     will execute :
         `set_cmd(conn, "boby", "raymond", "charles", "&")`
 
+    And this one:
+        `CREATE boby = (raymond | charles) - variants`
+    will execute :
+        `set_cmd(conn, "boby", expression=("-", ("|", "raymond", "charles"), "variants"))`
+
+    The expression is evaluated on the ids of the variants of the selections.
+    See :meth:`cutevariant.core.sql.evaluate_set_expression`.
+
     Args:
         conn (sqlite3.Connection): sqlite3 connection
         target (str): table selection target
         first (str): first selection in operation
         second (str): second selection in operation
-        operator (str): + (union), - (difference), & (intersection) Set operators
+        operator (str): | (union), - (difference), & (intersection) Set operators
+        expression (str/tuple): Set expression of any arity, used instead of
+            first, operator and second
 
     Returns:
         dict: {"id": selection_id} if lines have been inserted,
             or empty dict in case of error
 
+    Raises:
+        vql.VQLSyntaxError: If a selection doesn't exist
+
     Examples:
         {"id": 2}: 2 lines inserted
     """
-    if target is None or first is None or second is None or operator is None:
-        return {}
+    if expression is None:
+        if first is None or second is None or operator is None:
+            return {}
+        expression = (operator, first, second)
 
-    query_first = build_sql_query(conn, ["id"], first, limit=None)
-    query_second = build_sql_query(conn, ["id"], second, limit=None)
+    if target is None:
+        return {}
 
-    func_query = {
-        "|": sql.union_variants,
-        "-": sql.subtract_variants,
-        "&": sql.intersect_variants,
-    }
+    selections = {selection["name"] for selection in sql.get_selections(conn)}
+    for name in sql.get_set_expression_operands(expression) - selections:
+        if name != sql.DEFAULT_SELECTION_NAME:
+            raise vql.VQLSyntaxError(f"{name} doesn't exists")
 
-    sql_query = func_query[operator](query_first, query_second)
-    LOGGER.debug("command:set_cmd:: %s", sql_query)
+    ids = sql.evaluate_set_expression(conn, expression)
+    LOGGER.debug("command:set_cmd:: %s: %s variants", expression, len(ids))
 
-    selection_id = sql.insert_selection_from_sql(conn, sql_query, target, from_selection=False)
+    selection_id = sql.insert_selection_from_ids(
+        conn, ids, target, query=sql.set_expression_to_vql(expression)
+    )
     return dict() if selection_id is None else {"id": selection_id}
 
 
@@ -0,0 +1,219 @@
+"""Gene model store used by the gene viewer
+
+Gene models (transcripts with their exons and coding sequence) are imported
+from a UCSC refGene file into a standalone sqlite database:
+
+- The file is streamed line by line into the database; it is never loaded in
+  memory.
+- Genes are indexed by name and by location (chrom, tx_start, tx_end).
+- Exon starts and ends are stored as packed arrays of little-endian unsigned
+  32 bits integers, decoded without any string parsing.
+
+Databases created by older versions (exons stored as comma separated strings,
+no chrom column) can still be read.
+
+Examples:
+
+    from cutevariant.core import gene_store
+    gene_store.import_refgene("refGene.txt.gz", "refGene.db")
+
+    conn = gene_store.get_gene_connection("refGene.db")
+    gene_store.get_transcript_names(conn, "CFTR")
+    # ["NM_000492"]
+    gene_store.get_transcript(conn, "CFTR", "NM_000492")
+    # {"chrom": "chr7", "tx_start": 117120016, ..., "exon_starts": [117120016, ...]}
+"""
+# Standard imports
+import gzip
+import os
+import sqlite3
+import typing
+from typing import Callable
+
+import numpy as np
+
+# Type of the packed exon coordinates
+EXON_DTYPE = np.dtype("<u4")
+
+# Columns of a UCSC refGene file
+REFGENE_COLUMNS = {
+    "transcript_name": 1,
+    "chrom": 2,
+    "strand": 3,
+    "tx_start": 4,
+    "tx_end": 5,
+    "cds_start": 6,
+    "cds_end": 7,
+    "exon_starts": 9,
+    "exon_ends": 10,
+    "gene": 12,
+}
+
+# Progress is reported every PROGRESS_STEP transcripts
+PROGRESS_STEP = 10000
+
+
+def pack_positions(positions: typing.Iterable[int]) -> bytes:
+    """Return the positions packed as an array of unsigned 32 bits integers
+
+    Examples:
+        >>> unpack_positions(pack_positions([10, 20]))
+        [10, 20]
+    """
+    return np.fromiter(positions, dtype=EXON_DTYPE).tobytes()
+
+
+def unpack_positions(data) -> list:
+    """Return the list of positions stored by :meth:`pack_positions`
+
+    Comma separated strings of older databases and lists are also accepted.
+    """
+    if not data:
+        return []
+    if isinstance(data, (list, tuple)):
+        return list(data)
+    if isinstance(data, str):
+        return [int(i) for i in data.split(",") if i.isnumeric()]
+    return np.frombuffer(data, dtype=EXON_DTYPE).tolist()
+
+
+def create_table_genes(conn: sqlite3.Connection):
+    """Create the genes table, without its indexes"""
+    conn.execute(
+        """CREATE TABLE genes(
+        id INTEGER PRIMARY KEY,
+        transcript_name TEXT,
+        chrom TEXT,
+        strand TEXT,
+        tx_start INTEGER,
+        tx_end INTEGER,
+        cds_start INTEGER,
+        cds_end INTEGER,
+        exon_count INTEGER,
+        exon_starts BLOB,
+        exon_ends BLOB,
+        gene TEXT
+        )"""
+    )
+
+
+def create_genes_indexes(conn: sqlite3.Connection):
+    """Create the indexes on gene names and locations
+
+    .. warning:: This function must be called after batch insertions.
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_genes_gene ON genes (gene, transcript_name)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_genes_location ON genes (chrom, tx_start, tx_end)"
+    )
+
+
+def read_refgene(ref_filename: str) -> typing.Iterator[tuple]:
+    """Yield the rows of the genes table from a refGene file (.txt or .txt.gz)
+
+    Yields:
+        tuple: (transcript_name, chrom, strand, tx_start, tx_end, cds_start,
+        cds_end, exon_count, exon_starts, exon_ends, gene)
+    """
+    open_file = gzip.open if ref_filename.endswith(".gz") else open
+    with open_file(ref_filename, "rt", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip() or line.startswith("#"):
+                continue
+
+            line = line.rstrip("\n").split("\t")
+            exon_starts = [int(i) for i in line[REFGENE_COLUMNS["exon_starts"]].split(",") if i]
+            exon_ends = [int(i) for i in line[REFGENE_COLUMNS["exon_ends"]].split(",") if i]
+
+            yield (
+                line[REFGENE_COLUMNS["transcript_name"]],
+                line[REFGENE_COLUMNS["chrom"]],
+                line[REFGENE_COLUMNS["strand"]],
+                int(line[REFGENE_COLUMNS["tx_start"]]),
+                int(line[REFGENE_COLUMNS["tx_end"]]),
+                int(line[REFGENE_COLUMNS["cds_start"]]),
+                int(line[REFGENE_COLUMNS["cds_end"]]),
+                len(exon_starts),
+                pack_positions(exon_starts),
+                pack_positions(exon_ends),
+                line[REFGENE_COLUMNS["gene"]],
+            )
+
+
+def import_refgene(ref_filename: str, db_filename: str, progress_callback: Callable = None):
+    """Create a gene model database from a UCSC refGene file
+
+    Args:
+        ref_filename (str): refGene file (.txt or .txt.gz)
+        db_filename (str): Path of the database to create
+        progress_callback (Callable): Called with a message every PROGRESS_STEP
+            transcripts
+
+    Raises:
+        FileNotFoundError: If ref_filename is not a path to an existing file
+    """
+    if not os.path.isfile(ref_filename):
+        raise FileNotFoundError(f"{ref_filename} : No such file or directory !")
+
+    def rows():
+        for index, row in enumerate(read_refgene(ref_filename), 1):
+            if progress_callback and index % PROGRESS_STEP == 0:
+                progress_callback(f"{index} transcripts imported")
+            yield row
+
+    conn = sqlite3.connect(db_filename)
+    try:
+        create_table_genes(conn)
+        # executemany consumes the generator: rows are never all in memory
+        conn.executemany(
+            """INSERT INTO genes (transcript_name, chrom, strand, tx_start, tx_end, cds_start,
+            cds_end, exon_count, exon_starts, exon_ends, gene) VALUES (?,?,?,?,?,?,?,?,?,?,?)""",
+            rows(),
+        )
+        create_genes_indexes(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def get_gene_connection(db_filename: str) -> sqlite3.Connection:
+    """Open a gene model database; rows are returned as sqlite3.Row"""
+    conn = sqlite3.connect(db_filename)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def get_gene_names(conn: sqlite3.Connection) -> list:
+    """Return the sorted names of the genes"""
+    query = "SELECT DISTINCT gene FROM genes WHERE gene IS NOT NULL ORDER BY gene"
+    return [row[0] for row in conn.execute(query)]
+
+
+def get_transcript_names(conn: sqlite3.Connection, gene: str) -> list:
+    """Return the names of the transcripts of the gene"""
+    return [
+        row[0] for row in conn.execute("SELECT transcript_name FROM genes WHERE gene = ?", (gene,))
+    ]
+
+
+def get_transcript(conn: sqlite3.Connection, gene: str, transcript: str) -> dict:
+    """Return the model of a transcript of the gene, or None if it is unknown
+
+    Returns:
+        dict: transcript_name, chrom, tx_start, tx_end, cds_start, cds_end,
+        exon_starts, exon_ends (lists of int) and gene. chrom is None for the
+        databases created by older versions.
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    row = cursor.execute(
+        "SELECT * FROM genes WHERE gene = ? AND transcript_name = ?", (gene, transcript)
+    ).fetchone()
+    if row is None:
+        return None
+
+    data = dict(row)
+    data.setdefault("chrom", None)
+    data["exon_starts"] = unpack_positions(data["exon_starts"])
+    data["exon_ends"] = unpack_positions(data["exon_ends"])
+    return data
@@ -0,0 +1,163 @@
+"""Genotypes of a page of variants, read in one query
+
+The genotypes plugin shows the genotypes of the current variant for the
+selected samples. Instead of one query per clicked variant (and one per
+painted header section), the genotypes of all the variants of the current page
+are read at once into a :class:`GenotypeMatrix`; clicking another variant of
+the page reads the matrix.
+
+A matrix is only valid while the database is unchanged: check it with
+:meth:`GenotypeMatrix.is_valid` before use.
+
+Examples:
+
+    matrix = GenotypeMatrix([1, 2, 3], ["sacha", "boby"], ["gt", "dp"])
+    matrix.load(conn)
+    matrix.stamp = sql.database_stamp(conn)
+    matrix.gt[matrix.variant_index[2]]
+    # array([1, -1], dtype=int8)
+    matrix.genotypes(2)
+    # [{"sample_id": 1, "variant_id": 2, "name": "sacha", "gt": 1, "dp": 30}, ...]
+"""
+# Standard imports
+import json
+import sqlite3
+from typing import List
+
+import numpy as np
+
+# Custom imports
+from cutevariant.core import sql
+
+# Fields always read, used to paint the genotype headers
+REQUIRED_FIELDS = ("gt", "classification")
+
+# gt value of the missing genotypes in the gt matrix
+MISSING_GT = -1
+
+
+class GenotypeMatrix:
+    """Genotypes of a set of variants for a set of samples
+
+    Attributes:
+        variant_ids (list): Ids of the variants, one per row
+        samples (list): Names of the samples, one per column; unknown
+            samples are dropped by :meth:`load`. All the samples of the
+            project are read if empty, like :meth:`sql.get_genotypes` does.
+        fields (list): Fields of the genotypes table
+        gt (np.ndarray): (variants, samples) int8 matrix of gt;
+            MISSING_GT for the missing genotypes
+        values (dict): {field: (variants, samples) object matrix}
+        exists (np.ndarray): (variants, samples) bool matrix, True if the
+            genotype is in the database
+        stamp (tuple): :meth:`cutevariant.core.sql.database_stamp` of the
+            connection when the matrix was read, or None
+    """
+
+    def __init__(self, variant_ids: List[int], samples: List[str], fields: List[str] = None):
+        self.variant_ids = list(dict.fromkeys(variant_ids))
+        self.samples = list(dict.fromkeys(samples))
+        self._requested_samples = set(self.samples)
+        self._all_samples = not self.samples
+        self.fields = list(dict.fromkeys(list(fields or []) + list(REQUIRED_FIELDS)))
+        self.variant_index = {variant_id: row for row, variant_id in enumerate(self.variant_ids)}
+        self.sample_ids = []
+        self.gt = None
+        self.values = {}
+        self.exists = None
+        self.stamp = None
+
+    def load(self, conn: sqlite3.Connection):
+        """Read the genotypes of all the variants and samples in one query"""
+        rows = conn.execute("SELECT id, name FROM samples ORDER BY id")
+        samples_ids = {name: sample_id for sample_id, name in rows}
+        # Samples are sorted like sql.get_genotypes() does
+        self.samples = [
+            name for name in samples_ids if self._all_samples or name in self._requested_samples
+        ]
+        self.sample_ids = [samples_ids[name] for name in self.samples]
+        sample_index = {sample_id: col for col, sample_id in enumerate(self.sample_ids)}
+
+        shape = (len(self.variant_ids), len(self.samples))
+        self.gt = np.full(shape, MISSING_GT, dtype=np.int8)
+        self.values = {field: np.full(shape, None, dtype=object) for field in self.fields}
+        self.exists = np.zeros(shape, dtype=bool)
+
+        sql_fields = ",".join(f"`{field}`" for field in self.fields)
+        query = f"""SELECT variant_id, sample_id, {sql_fields} FROM genotypes
+        WHERE variant_id IN (SELECT value FROM json_each(?))
+        AND sample_id IN (SELECT value FROM json_each(?))"""
+        cursor = conn.execute(query, (json.dumps(self.variant_ids), json.dumps(self.sample_ids)))
+
+        gt_col = self.fields.index("gt")
+        for variant_id, sample_id, *values in cursor:
+            position = (self.variant_index[variant_id], sample_index[sample_id])
+            self.exists[position] = True
+            for field, value in zip(self.fields, values):
+                self.values[field][position] = value
+            if values[gt_col] is not None:
+                self.gt[position] = values[gt_col]
+
+        return self
+
+    def is_valid(self, conn: sqlite3.Connection) -> bool:
+        """Return True if the database is unchanged since the matrix was read"""
+        return self.stamp is not None and self.stamp == sql.database_stamp(conn)
+
+    def invalidate(self):
+        """Mark the matrix as outdated"""
+        self.stamp = None
+
+    def covers(self, variant_id: int, samples: List[str], fields: List[str]) -> bool:
+        """Return True if the matrix contains the genotypes of variant_id for
+        these samples and fields
+
+        The matrix may contain more samples and fields: read it with
+        ``genotypes(variant_id, samples, fields)``. Empty samples mean all
+        the samples of the project.
+        """
+        if self._all_samples:
+            samples_covered = True
+        else:
+            samples_covered = bool(samples) and set(samples) <= self._requested_samples
+        return (
+            variant_id in self.variant_index
+            and samples_covered
+            and set(fields or []) <= set(self.fields)
+        )
+
+    def genotypes(
+        self, variant_id: int, samples: List[str] = None, fields: List[str] = None
+    ) -> List[dict]:
+        """Return the genotypes of the variant, like :meth:`sql.get_genotypes`
+
+        Missing genotypes have None values, including sample_id and variant_id.
+
+        Args:
+            variant_id (int): A variant of the matrix
+            samples (list): Samples to return; all the samples of the matrix
+                if None or empty
+            fields (list): Fields to return with the REQUIRED_FIELDS; all the
+                fields of the matrix if None
+        """
+        row = self.variant_index[variant_id]
+        samples = set(samples or self.samples)
+        fields = (
+            self.fields
+            if fields is None
+            else [field for field in self.fields if field in set(fields) | set(REQUIRED_FIELDS)]
+        )
+        genotypes = []
+        for col, name in enumerate(self.samples):
+            if name not in samples:
+                continue
+            exists = self.exists[row, col]
+            genotype = {
+                "sample_id": self.sample_ids[col] if exists else None,
+                "variant_id": variant_id if exists else None,
+                "name": name,
+            }
+            for field in fields:
+                genotype[field] = self.values[field][row, col]
+            genotypes.append(genotype)
+        return genotypes
@@ -0,0 +1,374 @@
+"""Inheritance modes of the variants of a trio or a family
+
+Families are described by the pedigree columns of the samples table
+(family_id, father_id, mother_id, sex and phenotype, see the PED format). The
+genotypes of all the members of a family are read in one query into a NumPy
+matrix; the modes are then computed for all the variants at once, and compound
+heterozygous candidates are grouped by gene with one pass over the annotations.
+A trio is analysed the same way, as a family of three members.
+
+The results are stored as selections (see :meth:`create_trio_selection` and
+:meth:`create_family_selections`), then used as the source of the variant
+view; no filter listing the ids of the variants is built.
+
+Examples:
+
+    from cutevariant.core import inheritance
+    inheritance.create_trio_selection(conn, "de_novo", 1, 2, 3)
+    # 4, the id of the selection "de_novo_<child name>"
+
+    inheritance.analyse_families(conn)
+    # {"fam1": {"de_novo": array([12, 50]), "autosomal_recessive": array([]), ...}}
+    inheritance.create_family_selections(conn, ["fam1"])
+    # {"fam1": {"de_novo": 5, "autosomal_recessive": None, ...}}
+"""
+# Standard imports
+import sqlite3
+from typing import Callable, Dict, List
+
+import numpy as np
+
+# Custom imports
+from cutevariant.core import sql
+
+# Sex and phenotype codes of the PED format
+MALE = 1
+FEMALE = 2
+UNAFFECTED = 1
+AFFECTED = 2
+
+# gt of the missing genotypes in the family matrices
+MISSING_GT = -1
+
+# Inheritance modes with their label
+MODES = {
+    "de_novo": "De novo mutation",
+    "autosomal_recessive": "Autosomal Recessive",
+    "autosomal_dominant": "Autosomal Dominant",
+    "x_linked_recessive": "X-linked Recessive",
+    "compound_heterozygous": "Compound Heterozygous",
+}
+
+
+def get_families(conn: sqlite3.Connection) -> Dict[str, List[dict]]:
+    """Return the members of each family of the samples table
+
+    Returns:
+        dict: {family_id: [samples sorted by id]}; samples have the id, name,
+        father_id, mother_id, sex and phenotype keys
+    """
+    families = {}
+    for row in conn.execute(
+        """SELECT id, name, family_id, father_id, mother_id, sex, phenotype
+        FROM samples ORDER BY id"""
+    ):
+        sample = dict(row)
+        families.setdefault(sample.pop("family_id"), []).append(sample)
+    return families
+
+
+def get_trios(members: List[dict]) -> List[tuple]:
+    """Return the (child, father, mother) trios of the affected children of a family
+
+    Only children with both parents among the members are returned.
+    """
+    ids = {sample["id"]: sample for sample in members}
+    return [
+        (sample, ids[sample["father_id"]], ids[sample["mother_id"]])
+        for sample in members
+        if sample["phenotype"] == AFFECTED
+        and sample["father_id"] in ids
+        and sample["mother_id"] in ids
+    ]
+
+
+def load_family_genotypes(conn: sqlite3.Connection, sample_ids: List[int]) -> tuple:
+    """Read the genotypes of the samples in one query
+
+    Returns:
+        tuple: (variant_ids, gt); variant_ids is the sorted int64 array of the
+        variants with a genotype for one of the samples at least, gt the
+        (variants, samples) int8 matrix of their gt, MISSING_GT if unknown
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    placeholders = ",".join("?" * len(sample_ids))
+    rows = cursor.execute(
+        f"""SELECT variant_id, sample_id, COALESCE(gt, {MISSING_GT}) FROM genotypes
+        WHERE sample_id IN ({placeholders})""",
+        list(sample_ids),
+    ).fetchall()
+    rows = np.array(rows, dtype=np.int64).reshape(-1, 3)
+
+    variant_ids, rows_index = np.unique(rows[:, 0], return_inverse=True)
+    order = np.argsort(sample_ids)
+    sample_index = order[np.searchsorted(sample_ids, rows[:, 1], sorter=order)]
+
+    gt = np.full((len(variant_ids), len(sample_ids)), MISSING_GT, dtype=np.int8)
+    gt[rows_index, sample_index] = rows[:, 2]
+    return variant_ids, gt
+
+
+class VariantGenes:
+    """X chromosome variants and genes of the annotations, read once for all families
+
+    Attributes:
+        x_ids (np.ndarray): Sorted ids of the variants of the X chromosome
+        variant_ids (np.ndarray): Variant id of each (variant, gene) pair
+        gene_index (np.ndarray): Gene index of each pair in genes
+        genes (np.ndarray): Names of the genes
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        x_ids = cursor.execute("SELECT id FROM variants WHERE chr IN ('X', 'chrX') ORDER BY id")
+        self.x_ids = np.array([row[0] for row in x_ids], dtype=np.int64)
+
+        pairs = cursor.execute(
+            "SELECT DISTINCT variant_id, gene FROM annotations WHERE gene IS NOT NULL"
+        ).fetchall()
+        self.variant_ids = np.array([row[0] for row in pairs], dtype=np.int64)
+        self.genes, self.gene_index = np.unique(
+            np.array([row[1] for row in pairs], dtype=object).astype(str), return_inverse=True
+        )
+
+
+def family_candidates(
+    variant_ids: np.ndarray,
+    gt: np.ndarray,
+    members: List[dict],
+    variant_genes: VariantGenes,
+    modes: List[str] = None,
+) -> Dict[str, np.ndarray]:
+    """Return the variants of a family matching each inheritance mode
+
+    The conditions must hold for every affected child with both parents in
+    the family; de novo variants only need one child.
+
+    - de novo: both parents are homozygous reference, the child heterozygous
+    - autosomal recessive: both parents are heterozygous, the child homozygous;
+      unaffected members are not homozygous
+    - autosomal dominant: the child is heterozygous and inherits the variant
+      from one parent only; affected members carry it, unaffected ones don't
+    - X-linked recessive: on the X chromosome, the mother is heterozygous, the
+      father homozygous reference; affected sons carry the variant, affected
+      daughters are homozygous and unaffected sons don't carry it
+    - compound heterozygous: heterozygous variants of the child inherited from
+      one parent only, in genes with such variants from both parents
+
+    Args:
+        variant_ids (np.ndarray): Sorted ids of the variants, see :meth:`load_family_genotypes`
+        gt (np.ndarray): (variants, members) gt matrix
+        members (list[dict]): Samples of the family, one per column of gt
+        variant_genes (VariantGenes): Annotations of the project
+        modes (list[str]): Modes to compute; all the MODES by default
+
+    Returns:
+        dict: {mode: sorted array of variant ids}; empty arrays if the family
+        has no affected child with both parents
+    """
+    modes = list(modes or MODES)
+    columns = {sample["id"]: column for column, sample in enumerate(members)}
+    trios = get_trios(members)
+    if not trios:
+        return {mode: np.array([], dtype=np.int64) for mode in modes}
+
+    def column(sample):
+        return gt[:, columns[sample["id"]]]
+
+    def members_gt(phenotype, sex=None):
+        """gt columns of the members with this phenotype (and sex)"""
+        return [
+            column(sample)
+            for sample in members
+            if sample["phenotype"] == phenotype and (sex is None or sample["sex"] == sex)
+        ]
+
+    all_variants = np.ones(len(variant_ids), dtype=bool)
+    masks = {}
+
+    if "de_novo" in modes:
+        mask = np.zeros(len(variant_ids), dtype=bool)
+        for child, father, mother in trios:
+            mask |= (column(father) == 0) & (column(mother) == 0) & (column(child) == 1)
+        masks["de_novo"] = mask
+
+    if "autosomal_recessive" in modes:
+        mask = all_variants.copy()
+        for child, father, mother in trios:
+            mask &= (column(father) == 1) & (column(mother) == 1) & (column(child) == 2)
+        for sample_gt in members_gt(UNAFFECTED):
+            mask &= sample_gt != 2
+        masks["autosomal_recessive"] = mask
+
+    # Heterozygous variants of each child, inherited from one parent only
+    from_father = {}
+    from_mother = {}
+    for child, father, mother in trios:
+        child_het = column(child) == 1
+        from_father[child["id"]] = child_het & (column(father) == 1) & (column(mother) == 0)
+        from_mother[child["id"]] = child_het & (column(father) == 0) & (column(mother) == 1)
+
+    if "autosomal_dominant" in modes:
+        mask = all_variants.copy()
+        for child, _, _ in trios:
+            mask &= from_father[child["id"]] | from_mother[child["id"]]
+        for sample_gt in members_gt(AFFECTED):
+            mask &= sample_gt >= 1
+        for sample_gt in members_gt(UNAFFECTED):
+            mask &= sample_gt == 0
+        masks["autosomal_dominant"] = mask
+
+    if "x_linked_recessive" in modes:
+        mask = np.isin(variant_ids, variant_genes.x_ids)
+        for child, father, mother in trios:
+            affected = column(child) == 2 if child["sex"] == FEMALE else column(child) > 0
+            mask &= (column(father) == 0) & (column(mother) == 1) & affected
+        for sample_gt in members_gt(UNAFFECTED, MALE):
+            mask &= sample_gt == 0
+        masks["x_linked_recessive"] = mask
+
+    if "compound_heterozygous" in modes:
+        # (variant, gene) pairs of the family variants
+        positions = np.searchsorted(variant_ids, variant_genes.variant_ids)
+        in_family = positions < len(variant_ids)
+        in_family[in_family] = (
+            variant_ids[positions[in_family]] == variant_genes.variant_ids[in_family]
+        )
+        rows = positions[in_family]
+        genes = variant_genes.gene_index[in_family]
+
+        mask = all_variants.copy()
+        for child, _, _ in trios:
+            paternal = from_father[child["id"]][rows]
+            maternal = from_mother[child["id"]][rows]
+            # Genes with variants inherited from both parents, in one pass
+            gene_count = len(variant_genes.genes)
+            both = (np.bincount(genes[paternal], minlength=gene_count) > 0) & (
+                np.bincount(genes[maternal], minlength=gene_count) > 0
+            )
+            child_mask = np.zeros(len(variant_ids), dtype=bool)
+            child_mask[rows[(paternal | maternal) & both[genes]]] = True
+            mask &= child_mask
+        masks["compound_heterozygous"] = mask
+
+    return {mode: variant_ids[masks[mode]] for mode in modes}
+
+
+def analyse_families(
+    conn: sqlite3.Connection,
+    family_ids: List[str] = None,
+    modes: List[str] = None,
+    progress_callback: Callable = None,
+) -> Dict[str, Dict[str, np.ndarray]]:
+    """Return the variants matching the inheritance modes in each family
+
+    Args:
+        conn (sqlite3.Connection): Sqlite3 connection
+        family_ids (list[str]): Families to analyse; all of them by default
+        modes (list[str]): Modes to compute; all the MODES by default
+        progress_callback (Callable): Called with a message after each family
+
+    Returns:
+        dict: {family_id: {mode: sorted array of variant ids}}, see
+        :meth:`family_candidates`
+    """
+    families = get_families(conn)
+    family_ids = list(families) if family_ids is None else family_ids
+    variant_genes = VariantGenes(conn)
+
+    results = {}
+    for index, family_id in enumerate(family_ids, 1):
+        members = families.get(family_id, [])
+        variant_ids, gt = load_family_genotypes(conn, [sample["id"] for sample in members])
+        results[family_id] = family_candidates(variant_ids, gt, members, variant_genes, modes)
+        if progress_callback:
+            progress_callback(f"{index}/{len(family_ids)} families analysed")
+
+    return results
+
+
+def create_family_selections(
+    conn: sqlite3.Connection,
+    family_ids: List[str] = None,
+    modes: List[str] = None,
+    progress_callback: Callable = None,
+) -> Dict[str, Dict[str, int]]:
+    """Store the variants of each family and mode as a "<mode>_<family_id>" selection
+
+    Existing selections with these names are replaced. See :meth:`analyse_families`
+    for the arguments.
+
+    Returns:
+        dict: {family_id: {mode: selection id, or None without variant}}
+    """
+    results = analyse_families(conn, family_ids, modes, progress_callback)
+    selections = {}
+    for family_id, candidates in results.items():
+        selections[family_id] = {}
+        for mode, variant_ids in candidates.items():
+            name = f"{mode}_{family_id}"
+            # Results of a previous analysis are removed
+            sql.delete_selection_by_name(conn, name)
+            selections[family_id][mode] = sql.insert_selection_from_ids(
+                conn, variant_ids, name, description=f"{MODES[mode]} in family {family_id}"
+            )
+    return selections
+
+
+def create_trio_selection(
+    conn: sqlite3.Connection,
+    mode: str,
+    father_id: int,
+    mother_id: int,
+    child_id: int,
+    name: str = None,
+) -> int:
+    """Store the variants matching the mode in the trio as a selection
+
+    The trio is analysed by :meth:`family_candidates` as a family of three
+    members: the child is affected, the sex of the samples and the phenotype
+    of the parents are read from the samples table.
+
+    Args:
+        conn (sqlite3.Connection): Sqlite3 connection
+        mode (str): One of MODES
+        father_id (int): Id of the father in the samples table
+        mother_id (int): Id of the mother
+        child_id (int): Id of the child
+        name (str): Name of the selection; "<mode>_<child name>" by default.
+            An existing selection with this name is replaced.
+
+    Returns:
+        int: Id of the selection, or None if no variant matches
+
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown inheritance mode: {mode}")
+
+    father_id, mother_id, child_id = int(father_id), int(mother_id), int(child_id)
+    samples = {
+        row["id"]: dict(row)
+        for row in conn.execute(
+            "SELECT id, name, sex, phenotype FROM samples WHERE id IN (?,?,?)",
+            (father_id, mother_id, child_id),
+        )
+    }
+    # Parents of the trio, whatever the pedigree of the samples table
+    members = [
+        dict(samples[father_id], father_id=0, mother_id=0),
+        dict(samples[mother_id], father_id=0, mother_id=0),
+        dict(samples[child_id], father_id=father_id, mother_id=mother_id, phenotype=AFFECTED),
+    ]
+    variant_ids, gt = load_family_genotypes(conn, [father_id, mother_id, child_id])
+    candidates = family_candidates(variant_ids, gt, members, VariantGenes(conn), [mode])
+
+    child = samples[child_id]["name"]
+    name = name or f"{mode}_{child}"
+    sql.delete_selection_by_name(conn, name)
+    return sql.insert_selection_from_ids(
+        conn, candidates[mode], name, description=f"{MODES[mode]} of {child}"
+    )
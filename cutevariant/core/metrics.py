@@ -0,0 +1,178 @@
+"""Project metrics computed at import time
+
+Metrics (variant count, SNP/indel counts, transitions, transversions, genes...)
+are computed in one streaming pass over the variants and their annotations,
+then stored as JSON in the `metadatas` table. When variants are added to the
+project, only the new variants (with an id greater than `last_variant_id`) are
+read and their counts are added to the stored metrics.
+
+Examples:
+
+    from cutevariant.core import metrics
+    metrics.update_metrics(conn)  # after an import
+    metrics.get_metrics(conn)
+    # {"variant_count": 11, "snp_count": 9, ..., "genes": {"CFTR": 3}}
+    metrics.metrics_table(metrics.get_metrics(conn))
+    # {"Variant count": 11, "Snp count": 9, ..., "Tr/tv ratio": 2.5}
+"""
+# Standard imports
+import json
+import sqlite3
+from collections import Counter
+from typing import Callable
+
+# Custom imports
+from cutevariant.core import sql
+
+from cutevariant import LOGGER
+
+# Key of the metrics in the metadatas table
+METADATA_KEY = "metrics"
+
+TRANSITIONS = {("A", "G"), ("G", "A"), ("C", "T"), ("T", "C")}
+TRANSVERSIONS = {
+    ("A", "C"),
+    ("C", "A"),
+    ("G", "T"),
+    ("T", "G"),
+    ("G", "C"),
+    ("C", "G"),
+    ("A", "T"),
+    ("T", "A"),
+}
+
+# Counters stored in the metrics, with their label
+COUNTERS = {
+    "variant_count": "Variant count",
+    "snp_count": "Snp count",
+    "indel_count": "Indel count",
+    "transition_count": "Transition count",
+    "transversion_count": "Transversion count",
+}
+
+# Number of rows fetched at once
+FETCH_SIZE = 10000
+
+
+def empty_metrics() -> dict:
+    """Return the metrics of a project without variant"""
+    metrics = dict.fromkeys(COUNTERS, 0)
+    metrics.update({"sample_count": 0, "last_variant_id": 0, "genes": {}})
+    return metrics
+
+
+def compute_metrics(
+    conn: sqlite3.Connection, metrics: dict = None, progress_callback: Callable = None
+) -> dict:
+    """Return metrics updated with the variants added since they were computed
+
+    Variants with an id greater than `metrics["last_variant_id"]` are read in one
+    pass, with their annotations.
+
+    Args:
+        conn (sqlite3.Connection): Sqlite3 connection
+        metrics (dict): Metrics to update; all variants are read if None
+        progress_callback (Callable): Called with a message every FETCH_SIZE rows
+
+    Returns:
+        dict: New metrics; the given ones are not modified
+    """
+    metrics = json.loads(json.dumps(metrics)) if metrics else empty_metrics()
+    genes = Counter(metrics["genes"])
+
+    has_annotations = "gene" in sql.get_table_columns(conn, "annotations")
+    gene_column = "annotations.gene" if has_annotations else "NULL"
+    join = (
+        "LEFT JOIN annotations ON annotations.variant_id = variants.id" if has_annotations else ""
+    )
+    cursor = conn.execute(
+        f"""SELECT variants.id, variants.ref, variants.alt, variants.is_snp, variants.is_indel,
+        {gene_column} FROM variants {join} WHERE variants.id > ? ORDER BY variants.id""",
+        (metrics["last_variant_id"],),
+    )
+
+    last_id = None
+    variant_genes = set()
+    rows_count = 0
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+
+        for variant_id, ref, alt, is_snp, is_indel, gene in rows:
+            if variant_id != last_id:
+                # A variant is counted once per gene, whatever its annotation count
+                genes.update(variant_genes)
+                variant_genes = set()
+                last_id = variant_id
+
+                metrics["variant_count"] += 1
+                metrics["snp_count"] += bool(is_snp)
+                metrics["indel_count"] += bool(is_indel)
+                metrics["transition_count"] += (ref, alt) in TRANSITIONS
+                metrics["transversion_count"] += (ref, alt) in TRANSVERSIONS
+
+            if gene is not None:
+                variant_genes.add(gene)
+
+        rows_count += len(rows)
+        if progress_callback:
+            progress_callback(f"Metrics: {rows_count} rows read")
+
+    genes.update(variant_genes)
+    metrics["genes"] = dict(genes)
+    if last_id is not None:
+        metrics["last_variant_id"] = last_id
+    metrics["sample_count"] = conn.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+
+    return metrics
+
+
+def get_stored_metrics(conn: sqlite3.Connection) -> dict:
+    """Return the metrics stored in the metadatas, or None"""
+    row = conn.execute("SELECT value FROM metadatas WHERE key = ?", (METADATA_KEY,)).fetchone()
+    if not row:
+        return None
+    try:
+        return json.loads(row[0])
+    except ValueError:
+        LOGGER.warning("Invalid metrics in metadatas")
+        return None
+
+
+def update_metrics(conn: sqlite3.Connection, progress_callback: Callable = None) -> dict:
+    """Add the new variants to the stored metrics and return them
+
+    Metrics are computed from scratch if they are not stored yet.
+    """
+    metrics = compute_metrics(conn, get_stored_metrics(conn), progress_callback)
+    sql.update_metadatas(conn, {METADATA_KEY: json.dumps(metrics)})
+    return metrics
+
+
+def get_metrics(conn: sqlite3.Connection) -> dict:
+    """Return the metrics of the project
+
+    Stored metrics are completed with the variants added since they were
+    computed. Nothing is written, so that read only connections can be used.
+    """
+    return compute_metrics(conn, get_stored_metrics(conn))
+
+
+def metrics_table(metrics: dict) -> dict:
+    """Return {label: value} of the counters of metrics, for display
+
+    Genes are not included (see `top_genes`).
+    """
+    table = {label: metrics[key] for key, label in COUNTERS.items()}
+    table["Sample count"] = metrics["sample_count"]
+    transversions = metrics["transversion_count"]
+    table["Tr/tv ratio"] = (
+        round(metrics["transition_count"] / transversions, 2) if transversions else None
+    )
+    return table
+
+
+def top_genes(metrics: dict, count: int = 100) -> dict:
+    """Return {gene: variant count} of the genes with most variants"""
+    return dict(Counter(metrics["genes"]).most_common(count))
@@ -0,0 +1,399 @@
+"""Parallel execution of variant queries over ranges of variants.id
+
+SQLite evaluates a query on one core. But the sqlite3 module releases the GIL
+while a statement runs, so the same query can be executed by several threads
+on several connections.
+
+Functions of this module split `variants.id` into ranges, run the query built
+by :mod:`cutevariant.core.querybuilder` on each range with a read only
+connection borrowed from :class:`cutevariant.core.sql.ConnectionPool`, and
+merge the partial results:
+
+- counts are summed
+- group by counts are added
+- rows are concatenated, or merged with a k-way merge if they are ordered
+
+Small projects, in-memory databases and connections with an uncommitted
+transaction (other connections cannot see its data) are queried directly with
+the given connection.
+
+Examples:
+
+    from cutevariant.core import parallel
+    parallel.count(conn, ["chr", "pos"], "variants", {"$and": [{"pos": {"$gt": 3}}]})
+    # 23034
+
+    for variant in parallel.select(conn, ["chr", "pos"], order_by=[("pos", True)]):
+        print(variant)
+"""
+# Standard imports
+import heapq
+import itertools
+import os
+import queue
+import sqlite3
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator
+
+# Custom imports
+from cutevariant.core import sql
+from cutevariant.core import querybuilder as qb
+
+from cutevariant import LOGGER
+
+# Number of threads (and of variants.id ranges)
+PARALLEL_WORKERS = min(8, os.cpu_count() or 1)
+
+# Below this number of variants, queries are not split
+PARALLEL_MIN_VARIANTS = 200_000
+
+# Rows sent at once by a thread to the merge of select()
+FETCH_SIZE = 1000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the thread pool shared by parallel queries"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=PARALLEL_WORKERS, thread_name_prefix="cutevariant-sql"
+            )
+        return _executor
+
+
+def id_ranges(conn: sqlite3.Connection, partitions: int = None, min_variants: int = None) -> list:
+    """Split variants.id into contiguous ranges
+
+    Args:
+        conn (sqlite3.Connection): Sqlite3 connection
+        partitions (int): Number of ranges, default is PARALLEL_WORKERS
+        min_variants (int): Don't split if there are fewer variants,
+            default is PARALLEL_MIN_VARIANTS
+
+    Returns:
+        list: [(first_id, last_id), ...] inclusive bounds.
+            [None] if the query must run on conn without splitting.
+    """
+    partitions = partitions or PARALLEL_WORKERS
+    min_variants = PARALLEL_MIN_VARIANTS if min_variants is None else min_variants
+
+    if partitions < 2 or conn.in_transaction or not sql.get_database_file_name(conn):
+        return [None]
+
+    # MIN and MAX of the rowid are read from the btree without scan
+    first, last = conn.execute("SELECT MIN(id), MAX(id) FROM variants").fetchone()
+    if first is None or last - first + 1 < max(min_variants, partitions):
+        return [None]
+
+    size = (last - first + 1) // partitions
+    ranges = []
+    for i in range(partitions):
+        start = first + i * size
+        end = last if i == partitions - 1 else start + size - 1
+        ranges.append((start, end))
+
+    return ranges
+
+
+def range_filters(filters: dict, id_range: tuple) -> dict:
+    """Return filters restricted to variants with id in id_range
+
+    Args:
+        filters (dict): nested tree of conditions
+        id_range (tuple/None): (first_id, last_id); If None, filters is returned
+
+    Examples:
+        range_filters({"pos": 3}, (1, 100))
+        # {"$and": [{"id": {"$gte": 1}}, {"id": {"$lte": 100}}, {"pos": 3}]}
+    """
+    if id_range is None:
+        return filters
+
+    conditions = [{"id": {"$gte": id_range[0]}}, {"id": {"$lte": id_range[1]}}]
+    if filters:
+        conditions.append(filters)
+
+    return {"$and": conditions}
+
+
+def map_ranges(
+    conn: sqlite3.Connection,
+    function: Callable,
+    filters: dict = {},
+    partitions: int = None,
+    min_variants: int = None,
+) -> list:
+    """Call function on each range of variants and return the partial results
+
+    Args:
+        conn (sqlite3.Connection): Sqlite3 connection
+        function (Callable): function(conn, filters) which queries variants matching filters.
+            It is called from a worker thread with a read only connection.
+        filters (dict): nested tree of conditions
+
+    Returns:
+        list: Results of function, in the order of the ranges
+    """
+    ranges = id_ranges(conn, partitions, min_variants)
+
+    if ranges == [None]:
+        return [function(conn, filters)]
+
+    filename = sql.get_database_file_name(conn)
+    # Workers use the progress handler of conn (time budget, cancellation)
+    progress_handler = getattr(conn, "progress_handler", None)
+
+    pool = sql.get_connection_pool(filename)
+
+    def run(id_range):
+        with pool.connection() as worker_conn:
+            if progress_handler:
+                progress_handler.install(worker_conn)
+            return function(worker_conn, range_filters(filters, id_range))
+
+    LOGGER.debug("parallel:map_ranges:: %s ranges", len(ranges))
+    return list(get_executor().map(run, ranges))
+
+
+def count(
+    conn: sqlite3.Connection,
+    fields=["chr", "pos", "ref", "alt"],
+    source="variants",
+    filters={},
+    **kwargs,
+) -> int:
+    """Count variants returned by the query built from fields, source and filters
+
+    See Also:
+        :meth:`cutevariant.core.command.count_cmd`
+    """
+
+    def count_range(range_conn, range_filters):
+        query, params = qb.build_sql_query_with_params(
+            range_conn, fields, source, range_filters, limit=None, **kwargs
+        )
+        return sql.count_query(range_conn, query, params)
+
+    return sum(map_ranges(conn, count_range, filters))
+
+
+def group_count(
+    conn: sqlite3.Connection,
+    groupby,
+    fields=None,
+    source="variants",
+    filters={},
+    **kwargs,
+) -> Counter:
+    """Count distinct variants per value of the groupby field(s)
+
+    Groups whose values are all NULL are not counted, like COUNT(field) in SQL.
+
+    Args:
+        groupby (str or list): Field, or list of fields defining the groups
+        fields (list): Unused, kept for compatibility: only the joins required
+            by groupby and filters are made
+        source (str): Selection name
+        filters (dict): nested tree of conditions
+
+    Returns:
+        Counter: {value: count}, or {(value, ...): count} if groupby is a list
+    """
+    groupby_fields = [groupby] if isinstance(groupby, str) else list(groupby)
+
+    def count_range(range_conn, range_filters):
+        query, params = qb.build_group_by_query_with_params(
+            range_conn, groupby_fields, source, range_filters, **kwargs
+        )
+        if isinstance(groupby, str):
+            return Counter({row[0]: row[-1] for row in range_conn.execute(query, params)})
+        return Counter({tuple(row[:-1]): row[-1] for row in range_conn.execute(query, params)})
+
+    total = Counter()
+    for partial in map_ranges(conn, count_range, filters):
+        total.update(partial)
+
+    return total
+
+
+def other_count(
+    conn: sqlite3.Connection,
+    groupby: list,
+    groups: list,
+    source="variants",
+    filters={},
+    **kwargs,
+) -> int:
+    """Count distinct variants which belong to other groups than `groups`
+
+    Args:
+        groupby (list): Fields defining the groups
+        groups (list[tuple]): Values of the groupby fields of the excluded groups
+    """
+
+    def count_range(range_conn, range_filters):
+        query, params = qb.build_group_by_query_with_params(
+            range_conn, groupby, source, range_filters, excluded_groups=groups, **kwargs
+        )
+        return range_conn.execute(query, params).fetchone()[0]
+
+    return sum(map_ranges(conn, count_range, filters))
+
+
+class _Descending:
+    """Reverse the order of a sort key"""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+def sort_key(value) -> tuple:
+    """Return a python sort key which sorts values like sqlite does
+
+    NULL < INTEGER, REAL < TEXT < BLOB
+    """
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, bytes(value))
+
+
+def _put(rows: queue.Queue, item, stop: threading.Event):
+    """Put item in the queue unless the reader has stopped"""
+    while not stop.is_set():
+        try:
+            rows.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+
+def _stream_range(filename, query, params, rows, stop, progress_handler=None):
+    """Send rows of the query to the queue, by chunks; None marks the end"""
+    try:
+        with sql.get_connection_pool(filename).connection() as conn:
+            if progress_handler:
+                progress_handler.install(conn)
+            cursor = conn.execute(query, params)
+            while not stop.is_set():
+                chunk = [dict(row) for row in cursor.fetchmany(FETCH_SIZE)]
+                if not chunk:
+                    break
+                _put(rows, chunk, stop)
+            cursor.close()
+        _put(rows, None, stop)
+    except Exception as e:
+        _put(rows, e, stop)
+
+
+def _read_queue(rows: queue.Queue) -> Iterator[dict]:
+    """Yield rows sent by :meth:`_stream_range`"""
+    while True:
+        chunk = rows.get()
+        if chunk is None:
+            return
+        if isinstance(chunk, Exception):
+            raise chunk
+        yield from chunk
+
+
+def select(
+    conn: sqlite3.Connection,
+    fields=["chr", "pos", "ref", "alt"],
+    source="variants",
+    filters={},
+    order_by=None,
+    limit=None,
+    offset=0,
+    **kwargs,
+) -> Iterator[dict]:
+    """Yield variants like :meth:`cutevariant.core.command.select_cmd`
+
+    Each range is read by its own thread. Rows are yielded in the order of the
+    ranges, or merged according to order_by.
+    Only a few chunks of rows per range are kept in memory.
+    """
+    order_by = order_by or []
+
+    # The merge needs the values of the order by fields, named after the fields
+    mergeable = all(field in fields or field == "id" for field, _ in order_by)
+
+    ranges = id_ranges(conn) if mergeable else [None]
+
+    args = (fields, source, filters, order_by, limit, offset, kwargs)
+    if ranges == [None]:
+        rows = _select_range(conn, *args)
+    else:
+        rows = _select_ranges(conn, ranges, *args)
+
+    names = None
+    for row in rows:
+        if names is None:
+            # See sql.column_names: sqlite doesn't return alias names with square brackets
+            names = [k.replace("(", "[").replace(")", "]") for k in row]
+        yield dict(zip(names, row.values()))
+
+
+def _select_range(conn, fields, source, filters, order_by, limit, offset, kwargs):
+    query, params = qb.build_sql_query_with_params(
+        conn, fields, source, filters, order_by, limit, offset, **kwargs
+    )
+    for row in conn.execute(query, params):
+        yield dict(row)
+
+
+def _select_ranges(conn, ranges, fields, source, filters, order_by, limit, offset, kwargs):
+    filename = sql.get_database_file_name(conn)
+    offset = offset or 0
+
+    # Each range returns at most the rows of the requested page
+    range_limit = limit + offset if limit else None
+
+    progress_handler = getattr(conn, "progress_handler", None)
+    stop = threading.Event()
+    iterators = []
+    for id_range in ranges:
+        query, params = qb.build_sql_query_with_params(
+            conn, fields, source, range_filters(filters, id_range), order_by, range_limit, **kwargs
+        )
+        rows = queue.Queue(maxsize=4)
+        threading.Thread(
+            target=_stream_range,
+            args=(filename, query, params, rows, stop, progress_handler),
+            daemon=True,
+        ).start()
+        iterators.append(_read_queue(rows))
+
+    if order_by:
+
+        def row_key(row):
+            return [
+                sort_key(row[field]) if ascending else _Descending(sort_key(row[field]))
+                for field, ascending in order_by
+            ]
+
+        merged = heapq.merge(*iterators, key=row_key)
+    else:
+        merged = itertools.chain(*iterators)
+
+    try:
+        yield from itertools.islice(merged, offset, offset + limit if limit else None)
+    finally:
+        stop.set()
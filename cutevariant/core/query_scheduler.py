@@ -0,0 +1,213 @@
+"""Scheduler of the background queries of the GUI
+
+When the filters change, several plugins query the same project file at the
+same time: the variant page and its count, group by counts, stats...
+:class:`QueryScheduler` runs these queries with a few rules:
+
+- Limited concurrency: at most `max_running` queries run at once; the other
+  ones wait for a slot. Queries of the "page" class (the variants displayed
+  in the main view) never wait.
+- Priorities: waiting queries get a slot by order of priority (see
+  QUERY_PRIORITIES), then by order of arrival.
+- Deduplication: queries with the same key (same database and same
+  arguments) are executed once. Queries submitted while the first one is
+  running receive a copy of its result.
+- Cancellation: a waiting query stops waiting as soon as it is cancelled.
+
+Examples:
+
+    scheduler = get_query_scheduler()
+    count = scheduler.run(
+        lambda: count_cmd(conn, filters=filters),
+        query_class="count",
+        key=("project.db", "count", str(filters)),
+        cancelled=lambda: handler.cancelled,
+    )
+"""
+# Standard imports
+import copy
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Callable
+
+# Custom imports
+from cutevariant.core.sql_progress import QueryCancelled
+
+# Order in which waiting queries get a slot: lower is first
+QUERY_PRIORITIES = {
+    "page": 0,
+    "count": 1,
+    "group_by": 2,
+    "stats": 3,
+}
+
+# Priority of queries without class
+DEFAULT_PRIORITY = 2
+
+# Maximum number of queries running at once, "page" queries excepted
+MAX_RUNNING_QUERIES = 2
+
+# Seconds between two checks of the cancellation of a waiting query
+POLL_INTERVAL = 0.05
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+class _SharedResult:
+    """Result of a query, shared with the identical queries"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class QueryScheduler:
+    """Run queries from several threads with priorities and deduplication
+
+    Attributes:
+        max_running (int): Maximum number of queries running at once
+    """
+
+    def __init__(self, max_running: int = MAX_RUNNING_QUERIES):
+        self.max_running = max_running
+        self._condition = threading.Condition()
+        self._running = 0
+        # Heap of (priority, arrival order) of waiting queries
+        self._waiting = []
+        self._counter = itertools.count()
+        # {key: _SharedResult} of running queries
+        self._shared = {}
+        self.executed_count = 0
+        self.shared_count = 0
+
+    @property
+    def running_count(self) -> int:
+        """Return the number of running queries"""
+        return self._running
+
+    @property
+    def waiting_count(self) -> int:
+        """Return the number of queries waiting for a slot"""
+        return len(self._waiting)
+
+    @staticmethod
+    def priority(query_class: str) -> int:
+        """Return the priority of a query class"""
+        return QUERY_PRIORITIES.get(query_class, DEFAULT_PRIORITY)
+
+    @contextmanager
+    def slot(self, query_class: str = None, cancelled: Callable = None):
+        """Wait for a slot to run a query
+
+        Args:
+            query_class (str): "page", "count", "group_by", "stats" or None
+            cancelled (Callable): Return True if the query has been cancelled
+
+        Raises:
+            QueryCancelled: If the query is cancelled while it waits
+        """
+        priority = self.priority(query_class)
+        ticket = (priority, next(self._counter))
+
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while self._waiting[0] != ticket or (
+                    self._running >= self.max_running and priority > 0
+                ):
+                    if cancelled and cancelled():
+                        raise QueryCancelled("Query cancelled")
+                    self._condition.wait(POLL_INTERVAL)
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+                raise
+
+            heapq.heappop(self._waiting)
+            self._running += 1
+            # The next waiting query may have a slot too
+            self._condition.notify_all()
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._condition.notify_all()
+
+    def run(
+        self,
+        function: Callable,
+        query_class: str = None,
+        key=None,
+        cancelled: Callable = None,
+    ):
+        """Return function(), executed when a slot is free
+
+        Args:
+            function (Callable): Function without argument which runs the query
+            query_class (str): "page", "count", "group_by", "stats" or None
+            key (Hashable): Identity of the query. If a query with the same key
+                is running, its result is returned instead of calling function.
+            cancelled (Callable): Return True if the query has been cancelled
+
+        Raises:
+            QueryCancelled: If the query is cancelled while it waits
+        """
+        if key is None:
+            return self._execute(function, query_class, cancelled)
+
+        with self._condition:
+            shared = self._shared.get(key)
+            is_owner = shared is None
+            if is_owner:
+                shared = self._shared[key] = _SharedResult()
+
+        if not is_owner:
+            return self._wait_shared(shared, function, query_class, key, cancelled)
+
+        try:
+            shared.result = self._execute(function, query_class, cancelled)
+            return shared.result
+        except BaseException as e:
+            shared.error = e
+            raise
+        finally:
+            with self._condition:
+                del self._shared[key]
+            shared.event.set()
+
+    def _execute(self, function: Callable, query_class: str, cancelled: Callable):
+        with self.slot(query_class, cancelled):
+            self.executed_count += 1
+            return function()
+
+    def _wait_shared(self, shared, function, query_class, key, cancelled):
+        """Return a copy of the result of the identical running query"""
+        while not shared.event.wait(POLL_INTERVAL):
+            if cancelled and cancelled():
+                raise QueryCancelled("Query cancelled")
+
+        if isinstance(shared.error, QueryCancelled):
+            # The other query has been cancelled, not this one
+            return self.run(function, query_class, key, cancelled)
+
+        if shared.error is not None:
+            raise shared.error
+
+        self.shared_count += 1
+        return copy.copy(shared.result)
+
+
+def get_query_scheduler() -> QueryScheduler:
+    """Return the scheduler shared by the background queries"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = QueryScheduler()
+        return _scheduler
@@ -27,6 +27,7 @@
 
 # Custom imports
 from cutevariant.core import sql
+from cutevariant.core.sql_regexp import regexp_prefilters, glob_escape, like_escape
 
 import cutevariant.constants as cst
 
@@ -39,6 +40,9 @@
 # WORDSET["truc"]
 WORDSET_FUNC_NAME = "WORDSET"
 
+# samples.$count>=2.gt : at least 2 samples with the genotype condition
+SAMPLES_COUNT_PATTERN = re.compile(r"^\$count(>=|<=|!=|=|>|<)(\d+)$")
+
 PY_TO_SQL_OPERATORS = {
     "$eq": "=",
     "$gt": ">",
@@ -168,7 +172,9 @@ def samples_join_required(fields, filters, order_by=None) -> list:
         if key.startswith("samples"):
             _, *sample, _ = key.split(".")
             sample = ".".join(sample)
-            samples.add(sample)
+            # $any, $all, $count are resolved by a subquery, without join
+            if not is_samples_aggregate(sample):
+                samples.add(sample)
 
     return list(samples)
 
@@ -297,8 +303,110 @@ def fields_to_sql(fields, use_as=False) -> list:
     return sql_fields
 
 
+def _value_to_sql(value) -> str:
+    """Return the SQL literal of a filter value
+
+    Strings are quoted, lists are converted to "(1,2,3)" and wordsets are
+    converted to a subquery over the wordsets table.
+    """
+    if value is None:
+        return "NULL"
+
+    if isinstance(value, bool):
+        return str(int(value))
+
+    if isinstance(value, str):
+        value = value.replace("'", "''")
+        return f"'{value}'"
+
+    # Cast wordset
+    if isinstance(value, dict) and "$wordset" in value:
+        wordset_name = value["$wordset"]
+        return f"(SELECT value FROM wordsets WHERE name = '{wordset_name}')"
+
+    # Convert [1,2,3] =>  "(1,2,3)"
+    if isinstance(value, (list, tuple)):
+        return "(" + ",".join([f"'{i}'" if isinstance(i, str) else f"{i}" for i in value]) + ")"
+
+    return f"{value}"
+
+
+def _value_to_placeholder(value) -> tuple:
+    """Return the SQL placeholders of a filter value and the values to bind
+
+    Examples:
+
+        _value_to_placeholder("CFTR") ==> ("?", ["CFTR"])
+        _value_to_placeholder([1, 2]) ==> ("(?,?)", [1, 2])
+        _value_to_placeholder({"$wordset": "genes"}) ==>
+            ("(SELECT value FROM wordsets WHERE name = ?)", ["genes"])
+    """
+    if value is None:
+        return "NULL", []
+
+    if isinstance(value, dict) and "$wordset" in value:
+        return "(SELECT value FROM wordsets WHERE name = ?)", [value["$wordset"]]
+
+    if isinstance(value, (list, tuple)):
+        return "(" + ",".join("?" * len(value)) + ")", [
+            int(i) if isinstance(i, bool) else i for i in value
+        ]
+
+    if isinstance(value, bool):
+        value = int(value)
+
+    return "?", [value]
+
+
+def _regexp_to_sql(field: str, sql_operator: str, pattern: str, params: list = None) -> str:
+    """Return a REGEXP condition pre-filtered by the literals of the pattern
+
+    The python REGEXP function is called only for rows which contain the
+    literals of the pattern. NULL values never reach the python function.
+
+    Examples:
+
+        _regexp_to_sql("`gene`", "REGEXP", "^CFTR.+del") ==>
+            "(`gene` GLOB 'CFTR*' AND instr(`gene`, 'del') > 0 AND `gene` REGEXP '^CFTR.+del')"
+
+        _regexp_to_sql("`gene`", "NOT REGEXP", "CFTR.+") ==>
+            "(`gene` IS NOT NULL AND (NOT (instr(`gene`, 'CFTR') > 0) OR `gene` NOT REGEXP 'CFTR.+'))"
+    """
+
+    def bind(value):
+        if params is None:
+            return _value_to_sql(value)
+        params.append(value)
+        return "?"
+
+    prefix, literals, ignore_case = regexp_prefilters(pattern)
+
+    prefilters = []
+    if prefix:
+        prefilters.append(f"{field} GLOB {bind(glob_escape(prefix) + '*')}")
+
+    for literal in literals:
+        if ignore_case:
+            like = bind("%" + like_escape(literal) + "%")
+            prefilters.append(f"{field} LIKE {like} ESCAPE '\\'")
+        else:
+            prefilters.append(f"instr({field}, {bind(literal)}) > 0")
+
+    if sql_operator == "REGEXP":
+        # Pre-filters are NULL for NULL values: no need to test it again
+        prefilters = prefilters or [f"{field} IS NOT NULL"]
+        return "(" + " AND ".join(prefilters + [f"{field} REGEXP {bind(pattern)}"]) + ")"
+
+    # NOT REGEXP: a value without the literals cannot match the pattern
+    condition = f"{field} NOT REGEXP {bind(pattern)}"
+    if prefilters:
+        condition = f"(NOT ({' AND '.join(prefilters)}) OR {condition})"
+
+    return f"({field} IS NOT NULL AND {condition})"
+
+
 # refactor
-def condition_to_sql(item: dict, samples=None) -> str:
+def condition_to_sql(item: dict, samples=None, params: list = None) -> str:
     """
     Convert a key, value items from fiters into SQL query
     {"ann.gene": "CFTR"}
@@ -307,8 +415,20 @@ def condition_to_sql(item: dict, samples=None) -> str:
         condition_to_sql({"chr":3}) ==> `variants`.`chr `= 3
         condition_to_sql({"chr":{"$gte": 30}}) ==> `variants`.`chr `>= 3
         condition_to_sql({"ann.gene":{"$gte": 30}}) ==> `annotation`.`gene` >= 30
-        condition_to_sql({"samples.$all.gt": 1 }) ==> (`samples.boby.gt = 1 AND samples.charles.gt = 1)
-        condition_to_sql({"samples.$any.gt": 1 }) ==> (`samples.boby.gt = 1 OR samples.charles.gt = 1)
+        condition_to_sql({"samples.boby.gt": 1 }) ==> `sample_boby`.`gt` = 1
+        condition_to_sql({"samples.$any.gt": 1 }) ==> EXISTS (SELECT 1 FROM genotypes WHERE ...)
+        condition_to_sql({"samples.$all.gt": 1 }) ==> (SELECT COUNT(*) FROM genotypes WHERE ...) = 2
+        condition_to_sql({"samples.$count>=2.gt": 1 }) ==> (SELECT COUNT(*) ...) >= 2
+
+    `samples` is the {name: id} map of samples used by $any/$all/$count.
+    If None, all samples of the project are used.
+
+    If `params` is a list, values are not inlined: placeholders are written
+    in the condition and the values to bind are appended to `params`.
+
+        params = []
+        condition_to_sql({"chr":3}, params=params) ==> `variants`.`chr `= ?
+        params ==> [3]
 
     """
 
@@ -338,16 +458,13 @@ def condition_to_sql(item: dict, samples=None) -> str:
         operator = "$eq"
         value = v
 
-    if isinstance(value, str):
-        value = value.replace("'", "''")
-
     # MAP operator
     sql_operator = PY_TO_SQL_OPERATORS[operator]
 
     # Optimisation REGEXP
     # use LIKE IF REGEXP HAS NO special caractere
     if "REGEXP" in sql_operator:
-        special_caracter = "[]+.?*()^$"
+        special_caracter = "[]+.?*()^$|{}\\"
         if not set(str(value)) & set(special_caracter):
             sql_operator = "LIKE" if sql_operator == "REGEXP" else "NOT LIKE"
             value = f"%{value}%"
@@ -357,13 +474,6 @@ def condition_to_sql(item: dict, samples=None) -> str:
         sql_operator = "LIKE" if sql_operator == "HAS" else "NOT LIKE"
         value = f"%{cst.HAS_OPERATOR}{value}{cst.HAS_OPERATOR}%"
 
-    # Cast value
-    if isinstance(value, str):
-        value = f"'{value}'"
-
-    if isinstance(value, bool):
-        value = int(value)
-
     # Cast IS NULL
     if value is None:
         if operator == "$eq":
@@ -372,46 +482,75 @@ def condition_to_sql(item: dict, samples=None) -> str:
         if operator == "$ne":
             sql_operator = "IS NOT"
 
-        value = "NULL"
+    if "REGEXP" in sql_operator:
+        pattern = str(value)
 
-    # Cast wordset
-    if isinstance(value, dict):
-        if "$wordset" in value:
-            wordset_name = value["$wordset"]
-            value = f"(SELECT value FROM wordsets WHERE name = '{wordset_name}')"
+    elif params is None:
+        value, value_params = _value_to_sql(value), []
+    else:
+        value, value_params = _value_to_placeholder(value)
 
-    # Convert [1,2,3] =>  "(1,2,3)"
-    if isinstance(value, list) or isinstance(value, tuple):
-        value = "(" + ",".join([f"'{i}'" if isinstance(i, str) else f"{i}" for i in value]) + ")"
+    def field_condition(field):
+        if "REGEXP" in sql_operator:
+            return _regexp_to_sql(field, sql_operator, pattern, params)
+
+        if params is not None:
+            params.extend(value_params)
+        return f"{field} {sql_operator} {value}"
 
-    operator = None
-    condition = ""
+    if table == "samples" and is_samples_aggregate(name):
+        if samples is not None and not samples:
+            # None of the selected samples exists: no variant matches
+            return "0"
+        return _samples_aggregate_to_sql(name, field_condition(f"`genotypes`.`{k}`"), samples)
 
     if table == "samples":
+        return field_condition(f"`sample_{name}`.`{k}`")
 
-        if name == "$any":
-            operator = "OR"
+    return field_condition(field)
 
-        if name == "$all":
-            operator = "AND"
 
-        if operator and samples:
+def is_samples_aggregate(name: str) -> bool:
+    """Return True if name is a samples keyword ($any, $all, $count>=k) and not a sample name"""
+    return name in ("$any", "$all") or bool(SAMPLES_COUNT_PATTERN.match(name))
 
-            condition = (
-                "("
-                + f" {operator} ".join(
-                    [f"`sample_{sample}`.`{k}` {sql_operator} {value}" for sample in samples]
-                )
-                + ")"
-            )
 
-        else:
-            condition = f"`sample_{name}`.`{k}` {sql_operator} {value}"
+def _samples_aggregate_to_sql(name: str, genotype_condition: str, samples=None) -> str:
+    """Compile a $any/$all/$count condition into a single subquery over genotypes
+
+    Genotypes are read through the (variant_id, sample_id) index for the
+    current variant only; the query does not depend on the number of samples.
+
+    Args:
+        name (str): "$any", "$all" or "$count" followed by an operator and a
+            number (ex: "$count>=2")
+        genotype_condition (str): condition on `genotypes` columns
+        samples (dict/None): {name: id} of the samples to consider.
+            If None, all samples of the project are considered.
+
+    Returns:
+        str: Sql condition
+    """
+    from_clause = "FROM genotypes WHERE `genotypes`.`variant_id` = `variants`.`id`"
 
+    if samples is not None:
+        ids = ",".join(str(int(i)) for i in samples.values())
+        from_clause += f" AND `genotypes`.`sample_id` IN ({ids})"
+        samples_count = str(len(samples))
     else:
-        condition = f"{field} {sql_operator} {value}"
+        samples_count = "(SELECT COUNT(*) FROM samples)"
 
-    return condition
+    subquery = f"{from_clause} AND {genotype_condition}"
+
+    if name == "$any":
+        return f"EXISTS (SELECT 1 {subquery})"
+
+    if name == "$all":
+        # (sample_id, variant_id) is unique: count matching samples
+        return f"(SELECT COUNT(*) {subquery}) = {samples_count}"
+
+    sql_operator, count = SAMPLES_COUNT_PATTERN.match(name).groups()
+    return f"(SELECT COUNT(*) {subquery}) {sql_operator} {int(count)}"
 
 
 def condition_to_vql(item: dict) -> str:
@@ -487,6 +626,9 @@ def condition_to_vql(item: dict) -> str:
         elif name == "$all":
             name = "ALL"
 
+        elif SAMPLES_COUNT_PATTERN.match(name):
+            name = "COUNT" + name[len("$count") :]
+
         else:
             name = f"'{name}'"
 
@@ -542,7 +684,7 @@ def recursive(obj):
     return recursive(filters) or {}
 
 
-def filters_to_sql(filters: dict, samples=None) -> str:
+def filters_to_sql(filters: dict, samples=None, params: list = None) -> str:
     """Build a the SQL where clause from the nested set defined in filters
 
     Examples:
@@ -564,6 +706,9 @@ def filters_to_sql(filters: dict, samples=None) -> str:
 
     Args:
         filters (dict): A nested set of conditions
+        samples (dict): {name: id} of samples used by $any/$all/$count conditions
+        params (list): If given, values are replaced by placeholders and
+            appended to this list, in the order of the placeholders.
 
     Returns:
         str: A sql where expression
@@ -579,7 +724,7 @@ def recursive(obj):
                 )
 
             else:
-                conditions += condition_to_sql(obj, samples)
+                conditions += condition_to_sql(obj, samples, params)
 
         return conditions
 
@@ -667,42 +812,31 @@ def recursive(obj):
 #     return query
 
 
-def build_sql_query(
+def _get_samples_ids(conn: sqlite3.Connection) -> dict:
+    """Return a {sample name: sample id} map, cached per connection"""
+    return sql.cached_lookup(
+        conn, "samples_ids", lambda c: {i["name"]: i["id"] for i in sql.get_samples(c)}
+    )
+
+
+def _build_from_where(
     conn: sqlite3.Connection,
     fields,
     source="variants",
     filters={},
     order_by=[],
-    limit=50,
-    offset=0,
-    selected_samples=[],
-    **kwargs,
-):
-    """Build SQL SELECT query
-
-    Args:
-        fields (list): List of fields
-        source (str): source of the virtual table ( see: selection )
-        filters (dict): nested condition tree
-        order_by (list[(str,bool)]): list of tuple (fieldname, is_ascending) ;
-            If None, order_desc is not required.
-        limit (int/None): limit record count;
-            If None, offset is not required.
-        offset (int): record count per page
-        group_by (list/None): list of field you want to group
+    selected_samples=None,
+    params: list = None,
+) -> tuple:
+    """Return the FROM clause with the joins required by fields, filters and
+    order_by, and the WHERE clause of filters ("" if there is no condition)
     """
-
     # get samples ids
 
-    samples_ids = {i["name"]: i["id"] for i in sql.get_samples(conn)}
-
-    # Create fields
-    sql_fields = ["`variants`.`id`"] + fields_to_sql(fields, use_as=True)
-
-    sql_query = f"SELECT DISTINCT {','.join(sql_fields)} "
+    samples_ids = _get_samples_ids(conn)
 
     # Add source table
-    sql_query += "FROM variants"
+    sql_query = "FROM variants"
 
     if is_annotation_join_required(fields, filters, order_by):
         sql_query += " LEFT JOIN annotations ON annotations.variant_id = variants.id"
@@ -712,18 +846,15 @@ def build_sql_query(
     if source != "variants":
         sql_query += (
             " INNER JOIN selection_has_variant sv ON sv.variant_id = variants.id "
-            f"INNER JOIN selections s ON s.id = sv.selection_id AND s.name = '{source}'"
+            "INNER JOIN selections s ON s.id = sv.selection_id AND s.name = "
         )
+        if params is None:
+            sql_query += f"'{source}'"
+        else:
+            sql_query += "?"
+            params.append(source)
 
-    # Test if sample*
-    filters_fields = " ".join([list(i.keys())[0] for i in filters_to_flat(filters)])
-
-    # Join all samples if $all or $any keywords are present
-    if "$all" in filters_fields or "$any" in filters_fields:
-        join_samples = list(samples_ids.keys())
-
-    else:
-        join_samples = samples_join_required(fields, filters, order_by)
+    join_samples = samples_join_required(fields, filters, order_by)
 
     for sample_name in join_samples:
         if sample_name in samples_ids:
@@ -731,10 +862,50 @@ def build_sql_query(
             sql_query += f""" LEFT JOIN genotypes `sample_{sample_name}` ON `sample_{sample_name}`.variant_id = variants.id AND `sample_{sample_name}`.sample_id = {sample_id}"""
 
     # Add Where Clause
+    where_clause = ""
     if filters:
-        where_clause = filters_to_sql(filters, join_samples)
-        if where_clause and where_clause != "()":
-            sql_query += " WHERE " + where_clause
+        # $any, $all, $count only consider the selected samples, or all samples if none
+        aggregate_samples = None
+        if selected_samples:
+            aggregate_samples = {
+                name: samples_ids[name] for name in selected_samples if name in samples_ids
+            }
+
+        where_clause = filters_to_sql(filters, aggregate_samples, params)
+        if where_clause == "()":
+            where_clause = ""
+
+    return sql_query, where_clause
+
+
+def _build_sql_query(
+    conn: sqlite3.Connection,
+    fields,
+    source="variants",
+    filters={},
+    order_by=[],
+    limit=50,
+    offset=0,
+    selected_samples=None,
+    params: list = None,
+):
+    """Build SQL SELECT query; values are bound to `params` if it is a list
+
+    See Also:
+        :meth:`build_sql_query`, :meth:`build_sql_query_with_params`
+    """
+
+    # Create fields
+    sql_fields = ["`variants`.`id`"] + fields_to_sql(fields, use_as=True)
+
+    sql_query = f"SELECT DISTINCT {','.join(sql_fields)} "
+
+    from_clause, where_clause = _build_from_where(
+        conn, fields, source, filters, order_by, selected_samples, params
+    )
+    sql_query += from_clause
+    if where_clause:
+        sql_query += " WHERE " + where_clause
 
     # Add Order By
     if order_by:
@@ -754,11 +925,242 @@ def build_sql_query(
         sql_query += f" ORDER BY {order_by_clause}"
 
     if limit:
-        sql_query += f" LIMIT {limit} OFFSET {offset}"
+        if params is None:
+            sql_query += f" LIMIT {limit} OFFSET {offset}"
+        else:
+            sql_query += " LIMIT ? OFFSET ?"
+            params.extend((limit, offset or 0))
 
     return sql_query
 
 
+def build_sql_query(
+    conn: sqlite3.Connection,
+    fields,
+    source="variants",
+    filters={},
+    order_by=[],
+    limit=50,
+    offset=0,
+    selected_samples=[],
+    **kwargs,
+):
+    """Build SQL SELECT query
+
+    Values are written as literals in the query. This is the human readable
+    version; use :meth:`build_sql_query_with_params` to execute a query.
+
+    Args:
+        fields (list): List of fields
+        source (str): source of the virtual table ( see: selection )
+        filters (dict): nested condition tree
+        order_by (list[(str,bool)]): list of tuple (fieldname, is_ascending) ;
+            If None, order_desc is not required.
+        limit (int/None): limit record count;
+            If None, offset is not required.
+        offset (int): record count per page
+        selected_samples (list): names of the samples used by samples[ANY],
+            samples[ALL] and samples[COUNT>=k] conditions; all samples if empty
+        group_by (list/None): list of field you want to group
+    """
+    return _build_sql_query(
+        conn, fields, source, filters, order_by, limit, offset, selected_samples
+    )
+
+
+def build_sql_query_with_params(
+    conn: sqlite3.Connection,
+    fields,
+    source="variants",
+    filters={},
+    order_by=[],
+    limit=50,
+    offset=0,
+    selected_samples=[],
+    **kwargs,
+) -> tuple:
+    """Build SQL SELECT query with bound parameters
+
+    Same arguments as :meth:`build_sql_query`, but values (filters, IN-lists,
+    wordset names, source name, limit and offset) are replaced by placeholders.
+    Two queries which differ only by their values share the same SQL string,
+    so sqlite can reuse its prepared statement.
+
+    Examples:
+
+        query, params = build_sql_query_with_params(conn, ["chr"], filters={"ref": "A"})
+        conn.execute(query, params)
+
+    Returns:
+        tuple: (query, params) where params is a tuple of values to bind
+    """
+    params = []
+    query = _build_sql_query(
+        conn, fields, source, filters, order_by, limit, offset, selected_samples, params
+    )
+    return query, tuple(params)
+
+
+def build_group_by_query_with_params(
+    conn: sqlite3.Connection,
+    groupby: list,
+    source="variants",
+    filters={},
+    selected_samples=[],
+    excluded_groups: list = None,
+) -> tuple:
+    """Build SQL query counting distinct variants per group of values
+
+    GROUP BY is applied directly to the tables: only the joins required by the
+    groupby fields and the filters are made. Groups whose values are all NULL
+    are not counted.
+
+    Examples:
+
+        query, params = build_group_by_query_with_params(conn, ["chr", "ann.gene"])
+        # (chr, gene, count) rows
+        conn.execute(query, params)
+
+    Args:
+        groupby (list): Fields defining the groups
+        source (str): source of the virtual table ( see: selection )
+        filters (dict): nested condition tree
+        selected_samples (list): names of the samples used by samples[ANY],
+            samples[ALL] and samples[COUNT>=k] conditions; all samples if empty
+        excluded_groups (list[tuple]): If given, the query returns the number of
+            distinct variants which belong to other groups than these ones
+
+    Returns:
+        tuple: (query, params) where params is a tuple of values to bind
+    """
+    params = []
+    from_clause, where_clause = _build_from_where(
+        conn, groupby, source, filters, None, selected_samples, params
+    )
+    sql_fields = fields_to_sql(groupby)
+
+    conditions = [f"({where_clause})"] if where_clause else []
+    conditions.append("NOT (" + " AND ".join(f"{field} IS NULL" for field in sql_fields) + ")")
+
+    if excluded_groups is not None:
+        groups = []
+        for group in excluded_groups:
+            groups.append("(" + " AND ".join(f"{field} IS ?" for field in sql_fields) + ")")
+            params.extend(group)
+        if groups:
+            conditions.append("NOT (" + " OR ".join(groups) + ")")
+
+        query = f"SELECT COUNT(DISTINCT `variants`.`id`) {from_clause}"
+        query += " WHERE " + " AND ".join(conditions)
+        return query, tuple(params)
+
+    positions = ",".join(str(i + 1) for i in range(len(groupby)))
+    query = f"SELECT {','.join(fields_to_sql(groupby, use_as=True))}, "
+    query += f"COUNT(DISTINCT `variants`.`id`) AS `count` {from_clause}"
+    query += " WHERE " + " AND ".join(conditions)
+    query += f" GROUP BY {positions}"
+    return query, tuple(params)
+
+
+def build_positions_query_with_params(
+    conn: sqlite3.Connection,
+    chroms: list,
+    start: int,
+    end: int,
+    source="variants",
+    filters={},
+    selected_samples=[],
+) -> tuple:
+    """Build SQL query counting distinct variants per position in a genomic window
+
+    The window condition is applied on (chr, pos), which is covered by the
+    unique index of the variants table.
+
+    Examples:
+
+        query, params = build_positions_query_with_params(conn, ["11", "chr11"], 100, 200)
+        # (pos, count) rows sorted by pos
+        conn.execute(query, params)
+
+    Args:
+        chroms (list): Names of the chromosome (ex: ["7", "chr7"]); any chromosome if None
+        start (int): First position of the window
+        end (int): Last position of the window
+        source (str): source of the virtual table ( see: selection )
+        filters (dict): nested condition tree
+        selected_samples (list): names of the samples used by samples[ANY],
+            samples[ALL] and samples[COUNT>=k] conditions; all samples if empty
+
+    Returns:
+        tuple: (query, params) where params is a tuple of values to bind
+    """
+    params = []
+    from_clause, where_clause = _build_from_where(
+        conn, ["pos"], source, filters, None, selected_samples, params
+    )
+
+    conditions = [f"({where_clause})"] if where_clause else []
+    if chroms is not None:
+        conditions.append(f"`variants`.`chr` IN ({','.join('?' * len(chroms))})")
+        params.extend(chroms)
+    conditions.append("`variants`.`pos` BETWEEN ? AND ?")
+    params.extend((start, end))
+
+    query = f"SELECT `variants`.`pos`, COUNT(DISTINCT `variants`.`id`) {from_clause}"
+    query += " WHERE " + " AND ".join(conditions)
+    query += " GROUP BY `variants`.`pos` ORDER BY `variants`.`pos`"
+    return query, tuple(params)
+
+
+def keyset_filters(filters: dict, order_by: list, row: dict) -> dict:
+    """Return filters restricted to the rows which follow `row` in the order_by order
+
+    A query can then read the next rows with a keyset cursor instead of an
+    OFFSET, which makes sqlite read and sort all the previous rows again.
+    order_by must end with a unique field (like `id`) so that rows are totally
+    ordered.
+
+    Examples:
+        keyset_filters({"ref": "A"}, [("pos", False), ("id", True)], {"pos": 10, "id": 3})
+        # {"$and": [
+        #     {"$or": [
+        #         {"pos": {"$lt": 10}},
+        #         {"$and": [{"pos": 10}, {"id": {"$gt": 3}}]}
+        #     ]},
+        #     {"ref": "A"}
+        # ]}
+
+    Args:
+        filters (dict): nested tree of conditions
+        order_by (list[(str,bool)]): list of tuple (fieldname, is_ascending)
+        row (dict): last row read by the previous query
+
+    Returns:
+        dict/None: None if a value of row is missing or NULL (NULL values can't
+            be compared); the next rows must be read with an OFFSET.
+    """
+    if not order_by or any(row.get(field) is None for field, _ in order_by):
+        return None
+
+    cursor = []
+    for i, (field, ascending) in enumerate(order_by):
+        operator = "$gt" if ascending else "$lt"
+        condition = {field: {operator: row[field]}}
+        if not ascending:
+            # NULL values come last in descending order
+            condition = {"$or": [condition, {field: None}]}
+
+        equals = [{name: row[name]} for name, _ in order_by[:i]]
+        cursor.append({"$and": equals + [condition]} if equals else condition)
+
+    cursor = cursor[0] if len(cursor) == 1 else {"$or": cursor}
+
+    if filters and filters_to_sql(filters) not in ("", "()"):
+        return {"$and": [cursor, filters]}
+
+    return cursor
+
+
 def build_vql_query(
     fields,
     source="variants",
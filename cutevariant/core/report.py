@@ -3,13 +3,22 @@
 import getpass
 import jinja2
 import markdown
+import multiprocessing
 import os
+import re
 import sqlite3
 import typing
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
 from cutevariant.config import Config
 from cutevariant.core import sql
+from cutevariant.core.sql_progress import QueryCancelled
 from cutevariant import constants
+from cutevariant import commons as cm
+
+# Seconds between two checks of the cancellation of the reports
+REPORTS_POLL_INTERVAL = 0.2
 
 
 class AbstractReport:
@@ -60,16 +69,23 @@ def __init__(self, conn: sqlite3.Connection, sample_id: int):
         super().__init__(conn)
         self._sample_id = sample_id
         self._variant_classif_threshold = 1
+        self._sample = None
 
     def set_variant_classif_threshold(self, threshold: int):
         self._variant_classif_threshold = threshold
 
+    def _get_sample_row(self) -> dict:
+        """Return the row of the sample, read once"""
+        if self._sample is None:
+            self._sample = sql.get_sample(self._conn, self._sample_id)
+        return dict(self._sample)
+
     def get_sample(self) -> dict:
         """Return data from samples tables
         Returns:
             dict
         """
-        sample = sql.get_sample(self._conn, self._sample_id)
+        sample = self._get_sample_row()
         sample["tags"] = self._tags_to_list(sample["tags"])
         sample_classifs = SampleReport._classif_number_to_label("samples")
         sample["classification"] = sample_classifs.get(
@@ -79,7 +95,26 @@ def get_sample(self) -> dict:
         return sample
 
     def get_stats(self) -> dict:
-        """Return variants stat of the current samples"""
+        """Return variants stat of the current samples
+
+        All the stats are computed from one query on the genotypes of the sample.
+        """
+        # (gt, genotype classification, variant classification, count) rows
+        rows = self._conn.execute(
+            """SELECT genotypes.gt, genotypes.classification, variants.classification, COUNT(*)
+            FROM genotypes INNER JOIN variants ON variants.id = genotypes.variant_id
+            WHERE genotypes.sample_id = ? AND genotypes.gt >= 0
+            GROUP BY 1, 2, 3""",
+            (self._sample_id,),
+        ).fetchall()
+
+        def count_by(key, condition):
+            counts = {}
+            for row in rows:
+                if condition(row):
+                    counts[row[key]] = counts.get(row[key], 0) + row[3]
+            return counts
+
         ##total variants per genotype
         var_per_gt = {
             "title": "Total variants per genotype",
@@ -87,8 +122,8 @@ def get_stats(self) -> dict:
             "data": [],
         }
         number_to_gt = {0: "0/0", 1: "0/1", 2: "1/1"}
-        for row in sql.get_variant_groupby_for_samples(self._conn, "gt", [self._sample_id]):
-            row = [number_to_gt[row["gt"]], row["count"]]
+        for gt, count in sorted(count_by(0, lambda row: True).items()):
+            row = [number_to_gt[gt], count]
             var_per_gt["data"].append(row)
 
         ## total variants per variant classification
@@ -98,23 +133,10 @@ def get_stats(self) -> dict:
             "data": [],
         }
         variant_classifs = SampleReport._classif_number_to_label("variants")
-        for row in sql.get_variant_as_group(
-            self._conn,
-            "classification",
-            sql.get_table_columns(self._conn, "variants"),
-            "variants",
-            {
-                "$and": [
-                    {
-                        "samples."
-                        + sql.get_sample(self._conn, self._sample_id)["name"]
-                        + ".gt": {"$gt": 0}
-                    }
-                ]
-            },
-        ):
+        counts = count_by(2, lambda row: row[0] > 0 and row[2] is not None)
+        for classification, count in counts.items():
             # if classif is not defined in config, keep the number by default
-            row = [variant_classifs.get(row["classification"], row["classification"]), row["count"]]
+            row = [variant_classifs.get(classification, classification), count]
             var_per_var_classif["data"].append(row)
 
         var_per_var_classif["data"] = sorted(var_per_var_classif["data"], key=lambda x: x[0])
@@ -126,12 +148,11 @@ def get_stats(self) -> dict:
             "data": [],
         }
         genotypes_classifs = SampleReport._classif_number_to_label("genotypes")
-        for row in sql.get_variant_groupby_for_samples(
-            self._conn, "genotypes.classification", [self._sample_id], 1
-        ):
+        counts = count_by(1, lambda row: row[0] >= 1)
+        for classification in sorted(counts, key=lambda x: (x is not None, x)):
             row = [
-                genotypes_classifs.get(row["classification"], row["classification"]),
-                row["count"],
+                genotypes_classifs.get(classification, classification),
+                counts[classification],
             ]
             var_per_gt_classif["data"].append(row)
 
@@ -144,35 +165,33 @@ def get_stats(self) -> dict:
     def get_variants(self) -> typing.List[dict]:
         """
         Return classified variants of the current samples
+
+        Variants are read with the genotype of the sample only, in one query.
         """
-        config = Config("variables") or {}
-        variant_name_pattern = config.get("variant_name_pattern") or "{chr}:{pos} - {ref}>{alt}"
-        variant_name_pattern = variant_name_pattern.replace("ann.", "annotations___")
+        variant_name_pattern = cm.variant_name_pattern()
         genotype_classifs = SampleReport._classif_number_to_label("genotypes")
         variant_classifs = SampleReport._classif_number_to_label("variants")
 
-        variants_ids = sql.get_variants(
-            self._conn,
-            ["id"],
-            "variants",
-            {
-                "$and": [
-                    {
-                        "samples."
-                        + sql.get_sample(self._conn, self._sample_id)["name"]
-                        + ".classification": {"$gte": self._variant_classif_threshold}
-                    }
-                ]
-            },
-        )
+        variant_columns = ["id"] + sql.get_table_columns(self._conn, "variants")
+        genotype_columns = sql.get_table_columns(self._conn, "genotypes")
+        sql_columns = [f"variants.`{column}`" for column in variant_columns]
+        sql_columns += [f"genotypes.`{column}`" for column in genotype_columns]
+        query = f"""SELECT {",".join(sql_columns)} FROM genotypes
+        INNER JOIN variants ON variants.id = genotypes.variant_id
+        WHERE genotypes.sample_id = ? AND genotypes.classification >= ?
+        ORDER BY variants.id"""
+
+        cursor = self._conn.cursor()
+        cursor.row_factory = None
+        rows = cursor.execute(query, (self._sample_id, self._variant_classif_threshold))
+
+        sample_name = self._get_sample_row()["name"]
         variants = []
-        for var_id in variants_ids:
-            var_id = var_id["id"]
-            var = sql.get_variant(self._conn, var_id, with_samples=True)
-            var["samples"] = [s for s in var["samples"] if s["sample_id"] == self._sample_id][
-                0
-            ]  # keep only current sample
-            var["variant_name"] = variant_name_pattern.format(**var)
+        for row in rows:
+            var = dict(zip(variant_columns, row[: len(variant_columns)]))
+            var["annotations"] = []
+            var["samples"] = dict(zip(genotype_columns, row[len(variant_columns) :]))
+            var["samples"]["name"] = sample_name
             var["classification"] = variant_classifs.get(
                 var["classification"], var["classification"]
             )
@@ -183,6 +202,24 @@ def get_variants(self) -> typing.List[dict]:
             var["samples"]["tags"] = self._tags_to_list(var["samples"]["tags"])
             variants.append(var)
 
+        # Names with annotation fields use the first annotation of each variant
+        if re.findall("ann.", variant_name_pattern) and variants:
+            annotations = {}
+            for annotation in self._conn.execute(
+                """SELECT * FROM annotations WHERE variant_id IN
+                (SELECT variant_id FROM genotypes WHERE sample_id = ? AND classification >= ?)
+                ORDER BY rowid""",
+                (self._sample_id, self._variant_classif_threshold),
+            ):
+                annotation = dict(annotation)
+                annotations.setdefault(annotation["variant_id"], annotation)
+            for var in variants:
+                if var["id"] in annotations:
+                    var["annotations"] = [annotations[var["id"]]]
+
+        for var in variants:
+            var["variant_name"] = cm.format_variant_name(var, variant_name_pattern)
+
         return variants
 
     def _tags_to_list(self, tags) -> typing.List[str]:
@@ -252,6 +289,152 @@ def create(self, output_path: str):
             f.write(output)
 
 
+def report_filename(sample_name: str) -> str:
+    """Return the name of the html report of a sample, safe for any file system"""
+    return re.sub(r"[^\w.-]+", "_", sample_name).strip("_") + ".html"
+
+
+def report_filenames(sample_names: dict) -> dict:
+    """Return the names of the html reports of several samples
+
+    Names are unique, even on case insensitive file systems: the id of the
+    sample is appended to the names which collide ("a b" and "a_b" become
+    "a_b_1.html" and "a_b_2.html").
+
+    Args:
+        sample_names (dict): {sample_id: sample name}
+
+    Returns:
+        dict: {sample_id: file name}
+    """
+    filenames = {sample_id: report_filename(name) for sample_id, name in sample_names.items()}
+    while True:
+        counts = Counter(filename.lower() for filename in filenames.values())
+        collisions = [
+            sample_id for sample_id, filename in filenames.items() if counts[filename.lower()] > 1
+        ]
+        if not collisions:
+            return filenames
+        for sample_id in collisions:
+            stem = filenames[sample_id][: -len(".html")]
+            filenames[sample_id] = f"{stem}_{sample_id}.html"
+
+
+def create_sample_report(
+    db_path: str, sample_id: int, template: str, output_path: str, threshold: int = 1
+) -> str:
+    """Create the HTML report of a sample from its own connection
+
+    Used by the worker processes of :meth:`create_sample_reports`.
+
+    Returns:
+        str: output_path
+    """
+    conn = sql.get_sql_connection(db_path, read_only=True)
+    try:
+        report = SampleReport(conn, sample_id)
+        report.set_variant_classif_threshold(threshold)
+        report.set_template(template)
+        report.create(output_path)
+    finally:
+        conn.close()
+    return output_path
+
+
+def create_sample_reports(
+    db_path: str,
+    sample_ids: typing.List[int],
+    template: str,
+    output_dir: str,
+    threshold: int = 1,
+    processes: int = None,
+    progress_callback: typing.Callable = None,
+    cancelled: typing.Callable = None,
+) -> dict:
+    """Create the HTML reports of several samples in parallel
+
+    Each report is created by a worker process with its own read only
+    connection: rendering templates and markdown comments is CPU bound and
+    is not slowed down by the GIL.
+
+    Worker processes are started with "spawn": frozen executables must call
+    multiprocessing.freeze_support() first (see cutevariant.__main__).
+
+    When `cancelled` returns True, the reports which are not started are
+    cancelled and QueryCancelled is raised; the running ones are finished
+    by their worker before the pool is shut down.
+
+    Args:
+        db_path (str): Path of the project database (":memory:" is not allowed)
+        sample_ids (list[int]): Ids of the samples
+        template (str): Path of the jinja2 html template
+        output_dir (str): Directory of the reports, named after the samples
+            (see :meth:`report_filenames`)
+        threshold (int): Minimal genotype classification of the reported variants
+        processes (int): Number of worker processes; os.cpu_count() if None.
+            Reports are created in the current process if 1.
+        progress_callback (Callable): Called with a message after each report
+        cancelled (Callable): Return True if the reports have been cancelled
+
+    Returns:
+        dict: {sample_id: path of the report}
+
+    Raises:
+        QueryCancelled: If the reports have been cancelled
+    """
+    if db_path == ":memory:":
+        raise ValueError("Reports can't be created in parallel from an in-memory database")
+
+    conn = sql.get_sql_connection(db_path, read_only=True)
+    try:
+        names = dict(conn.execute("SELECT id, name FROM samples"))
+    finally:
+        conn.close()
+
+    filenames = report_filenames({sample_id: names[sample_id] for sample_id in sample_ids})
+    jobs = {sample_id: os.path.join(output_dir, filenames[sample_id]) for sample_id in sample_ids}
+    os.makedirs(output_dir, exist_ok=True)
+    processes = min(processes or os.cpu_count() or 1, len(jobs))
+
+    def progress(done):
+        if progress_callback:
+            progress_callback(f"{done}/{len(jobs)} reports created")
+
+    def check_cancelled():
+        if cancelled and cancelled():
+            raise QueryCancelled("Reports cancelled")
+
+    if processes <= 1:
+        for done, (sample_id, path) in enumerate(jobs.items(), 1):
+            check_cancelled()
+            create_sample_report(db_path, sample_id, template, path, threshold)
+            progress(done)
+        return jobs
+
+    # "spawn" does not copy the threads and connections of the GUI process
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(processes, mp_context=context)
+    try:
+        pending = {
+            executor.submit(create_sample_report, db_path, sample_id, template, path, threshold)
+            for sample_id, path in jobs.items()
+        }
+        done = 0
+        while pending:
+            check_cancelled()
+            finished, pending = wait(pending, REPORTS_POLL_INTERVAL, FIRST_COMPLETED)
+            for future in finished:
+                # Raise the error of a failed report
+                future.result()
+                done += 1
+                progress(done)
+    finally:
+        # Does nothing when all the reports are created
+        executor.shutdown(cancel_futures=True)
+
+    return jobs
+
+
 if __name__ == "__main__":
     from cutevariant.core import sql
     from cutevariant.commons import create_fake_conn
@@ -91,6 +91,10 @@
 import json
 import os
 import getpass
+import threading
+import time
+from contextlib import contextmanager
+from urllib.request import pathname2url
 
 from typing import Dict, List, Callable, Iterable
 from datetime import datetime
@@ -100,7 +104,10 @@
 import cutevariant.commons as cm
 
 import cutevariant.core.querybuilder as qb
+import cutevariant.core.parallel as parallel
+from cutevariant.core import metrics as project_metrics
 from cutevariant.core.sql_aggregator import StdevFunc
+from cutevariant.core.sql_regexp import regexp
 from cutevariant.core.reader import AbstractReader
 from cutevariant.core.writer import AbstractWriter
 from cutevariant.core.reader.pedreader import PedReader
@@ -353,11 +360,78 @@
 # ===================================================
 
 
-def get_sql_connection(filepath: str) -> sqlite3.Connection:
+def database_stamp(conn: sqlite3.Connection) -> tuple:
+    """Return a value which changes whenever the database is modified
+
+    Changes made by the connection itself (`total_changes`) and by other
+    connections (`PRAGMA data_version`), including schema changes, are seen.
+    Stamps of different connections must not be compared.
+    """
+    versions = conn.execute("SELECT * FROM pragma_data_version, pragma_schema_version")
+    return (conn.total_changes, tuple(versions.fetchone()))
+
+
+class CachedConnection(sqlite3.Connection):
+    """Sqlite3 connection which keeps a cache of schema lookups
+
+    The query builder needs the samples ids or the fields of the project for
+    every query. These lookups are cached here, per connection, and dropped as
+    soon as the database changes, either from this connection (`total_changes`)
+    or from another one (`PRAGMA data_version`).
+
+    See Also:
+        :meth:`cached_lookup`
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lookup_cache = {}
+        self._lookup_stamp = None
+
+    def cached_lookup(self, key: str, function: Callable):
+        """Return function(self), computed once while the database is unchanged
+
+        Args:
+            key (str): Cache key
+            function (Callable): Function which takes the connection as argument
+        """
+        stamp = database_stamp(self)
+        if stamp != self._lookup_stamp:
+            self._lookup_cache.clear()
+            self._lookup_stamp = stamp
+
+        if key not in self._lookup_cache:
+            self._lookup_cache[key] = function(self)
+
+        return self._lookup_cache[key]
+
+
+def cached_lookup(conn: sqlite3.Connection, key: str, function: Callable):
+    """Return function(conn), cached if the connection supports it
+
+    Connections returned by :meth:`get_sql_connection` cache the result;
+    other sqlite3 connections compute it at each call.
+
+    Examples:
+
+        samples = cached_lookup(conn, "samples", lambda c: list(get_samples(c)))
+    """
+    if isinstance(conn, CachedConnection):
+        return conn.cached_lookup(key, function)
+    return function(conn)
+
+
+def get_sql_connection(
+    filepath: str, read_only=False, check_same_thread=True
+) -> sqlite3.Connection:
     """Open a SQLite database and return the connection object
 
     Args:
         filepath (str): sqlite filepath
+        read_only (bool): Open the database file in read only mode
+            (used by workers which only read the project)
+        check_same_thread (bool): If False, the connection can be used by
+            other threads than the one which created it, one at a time
 
     Returns:
         sqlite3.Connection: Sqlite3 Connection
@@ -366,11 +440,24 @@ def get_sql_connection(filepath: str) -> sqlite3.Connection:
             The connection also supports
             - REGEXP function
             - DESCRIBE_QUANT aggregate
+            Project files opened for writing are switched to JOURNAL_MODE.
     """
 
     # CUSTOM TYPE
 
-    connection = sqlite3.connect(filepath)
+    if read_only:
+        uri = "file:" + pathname2url(os.path.abspath(filepath)) + "?mode=ro"
+        connection = sqlite3.connect(
+            uri, uri=True, factory=CachedConnection, check_same_thread=check_same_thread
+        )
+        connection.execute("PRAGMA query_only = ON")
+    else:
+        connection = sqlite3.connect(
+            filepath, factory=CachedConnection, check_same_thread=check_same_thread
+        )
+        if filepath and filepath != ":memory:":
+            set_journal_mode(connection)
+
     # Activate Foreign keys
     connection.execute("PRAGMA foreign_keys = ON")
     connection.row_factory = sqlite3.Row
@@ -379,11 +466,11 @@ def get_sql_connection(filepath: str) -> sqlite3.Connection:
     assert foreign_keys_status == 1, "Foreign keys can't be activated :("
 
     # Create function for SQLite
-    def regexp(expr, item):
-        # Need to cast item to str... costly
-        return re.search(expr, str(item)) is not None
-
-    connection.create_function("REGEXP", 2, regexp)
+    try:
+        # Deterministic functions can be factored out of loops by sqlite
+        connection.create_function("REGEXP", 2, regexp, deterministic=True)
+    except sqlite3.NotSupportedError:
+        connection.create_function("REGEXP", 2, regexp)
     connection.create_function("current_user", 0, lambda: getpass.getuser())
     connection.create_aggregate("STD", 1, StdevFunc)
 
@@ -396,6 +483,100 @@ def regexp(expr, item):
     return connection
 
 
+## Journal mode ================================================================
+
+# Journal mode of project files. In WAL mode, readers (background queries)
+# and the writer don't block each other.
+JOURNAL_MODE = "WAL"
+
+# Number of WAL pages which triggers an automatic checkpoint on commit
+WAL_AUTOCHECKPOINT = 1000
+
+# Size in bytes the WAL file is truncated to after a checkpoint
+WAL_SIZE_LIMIT = 64 * 1024 * 1024
+
+# Busy timeout in seconds while switching an existing project to WAL; the
+# switch needs the file for itself, it is skipped if another process uses it
+JOURNAL_MODE_TIMEOUT = 0.2
+
+
+def set_journal_mode(conn: sqlite3.Connection, mode: str = None) -> str:
+    """Set the journal mode of the database and return the actual mode
+
+    The WAL mode is persistent: projects created with the rollback journal
+    are migrated the first time they are opened. If the migration is not
+    possible (project opened by another process, read only file), the
+    current mode is kept.
+
+    Args:
+        conn (sqlite3.Connection): Sqlite3 connection, without transaction
+        mode (str): Journal mode, default is JOURNAL_MODE
+    """
+    mode = (mode or JOURNAL_MODE).lower()
+    current = conn.execute("PRAGMA journal_mode").fetchone()[0].lower()
+
+    if current != mode:
+        busy_timeout = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+        conn.execute(f"PRAGMA busy_timeout = {int(JOURNAL_MODE_TIMEOUT * 1000)}")
+        try:
+            current = conn.execute(f"PRAGMA journal_mode = {mode}").fetchone()[0].lower()
+        except sqlite3.DatabaseError as e:
+            LOGGER.warning("Cannot set journal mode %s (%s), keep %s", mode, e, current)
+        finally:
+            conn.execute(f"PRAGMA busy_timeout = {busy_timeout}")
+
+    if current == "wal":
+        # Durable across application crashes; only a power loss can roll
+        # back the last commits
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA wal_autocheckpoint = {WAL_AUTOCHECKPOINT}")
+        conn.execute(f"PRAGMA journal_size_limit = {WAL_SIZE_LIMIT}")
+
+    return current
+
+
+def checkpoint(conn: sqlite3.Connection, mode: str = "PASSIVE") -> tuple:
+    """Copy the content of the WAL file into the database file
+
+    Commits trigger PASSIVE checkpoints automatically. Call it with TRUNCATE
+    after large writes or before closing the project, so the WAL file
+    doesn't keep the size of the largest transaction.
+
+    Args:
+        conn (sqlite3.Connection): Sqlite3 connection
+        mode (str): PASSIVE, FULL, RESTART or TRUNCATE
+
+    Returns:
+        tuple: (busy, WAL pages, checkpointed pages); see sqlite documentation.
+            (0, -1, -1) if the database is not in WAL mode.
+    """
+    return tuple(conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone())
+
+
+def close_sql_connection(conn: sqlite3.Connection):
+    """Checkpoint and close a connection returned by :meth:`get_sql_connection`
+
+    The read only connections to the same file are closed as well: the WAL
+    file can only be removed by the last connection.
+    """
+    try:
+        filename = get_database_file_name(conn)
+    except sqlite3.ProgrammingError:
+        # Already closed
+        return
+
+    if filename:
+        with _pools_lock:
+            pool = _pools.pop(os.path.abspath(filename), None)
+        if pool:
+            pool.close()
+        try:
+            checkpoint(conn, "TRUNCATE")
+        except sqlite3.DatabaseError as e:
+            LOGGER.warning("Cannot checkpoint %s: %s", filename, e)
+    conn.close()
+
+
 def get_database_file_name(conn: sqlite3.Connection) -> str:
     """Return sqlite filename name
 
@@ -408,6 +589,254 @@ def get_database_file_name(conn: sqlite3.Connection) -> str:
     return conn.execute("PRAGMA database_list").fetchone()["file"]
 
 
+## Connection pool =============================================================
+
+# Number of idle connections kept open by a pool
+POOL_SIZE = 8
+
+# Maximum number of connections opened by a pool (borrowed and idle), and
+# seconds a borrower waits for a connection when they are all borrowed.
+# Borrowers may be nested (an executor thread holds a connection while the
+# workers of cutevariant.core.parallel borrow theirs): the limit is much
+# greater than the executor and parallel threads, and the wait has a timeout
+# instead of a deadlock.
+POOL_MAX_CONNECTIONS = 64
+POOL_ACQUIRE_TIMEOUT = 30.0
+
+# Memory mapped I/O and page cache of pooled connections, in bytes
+POOL_MMAP_SIZE = 256 * 1024 * 1024
+POOL_CACHE_SIZE = 64 * 1024 * 1024
+
+# Seconds a pooled connection waits for a lock before failing with
+# "database is locked", and retries of queries which failed this way
+POOL_BUSY_TIMEOUT = 10.0
+POOL_RETRIES = 3
+POOL_RETRY_DELAY = 0.1
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Pool of read only connections to a project file
+
+    Background queries (:class:`cutevariant.gui.sql_thread.SqlThread`,
+    :mod:`cutevariant.core.parallel` workers, the cli) borrow a connection,
+    instead of opening and configuring a new one for each query.
+    Connections are returned to the pool with their page cache and their
+    cached lookups, so the next query starts warm.
+
+    Pooled connections are read only (`query_only`), use memory mapped I/O
+    and a large page cache. They can be used from any thread, one at a time.
+
+    When no connection is idle, a new one is opened, up to `max_connections`
+    open connections; then :meth:`acquire` waits for a connection to be
+    released, and raises sqlite3.OperationalError after `timeout` seconds.
+    At most `size` idle connections are kept; extra ones are closed when they
+    are released.
+
+    Examples:
+
+        pool = get_connection_pool("project.db")
+        with pool.connection() as conn:
+            conn.execute("SELECT COUNT(*) FROM variants").fetchone()
+
+    Attributes:
+        filepath (str): Path of the database file
+        size (int): Maximum number of idle connections
+        max_connections (int): Maximum number of open connections
+        timeout (float): Seconds :meth:`acquire` waits for a connection
+    """
+
+    def __init__(
+        self, filepath: str, size: int = None, max_connections: int = None, timeout: float = None
+    ):
+        self.filepath = os.path.abspath(filepath)
+        self.size = POOL_SIZE if size is None else size
+        self.max_connections = POOL_MAX_CONNECTIONS if max_connections is None else max_connections
+        self.timeout = POOL_ACQUIRE_TIMEOUT if timeout is None else timeout
+        self._idle = []
+        # Number of borrowed connections
+        self._borrowed = 0
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._closed = False
+
+    def acquire(self, timeout: float = None) -> sqlite3.Connection:
+        """Return a healthy connection; it must be given back with :meth:`release`
+
+        Args:
+            timeout (float): Seconds to wait when max_connections are borrowed;
+                the timeout of the pool if None
+
+        Raises:
+            sqlite3.OperationalError: If no connection is released in time
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while True:
+            with self._lock:
+                while True:
+                    if self._closed:
+                        raise sqlite3.ProgrammingError("Connection pool is closed")
+                    if self._idle or self._borrowed < self.max_connections:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise sqlite3.OperationalError(
+                            f"No connection to {self.filepath} released in time: "
+                            f"{self._borrowed} connections are in use"
+                        )
+                    self._released.wait(remaining)
+
+                self._borrowed += 1
+                # Last in, first out: the most recently used connection is the warmest
+                conn = self._idle.pop() if self._idle else None
+
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    self._give_back()
+                    raise
+
+            if self._is_healthy(conn):
+                return conn
+            LOGGER.debug("ConnectionPool:: discard connection to %s", self.filepath)
+            conn.close()
+            self._give_back()
+
+    def release(self, conn: sqlite3.Connection):
+        """Give back a connection returned by :meth:`acquire`"""
+        try:
+            # Reset the state left by the borrower
+            conn.set_progress_handler(None, 0)
+            conn.progress_handler = None
+            conn.row_factory = sqlite3.Row
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            self._give_back()
+            return
+
+        with self._lock:
+            if not self._closed and len(self._idle) < self.size:
+                self._idle.append(conn)
+                conn = None
+            self._borrowed -= 1
+            self._released.notify()
+
+        if conn is not None:
+            conn.close()
+
+    def _give_back(self):
+        """Count a borrowed connection as closed"""
+        with self._lock:
+            self._borrowed -= 1
+            self._released.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager which borrows a connection"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def warm_up(self, count: int = 1):
+        """Open connections in advance, up to count idle connections"""
+        with self._lock:
+            missing = min(count, self.size) - len(self._idle)
+            # Opened connections count as borrowed until they are released
+            missing = max(0, min(missing, self.max_connections - self._borrowed))
+            self._borrowed += missing
+        for _ in range(missing):
+            try:
+                conn = self._connect()
+            except Exception:
+                self._give_back()
+                raise
+            self.release(conn)
+
+    def close(self):
+        """Close idle connections; borrowed ones are closed when released"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._released.notify_all()
+        for conn in idle:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = get_sql_connection(self.filepath, read_only=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size = {POOL_MMAP_SIZE}")
+        # Negative values are in KiB
+        conn.execute(f"PRAGMA cache_size = -{POOL_CACHE_SIZE // 1024}")
+        conn.execute(f"PRAGMA busy_timeout = {int(POOL_BUSY_TIMEOUT * 1000)}")
+        conn.file_id = self._file_id()
+        return conn
+
+    def _file_id(self) -> tuple:
+        stat = os.stat(self.filepath)
+        return (stat.st_dev, stat.st_ino)
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        """Return False if the connection is closed, broken, or if the project
+        file has been replaced since it was opened"""
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return conn.file_id == self._file_id()
+        except (sqlite3.Error, OSError):
+            return False
+
+
+def is_busy_error(error: Exception) -> bool:
+    """Return True if error is raised because another connection holds a lock"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and (
+        "database is locked" in message or "database is busy" in message
+    )
+
+
+def retry_when_busy(function: Callable, conn: sqlite3.Connection, retries: int = None):
+    """Return function(conn), called again if the database is locked
+
+    In WAL mode, readers are only blocked in rare cases (recovery of the WAL
+    after a crash, exclusive checkpoint). The query is retried after a
+    growing delay, at most `retries` times (default is POOL_RETRIES).
+    Read only functions only, as they are called several times.
+    """
+    retries = POOL_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            return function(conn)
+        except sqlite3.OperationalError as e:
+            if attempt == retries or not is_busy_error(e):
+                raise
+            LOGGER.debug("retry_when_busy:: %s, attempt %s", e, attempt + 1)
+            time.sleep(POOL_RETRY_DELAY * 2 ** attempt)
+
+
+def get_connection_pool(filepath: str) -> ConnectionPool:
+    """Return the connection pool shared by all queries on the given file"""
+    filepath = os.path.abspath(filepath)
+    with _pools_lock:
+        pool = _pools.get(filepath)
+        if pool is None or pool._closed:
+            pool = _pools[filepath] = ConnectionPool(filepath)
+        return pool
+
+
+def close_connection_pools():
+    """Close all connection pools"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
 def schema_exists(conn: sqlite3.Connection) -> bool:
     """Return if databases schema has been created
 
@@ -534,17 +963,18 @@ def alter_table_from_fields(conn: sqlite3.Connection, fields: list):
             alter_table(conn, table, new_fields)
 
 
-def count_query(conn: sqlite3.Connection, query: str) -> int:
+def count_query(conn: sqlite3.Connection, query: str, params: tuple = ()) -> int:
     """Count elements from the given query or table
 
     Args:
         conn (sqlite3.Connection): Sqlite3.Connection
         query (str): SQL Query
+        params (tuple): Values bound to the placeholders of the query
 
     Returns:
         int: count of records
     """
-    return conn.execute(f"SELECT COUNT(*) as count FROM ({query})").fetchone()[0]
+    return conn.execute(f"SELECT COUNT(*) as count FROM ({query})", params).fetchone()[0]
 
 
 # Helper functions. TODO: move them somewhere more relevant
@@ -563,16 +993,74 @@ def get_stats_info(conn, field, source="variants", filters={}):
     pass
 
 
-def get_field_info(conn, field, source="variants", filters={}, metrics=["mean", "std"]):
+# Number of rows read at once by get_field_info
+FIELD_INFO_CHUNK_SIZE = 10000
+
+# Default number of bins of the "histogram" metric
+HISTOGRAM_BINS = 10
+
+
+def read_values(cursor: sqlite3.Cursor, chunk_size: int = FIELD_INFO_CHUNK_SIZE) -> np.ndarray:
+    """Return the non NULL values of the last column of cursor as a float array
+
+    Rows are fetched by chunks into a preallocated array, doubled when it is full;
+    no Python list of the whole column is built.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor of an executed query
+        chunk_size (int): Number of rows fetched at once
+    """
+    values = np.empty(chunk_size, dtype=np.float64)
+    size = 0
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        chunk = np.fromiter((row[-1] for row in rows if row[-1] is not None), dtype=np.float64)
+        if size + len(chunk) > len(values):
+            grown = np.empty(max(2 * len(values), size + len(chunk)), dtype=np.float64)
+            grown[:size] = values[:size]
+            values = grown
+        values[size : size + len(chunk)] = chunk
+        size += len(chunk)
+
+    return values[:size]
+
+
+def sorted_quantile(values: np.ndarray, q: float) -> float:
+    """Return the q-th quantile of sorted values, with linear interpolation
+
+    This is np.quantile(values, q) without sorting the values again.
+    """
+    if len(values) == 0:
+        return None
+    position = q * (len(values) - 1)
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return float(values[low] + (values[high] - values[low]) * (position - low))
+
+
+def get_field_info(
+    conn,
+    field,
+    source="variants",
+    filters={},
+    metrics=["mean", "std"],
+    bins=HISTOGRAM_BINS,
+    selected_samples=[],
+):
     """
     Returns statistical metrics for column field in conn
     metrics is the list of statistical metrics you'd like to retrieve, among:
-    count,mean,std,min,q1,median,q3,max
+    count,mean,std,min,q1,median,q3,max,histogram
+
+    The "histogram" metric is a dict with the number of values of each bin
+    ("counts") and the bounds of the bins ("edges").
 
     For the metrics, you can also specify your own as a tuple by following the following format:
 
-    (metric_name,callable) where callable takes a numpy array and metric_name will be the key in the result
-    dictionnary. Example:
+    (metric_name,callable) where callable takes a sorted numpy array and metric_name will be the
+    key in the result dictionnary. Example:
 
     ("standard error",lambda array:np.std(array)/np.sqrt(len(array)))
 
@@ -584,27 +1072,58 @@ def get_field_info(conn, field, source="variants", filters={}, metrics=["mean",
         "arbitrary_metric":15
     }
     It WILL and SHOULD change in the future
+
+    Values are streamed into a float array and sorted once for all the
+    quantiles. Results of built-in metrics are cached per (field, source,
+    filters) until the database changes (see :meth:`cached_lookup`).
+
+    Args:
+        bins (int): Number of bins of the histogram
+        selected_samples (list): Samples used by samples[ANY/ALL/COUNT] filters
     """
+    metrics = list(metrics)
+    args = (field, source, filters, metrics, bins, list(selected_samples or []))
+    if all(isinstance(metric, str) for metric in metrics):
+        key = "field_info:" + json.dumps(args, sort_keys=True, default=str)
+        results = cached_lookup(conn, key, lambda c: _compute_field_info(c, *args))
+        # Callers can't alter the cache
+        return dict(results)
 
-    # metrics are literals, not column names, so add some single quotes to tell SQL
+    return _compute_field_info(conn, *args)
 
-    # TODO :
+
+def _compute_field_info(conn, field, source, filters, metrics, bins, selected_samples):
+    def histogram(values):
+        counts, edges = np.histogram(values, bins=bins) if len(values) else ([], [])
+        return {"counts": [int(i) for i in counts], "edges": [float(i) for i in edges]}
 
     metric_functions = {
         "count": len,
-        "mean": np.mean,
-        "std": np.std,
-        "min": lambda ar: np.quantile(ar, 0.0),
-        "q1": lambda ar: np.quantile(ar, 0.25),
-        "median": lambda ar: np.quantile(ar, 0.5),
-        "q3": lambda ar: np.quantile(ar, 0.75),
-        "max": lambda ar: np.quantile(ar, 1.0),
+        "mean": lambda ar: float(np.mean(ar)) if len(ar) else None,
+        "std": lambda ar: float(np.std(ar)) if len(ar) else None,
+        "min": lambda ar: sorted_quantile(ar, 0.0),
+        "q1": lambda ar: sorted_quantile(ar, 0.25),
+        "median": lambda ar: sorted_quantile(ar, 0.5),
+        "q3": lambda ar: sorted_quantile(ar, 0.75),
+        "max": lambda ar: sorted_quantile(ar, 1.0),
+        "histogram": histogram,
     }
 
-    conn.row_factory = None
-    query = qb.build_sql_query(conn, [field], source, filters, limit=None)
+    def field_values(range_conn, range_filters):
+        query, params = qb.build_sql_query_with_params(
+            range_conn,
+            [field],
+            source,
+            range_filters,
+            limit=None,
+            selected_samples=selected_samples,
+        )
+        # Selected columns are variants.id, then the field
+        return read_values(range_conn.execute(query, params))
 
-    data = [i[0] for i in conn.execute(query)]
+    # Values of large projects are read on several threads
+    data = np.concatenate(parallel.map_ranges(conn, field_values, filters))
+    data.sort()
 
     results = {}
     for metric in metrics:
@@ -618,8 +1137,6 @@ def get_field_info(conn, field, source="variants", filters={}, metrics=["mean",
                 value = metric_func(data)
                 results[metric_name] = value
 
-    conn.row_factory = sqlite3.Row
-
     return results
 
 
@@ -674,6 +1191,7 @@ def create_indexes(
         progress_callback("Create selection index ")
 
     create_selections_indexes(conn)
+    create_selection_has_variant_indexes(conn)
 
     if progress_callback:
         progress_callback("Create variants index ")
@@ -914,7 +1432,8 @@ def create_selections_indexes(conn: sqlite3.Connection):
 def create_selection_has_variant_indexes(conn: sqlite3.Connection):
     """Create indexes on "selection_has_variant" table
 
-    For joins between selections and variants tables
+    For joins between selections and variants tables.
+    The index is kept up to date by insertions, it is created once.
 
     Reference:
         * create_selections_indexes()
@@ -924,7 +1443,8 @@ def create_selection_has_variant_indexes(conn: sqlite3.Connection):
         conn (sqlite3.Connection/sqlite3.Cursor): Sqlite3 connection
     """
     conn.execute(
-        "CREATE INDEX `idx_selection_has_variant` ON selection_has_variant (`selection_id`)"
+        "CREATE INDEX IF NOT EXISTS `idx_selection_has_variant` "
+        "ON selection_has_variant (`selection_id`)"
     )
 
 
@@ -1004,15 +1524,13 @@ def insert_selection_from_source(
         name (str): Name of selection
         source (str): Source to select from
         filters (dict/None, optional): a filters to create selection
-        count (int/None, optional): Pre-computed variant count. If None, it does the computation
+        count (int/None, optional): Deprecated, the count of the inserted
+            variants is used
         description (str/None, optional): Description of the source
 
     Returns:
         selection_id, if lines have been inserted; None otherwise (rollback).
     """
-
-    cursor = conn.cursor()
-
     filters = filters or {}
     sql_query = qb.build_sql_query(
         conn,
@@ -1023,42 +1541,12 @@ def insert_selection_from_source(
     )
     vql_query = qb.build_vql_query(fields=["id"], source=source, filters=filters)
 
-    # Compute query count
-    # TODO : this can take a while .... need to compute only one from elsewhere
-    if count is None:
-        count = count_query(conn, sql_query)
-
     # Create selection
     selection_id = insert_selection(
-        conn=conn, query=vql_query, name=name, count=count, description=description
+        conn=conn, query=vql_query, name=name, count=0, description=description
     )
 
-    # DROP indexes
-    # For joins between selections and variants tables
-    try:
-        cursor.execute("""DROP INDEX idx_selection_has_variant""")
-    except sqlite3.OperationalError:
-        pass
-
-    # Insert into selection_has_variant table
-    # PS: We use DISTINCT keyword to statisfy the unicity constraint on
-    # (variant_id, selection_id) of "selection_has_variant" table.
-    # TODO: is DISTINCT useful here? How a variant could be associated several
-    # times with an association? ==> YES it is
-
-    # Optimized only for the creation of a selection from set operations
-    # variant_id is the only useful column here
-    q = f"""
-    INSERT INTO selection_has_variant
-    SELECT DISTINCT id, {selection_id} FROM ({sql_query})
-    """
-
-    cursor.execute(q)
-    affected_rows = cursor.rowcount
-
-    # REBUILD INDEXES
-    # For joints between selections and variants tables
-    create_selection_has_variant_indexes(cursor)
+    affected_rows = _insert_selection_variants(conn, selection_id, sql_query, "id")
 
     if affected_rows:
         conn.commit()
@@ -1068,6 +1556,38 @@ def insert_selection_from_source(
     return None
 
 
+def _insert_selection_variants(
+    conn: sqlite3.Connection, selection_id: int, query: str, id_column: str
+) -> int:
+    """Associate the variants returned by query to the selection, and set its count
+
+    The cost only depends on the size of the new selection: the index on
+    selection_has_variant is kept, and updated with ids in increasing order,
+    as are the rows of the primary key (variant_id, selection_id).
+
+    Args:
+        conn (sqlite3.connection): Sqlite3 connection
+        selection_id (int): Id of the selection
+        query (str): SQL query which returns variant ids, maybe several times
+        id_column (str): Column of the variant ids in the query
+
+    Returns:
+        int: Number of variants in the selection.
+            The transaction is left open.
+    """
+    # Projects created before the index was part of the schema
+    create_selection_has_variant_indexes(conn)
+
+    cursor = conn.execute(
+        f"""INSERT INTO selection_has_variant (variant_id, selection_id)
+        SELECT DISTINCT {id_column}, {selection_id} FROM ({query}) ORDER BY {id_column}"""
+    )
+    count = cursor.rowcount
+
+    conn.execute("UPDATE selections SET count = ? WHERE id = ?", (count, selection_id))
+    return count
+
+
 def insert_selection_from_samples(
     conn: sqlite3.Connection,
     samples: list,
@@ -1160,7 +1680,8 @@ def insert_selection_from_sql(
         conn (sqlite3.connection): Sqlite3 connection
         query (str): SQL query that select all variant ids. See `from_selection`
         name (str): Name of selection
-        count (int/None, optional): Precomputed variant count
+        count (int/None, optional): Deprecated, the count of the inserted
+            variants is used
         from_selection (bool, optional): Use a different
             field name for variants ids; `variant_id` if `from_selection` is `True`,
             just `id` if `False`.
@@ -1169,52 +1690,15 @@ def insert_selection_from_sql(
     Returns:
         selection_id, if lines have been inserted; None otherwise (rollback).
     """
-    cursor = conn.cursor()
-
-    # Compute query count
-    # TODO : this can take a while .... need to compute only one from elsewhere
-    if count is None:
-        count = count_query(conn=conn, query=query)
-
     # Create selection
     selection_id = insert_selection(
-        conn=conn, query=query, name=name, count=count, description=description
+        conn=conn, query=query, name=name, count=0, description=description
     )
 
-    # DROP indexes
-    # For joins between selections and variants tables
-    try:
-        cursor.execute("""DROP INDEX idx_selection_has_variant""")
-    except sqlite3.OperationalError:
-        pass
-
-    # Insert into selection_has_variant table
-    # PS: We use DISTINCT keyword to statisfy the unicity constraint on
-    # (variant_id, selection_id) of "selection_has_variant" table.
-    # TODO: is DISTINCT useful here? How a variant could be associated several
-    # times with an association?
-    if from_selection:
-        # Optimized only for the creation of a selection from set operations
-        # variant_id is the only useful column here
-        q = f"""
-        INSERT INTO selection_has_variant
-        SELECT DISTINCT variant_id, {selection_id} FROM ({query})
-        """
-    else:
-        # Fallback
-        # Used when creating a selection from a VQL query in the UI
-        # Default behavior => a variant is based on chr,pos,ref,alt
-        q = f"""
-        INSERT INTO selection_has_variant
-        SELECT DISTINCT id, {selection_id} FROM ({query})
-        """
-
-    cursor.execute(q)
-    affected_rows = cursor.rowcount
-
-    # REBUILD INDEXES
-    # For joints between selections and variants tables
-    create_selection_has_variant_indexes(cursor)
+    # The variant ids are in the variant_id column for queries built from
+    # selections (set operations, bed intervals), in the id column otherwise
+    id_column = "variant_id" if from_selection else "id"
+    affected_rows = _insert_selection_variants(conn, selection_id, query, id_column)
 
     if affected_rows:
         conn.commit()
@@ -1225,6 +1709,43 @@ def insert_selection_from_sql(
     return None
 
 
+def insert_selection_from_ids(
+    conn: sqlite3.Connection,
+    ids: Iterable[int],
+    name: str,
+    query: str = None,
+    description: str = None,
+) -> int:
+    """Create a selection from variant ids
+
+    Args:
+        conn (sqlite3.connection): Sqlite3 connection
+        ids (Iterable[int]): Unique variant ids, preferably sorted
+            (see :meth:`evaluate_set_expression`)
+        name (str): Name of selection
+        query (str/None, optional): VQL query which gives these variants
+        description (str/None, optional): Description of the source
+
+    Returns:
+        selection_id, if lines have been inserted; None otherwise.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if not len(ids):
+        return None
+
+    selection_id = insert_selection(
+        conn=conn, query=query, name=name, count=len(ids), description=description
+    )
+    create_selection_has_variant_indexes(conn)
+
+    conn.executemany(
+        "INSERT INTO selection_has_variant (variant_id, selection_id) VALUES (?, ?)",
+        zip(ids.tolist(), it.repeat(selection_id)),
+    )
+    conn.commit()
+    return selection_id
+
+
 def insert_selection_from_bed(
     conn: sqlite3.Connection, source: str, target: str, bed_intervals, description: str = None
 ) -> int:
@@ -1628,6 +2149,110 @@ def subtract_variants(query1, query2, **kwargs):
     return f"""{query1} EXCEPT {query2}"""
 
 
+# NumPy set operation of each VQL set operator; id arrays are sorted and unique
+SET_OPERATIONS = {
+    "|": np.union1d,
+    "&": partial(np.intersect1d, assume_unique=True),
+    "-": partial(np.setdiff1d, assume_unique=True),
+}
+
+
+def get_selection_variant_ids(conn: sqlite3.Connection, name: str) -> np.ndarray:
+    """Return the sorted ids of the variants of a selection
+
+    Args:
+        conn (sqlite3.Connection): Sqlite3 connection
+        name (str): Name of the selection; DEFAULT_SELECTION_NAME for all variants
+
+    Returns:
+        np.ndarray: variant ids (int64)
+
+    Raises:
+        KeyError: If the selection doesn't exist
+    """
+    if name == DEFAULT_SELECTION_NAME:
+        # Read in the order of the rowid: already sorted
+        cursor = conn.execute("SELECT id FROM variants ORDER BY id")
+        return np.fromiter((row[0] for row in cursor), dtype=np.int64)
+
+    row = conn.execute("SELECT id FROM selections WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        raise KeyError(name)
+
+    cursor = conn.execute(
+        "SELECT variant_id FROM selection_has_variant WHERE selection_id = ?", (row[0],)
+    )
+    # Rows follow idx_selection_has_variant, i.e. the insertion order
+    return np.unique(np.fromiter((row[0] for row in cursor), dtype=np.int64))
+
+
+def get_set_expression_operands(expression) -> set:
+    """Return the names of the selections used by a set expression
+
+    See Also:
+        :meth:`evaluate_set_expression`
+    """
+    if isinstance(expression, str):
+        return {expression}
+    _, left, right = expression
+    return get_set_expression_operands(left) | get_set_expression_operands(right)
+
+
+def evaluate_set_expression(conn: sqlite3.Connection, expression) -> np.ndarray:
+    """Return the sorted ids of the variants described by a set expression
+
+    The expression is evaluated on the id lists of the selections, without
+    building SQL queries for them. Each selection is read once, even if it
+    appears several times in the expression.
+
+    Args:
+        conn (sqlite3.Connection): Sqlite3 connection
+        expression (str/tuple): Name of a selection, or a tuple
+            (operator, left expression, right expression).
+            Operators are "|" (union), "&" (intersection) and "-" (difference).
+
+    Examples:
+
+        # CREATE boby = (A | B) & C
+        evaluate_set_expression(conn, ("&", ("|", "A", "B"), "C"))
+        # array([ 2,  5, 11])
+
+    Raises:
+        KeyError: If a selection doesn't exist
+    """
+    ids = {
+        name: get_selection_variant_ids(conn, name)
+        for name in get_set_expression_operands(expression)
+    }
+
+    def evaluate(node):
+        if isinstance(node, str):
+            return ids[node]
+        operator, left, right = node
+        return SET_OPERATIONS[operator](evaluate(left), evaluate(right))
+
+    return evaluate(expression)
+
+
+def set_expression_to_vql(expression) -> str:
+    """Return the VQL text of a set expression
+
+    Examples:
+
+        set_expression_to_vql(("&", ("|", "A", "B"), "C"))
+        # "(A | B) & C"
+    """
+    if isinstance(expression, str):
+        return expression
+    operator, left, right = expression
+    left = set_expression_to_vql(left)
+    right = set_expression_to_vql(right)
+    # Operators are applied from left to right: only right operands need parentheses
+    if not isinstance(expression[2], str):
+        right = f"({right})"
+    return f"{left} {operator} {right}"
+
+
 ## fields table ================================================================
 
 
@@ -1850,6 +2475,216 @@ def get_field_unique_values(conn, field_name: str, like: str = None, limit=None)
     return [i[field_name] for i in conn.execute(query)]
 
 
+## field values table ==========================================================
+
+# Maximum number of values stored in the dictionary of a field
+MAX_FIELD_VALUES = 10000
+
+# Greater than any character: prefix <= value < prefix + MAX_CHAR
+MAX_CHAR = "\U0010ffff"
+
+# Table storing the values of each field category
+FIELD_VALUES_TABLES = {"variants": "variants", "annotations": "annotations", "samples": "genotypes"}
+
+
+def create_table_field_values(conn: sqlite3.Connection):
+    """Create the tables of the per-field value dictionaries
+
+    - field_values: distinct values of the text fields, with their number of
+        occurrences. Values are compared case insensitively, so that the
+        index serves case insensitive prefix searches.
+    - field_dictionaries: fields which have a dictionary; `truncated` is 1 if
+        the field has more than MAX_FIELD_VALUES values (the least frequent
+        ones are not stored).
+    """
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS field_values (
+        category TEXT NOT NULL,
+        field TEXT NOT NULL,
+        value TEXT NOT NULL COLLATE NOCASE,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (category, field, value COLLATE BINARY)
+        ) WITHOUT ROWID"""
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_field_values_prefix ON field_values (category, field, value)"
+    )
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS field_dictionaries (
+        category TEXT NOT NULL,
+        field TEXT NOT NULL,
+        truncated INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (category, field)
+        )"""
+    )
+
+
+def _field_values_fields(conn: sqlite3.Connection) -> Dict[str, List[str]]:
+    """Return {category: [name, ...]} of the text fields which get a dictionary"""
+    fields = defaultdict(list)
+    columns = {table: set(get_table_columns(conn, table)) for table in FIELD_VALUES_TABLES.values()}
+    for field in get_fields(conn):
+        table = FIELD_VALUES_TABLES.get(field["category"])
+        if field["type"] == "str" and table and field["name"] in columns[table]:
+            fields[field["category"]].append(field["name"])
+    return fields
+
+
+def drop_field_values_triggers(conn: sqlite3.Connection):
+    """Drop the triggers updating field_values (before a bulk insert)"""
+    for table in FIELD_VALUES_TABLES.values():
+        for event in ("insert", "update", "delete"):
+            conn.execute(f"DROP TRIGGER IF EXISTS field_values_after_{event}_on_{table}")
+
+
+def create_field_values_triggers(conn: sqlite3.Connection):
+    """Create the triggers which keep field_values up to date
+
+    Each insert, update or delete of a text field updates the count of its
+    value; values are removed when they don't occur anymore.
+    """
+    drop_field_values_triggers(conn)
+
+    def add(category, name, row, sign):
+        if sign > 0:
+            return f"""INSERT INTO field_values (category, field, value, count)
+            SELECT '{category}', '{name}', {row}.`{name}`, 1 WHERE {row}.`{name}` IS NOT NULL {{when}}
+            ON CONFLICT (category, field, value COLLATE BINARY) DO UPDATE SET count = count + 1;"""
+
+        condition = f"""category = '{category}' AND field = '{name}'
+            AND value = {row}.`{name}` COLLATE BINARY {{when}}"""
+        return f"""UPDATE field_values SET count = count - 1 WHERE {condition};
+            DELETE FROM field_values WHERE {condition} AND count <= 0;"""
+
+    for category, names in _field_values_fields(conn).items():
+        table = FIELD_VALUES_TABLES[category]
+        escaped_names = ",".join(f"`{name}`" for name in names)
+
+        inserted = "".join(add(category, name, "NEW", 1).format(when="") for name in names)
+        deleted = "".join(add(category, name, "OLD", -1).format(when="") for name in names)
+        updated = "".join(
+            add(category, name, "NEW", 1).format(when=f"AND NEW.`{name}` IS NOT OLD.`{name}`")
+            + add(category, name, "OLD", -1).format(when=f"AND NEW.`{name}` IS NOT OLD.`{name}`")
+            for name in names
+        )
+
+        conn.execute(
+            f"""CREATE TRIGGER field_values_after_insert_on_{table} AFTER INSERT ON {table}
+            BEGIN {inserted} END"""
+        )
+        conn.execute(
+            f"""CREATE TRIGGER field_values_after_delete_on_{table} AFTER DELETE ON {table}
+            BEGIN {deleted} END"""
+        )
+        conn.execute(
+            f"""CREATE TRIGGER field_values_after_update_on_{table}
+            AFTER UPDATE OF {escaped_names} ON {table}
+            BEGIN {updated} END"""
+        )
+
+
+def update_field_values(
+    conn: sqlite3.Connection,
+    max_values: int = MAX_FIELD_VALUES,
+    progress_callback: Callable = None,
+):
+    """Compute the value dictionaries of all the text fields
+
+    The most frequent values of each field (up to max_values) are stored with
+    their number of occurrences in field_values. Triggers keep them up to date
+    afterwards.
+
+    Args:
+        conn (sqlite3.Connection): Sqlite3 connection
+        max_values (int): Maximum number of values stored per field
+        progress_callback (Callable): Called with a message for each field
+    """
+    create_table_field_values(conn)
+    drop_field_values_triggers(conn)
+    conn.execute("DELETE FROM field_values")
+    conn.execute("DELETE FROM field_dictionaries")
+
+    for category, names in _field_values_fields(conn).items():
+        table = FIELD_VALUES_TABLES[category]
+        for name in names:
+            if progress_callback:
+                progress_callback(f"Compute values of {category}.{name}")
+
+            # One more value than the limit tells if the field is truncated
+            rows = conn.execute(
+                f"""SELECT `{name}`, COUNT(*) FROM {table} WHERE `{name}` IS NOT NULL
+                GROUP BY `{name}` ORDER BY COUNT(*) DESC, `{name}` COLLATE NOCASE LIMIT ?""",
+                (max_values + 1,),
+            ).fetchall()
+            truncated = len(rows) > max_values
+            conn.executemany(
+                "INSERT INTO field_values (category, field, value, count) VALUES (?, ?, ?, ?)",
+                ((category, name, value, count) for value, count in rows[:max_values]),
+            )
+
+            conn.execute(
+                "INSERT INTO field_dictionaries (category, field, truncated) VALUES (?, ?, ?)",
+                (category, name, int(truncated)),
+            )
+
+    create_field_values_triggers(conn)
+    conn.commit()
+
+
+def _field_category(field_name: str) -> tuple:
+    """Return (category, name) of a field: "ann.gene" => ("annotations", "gene")"""
+    if field_name.startswith("ann."):
+        return "annotations", field_name[4:]
+    if field_name.startswith("samples."):
+        return "samples", field_name.split(".")[-1]
+    return "variants", field_name
+
+
+def _get_field_dictionaries(conn: sqlite3.Connection) -> dict:
+    """Return {(category, name): truncated} of the fields with a dictionary"""
+    if not table_exists(conn, "field_dictionaries"):
+        return {}
+    query = "SELECT category, field, truncated FROM field_dictionaries"
+    return {(row[0], row[1]): bool(row[2]) for row in conn.execute(query)}
+
+
+def get_field_values(conn: sqlite3.Connection, field_name: str, prefix: str = "", limit=50):
+    """Return the values of a field which start with prefix, most frequent first
+
+    Values come from the dictionary of the field (see :meth:`update_field_values`);
+    the prefix is case insensitive. A truncated dictionary is served as well:
+    it holds the MAX_FIELD_VALUES most frequent values of the field.
+
+    Examples:
+
+        >>> get_field_values(conn, "ann.consequence", "missense")
+        ["missense_variant", "missense_variant&splice_region_variant"]
+
+    Args:
+        conn (sqlite3.Connection): Sqlite3 connection
+        field_name (str): Field name: "filter", "ann.gene", "samples.boby.gt"...
+        prefix (str): Start of the values
+        limit (int): Maximum number of values
+
+    Returns:
+        list: Values, or None if the field has no dictionary. Use
+        :meth:`get_field_unique_values` in this case.
+    """
+    key = _field_category(field_name)
+    if key not in cached_lookup(conn, "field_dictionaries", _get_field_dictionaries):
+        return None
+
+    query = "SELECT value FROM field_values WHERE category = ? AND field = ?"
+    params = list(key)
+    if prefix:
+        query += " AND value >= ? AND value < ?"
+        params += [prefix, prefix + MAX_CHAR]
+    query += " ORDER BY count DESC, value LIMIT ?"
+    params.append(limit)
+
+    return [row[0] for row in conn.execute(query, params)]
+
+
 ## annotations table ===========================================================
 
 
@@ -2190,41 +3025,69 @@ def get_sample_variant_classification(
     return (dict(data) for data in r)
 
 
-def get_samples_from_query(conn: sqlite3.Connection, query: str):
+def get_samples_from_query(
+    conn: sqlite3.Connection, query: str, limit: int = None, offset: int = 0
+):
     """Selects all the samples matching query
     Example query:
     "classification:3,4 sex:1 phenotype:3"
     Will call:
-    "SELECT * FROM samples WHERE classification in (3,4) AND sex=1 AND phenotype=3"
+    "SELECT * FROM samples WHERE classification in (3,4) OR sex=1 OR phenotype=3"
+
+    Words without field are searched in the names; names match the samples
+    containing the word, tags the samples with a tag starting with the word.
+    Unknown fields are ignored.
 
     Args:
         conn (sqlite3.Connection)
         query (str): the query string
+        limit (int): Maximum number of samples; all of them if None
+        offset (int): Number of matching samples to skip
     """
-
-    if not query:
-        return get_samples(conn)
+    columns = {"id"} | set(get_table_columns(conn, "samples"))
 
     or_list = []
-    for word in query.split():
+    params = []
+    for word in (query or "").split():
         if ":" not in word:
             word = f"name:{word}"
-        for i in re.findall(r"(.+):(.+)", word):
-            if "," in i[1]:
-                key, val = i[0], f"{i[1]}"
-                val = ",".join([f"'{i}'" for i in val.split(",")])
-                or_list.append(f"{key} IN ({val})")
+        for key, val in re.findall(r"(.+?):(.+)", word):
+            if key not in columns:
+                LOGGER.warning("Unknown sample field: %s", key)
+                continue
+
+            values = val.split(",")
+            if key == "name":
+                for value in values:
+                    clause, clause_params = _sample_name_clause(value)
+                    or_list.append(clause)
+                    params += clause_params
+            elif key == "tags":
+                clause, clause_params = _sample_tags_clause(conn, values, prefix=True)
+                or_list.append(clause)
+                params += clause_params
             else:
-                key, val = i[0], i[1]
-                if key in ("name", "tags"):
-                    or_list.append(f"{key} LIKE '%{val}%'")
-                else:
-                    or_list.append(f"{key} = '{val}'")
+                values = [int(i) if i.lstrip("-").isdigit() else i for i in values]
+                or_list.append(f"`{key}` IN (SELECT value FROM json_each(?))")
+                params.append(json.dumps(values))
+
+    sql_query = "SELECT * FROM samples"
+    if or_list:
+        sql_query += f" WHERE {' OR '.join(or_list)}"
+
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    return (dict(data) for data in cursor.execute(*_samples_page(sql_query, params, limit, offset)))
 
-    sql_query = f"SELECT * FROM samples WHERE {' OR '.join(or_list)}"
-    # Suppose conn.row_factory = sqlite3.Row
 
-    return (dict(data) for data in conn.execute(sql_query))
+def column_names(cursor: sqlite3.Cursor) -> list:
+    """Return the field names of the columns of a select query"""
+    # THIS IS INSANE... SQLITE DOESNT RETURN ALIAS NAME WITH SQUARE BRACKET....
+    # I HAVE TO replace [] by () and go back after...
+    # TODO : Change VQL Syntax from [] to () would be a good alternative
+    # @See QUERYBUILDER
+    # See : https://stackoverflow.com/questions/41538952/issue-cursor-description-never-returns-square-bracket-in-column-name-python-2-7-sqlite3-alias
+    return [column[0].replace("(", "[").replace(")", "]") for column in cursor.description]
 
 
 def get_variants(
@@ -2243,7 +3106,7 @@ def get_variants(
 
     # TODO : rename as get_variant_as_tables ?
 
-    query = qb.build_sql_query(
+    query, params = qb.build_sql_query_with_params(
         conn,
         fields=fields,
         source=source,
@@ -2257,13 +3120,10 @@ def get_variants(
         **kwargs,
     )
 
-    for i in conn.execute(query):
-        # THIS IS INSANE... SQLITE DOESNT RETURN ALIAS NAME WITH SQUARE BRACKET....
-        # I HAVE TO replace [] by () and go back after...
-        # TODO : Change VQL Syntax from [] to () would be a good alternative
-        # @See QUERYBUILDER
-        # See : https://stackoverflow.com/questions/41538952/issue-cursor-description-never-returns-square-bracket-in-column-name-python-2-7-sqlite3-alias
-        yield {k.replace("(", "[").replace(")", "]"): v for k, v in dict(i).items()}
+    cursor = conn.execute(query, params)
+    names = column_names(cursor)
+    for values in cursor:
+        yield dict(zip(names, values))
 
 
 def get_variants_tree(
@@ -2654,34 +3514,139 @@ def insert_variants(
     insert_selection(conn, query="", name=DEFAULT_SELECTION_NAME, count=true_total)
 
 
+# Value of the groupby fields in the row of the "other" bucket
+OTHER_GROUP = "__other__"
+
+
 def get_variant_as_group(
     conn,
-    groupby: str,
-    fields: list,
-    source: str,
-    filters: dict,
+    groupby,
+    fields: list = None,
+    source: str = "variants",
+    filters: dict = {},
     order_by_count=True,
     order_desc=True,
     limit=50,
+    other=False,
+    selected_samples=[],
 ):
+    """Yield the number of distinct variants per value of groupby
 
-    order_by = "count" if order_by_count else f"`{groupby}`"
-    order_desc = "DESC" if order_desc else "ASC"
+    The count is made by a GROUP BY on the tables, with only the joins
+    required by groupby and filters. A variant with several annotations is
+    counted once per group. Groups whose values are all NULL are not counted.
 
-    subquery = qb.build_sql_query(
-        conn,
-        fields=fields,
-        source=source,
-        filters=filters,
-        limit=None,
+    Examples:
+
+        >>> list(get_variant_as_group(conn, "chr", limit=1))
+        [{"chr": "11", "count": 8, "field": "chr"}]
+        >>> list(get_variant_as_group(conn, ["chr", "ann.gene"], limit=1, other=True))
+        [
+            {"chr": "11", "ann.gene": "CFTR", "count": 5, "field": ["chr", "ann.gene"]},
+            {"chr": "__other__", "ann.gene": "__other__", "count": 3, ..., "other": True},
+        ]
+
+    Args:
+        conn (sqlite3.Connection): Sqlite3 connection
+        groupby (str or list): Field, or list of fields defining the groups
+        fields (list): Unused, kept for compatibility
+        source (str): Selection name
+        filters (dict): nested tree of conditions
+        order_by_count (bool): Sort groups by count, or by values if False
+        order_desc (bool): Sort in descending order
+        limit (int): Maximum number of groups (top-k); None for all the groups
+        other (bool): If True and groups are dropped by limit, a last row
+            counts the distinct variants of the other groups. Its values are
+            OTHER_GROUP and its "other" key is True.
+        selected_samples (list): Samples used by samples[ANY/ALL/COUNT] conditions
+
+    Yields:
+        dict: Values of the groupby fields, "count" and "field" (groupby)
+    """
+    groupby_fields = [groupby] if isinstance(groupby, str) else list(groupby)
+
+    # Partial counts of large projects are computed on several threads
+    counts = parallel.group_count(
+        conn, groupby, source=source, filters=filters, selected_samples=selected_samples
     )
 
-    query = f"""SELECT `{groupby}`, COUNT(`{groupby}`) AS count
-    FROM ({subquery}) GROUP BY `{groupby}` ORDER BY {order_by} {order_desc} LIMIT {limit}"""
-    for i in conn.execute(query):
-        res = dict(i)
-        res["field"] = groupby
-        yield res
+    if order_by_count:
+        sort_key = lambda item: item[1]
+    elif isinstance(groupby, str):
+        sort_key = lambda item: parallel.sort_key(item[0])
+    else:
+        sort_key = lambda item: [parallel.sort_key(value) for value in item[0]]
+
+    groups = sorted(counts.items(), key=sort_key, reverse=order_desc)
+    top_groups = groups if limit is None else groups[:limit]
+
+    for value, count in top_groups:
+        values = (value,) if isinstance(groupby, str) else value
+        row = dict(zip(groupby_fields, values))
+        row.update({"count": count, "field": groupby})
+        yield row
+
+    if other and len(top_groups) < len(groups):
+        excluded = [(value,) if isinstance(groupby, str) else value for value, _ in top_groups]
+        count = parallel.other_count(
+            conn, groupby_fields, excluded, source, filters, selected_samples=selected_samples
+        )
+        row = {field: OTHER_GROUP for field in groupby_fields}
+        row.update({"count": count, "field": groupby, "other": True})
+        yield row
+
+
+def chromosome_aliases(chrom: str) -> list:
+    """Return the names of a chromosome with and without the "chr" prefix
+
+    Examples:
+        >>> chromosome_aliases("chr7")
+        ["chr7", "7"]
+    """
+    if chrom.lower().startswith("chr"):
+        return [chrom, chrom[3:]]
+    return [chrom, "chr" + chrom]
+
+
+def get_variant_positions(
+    conn: sqlite3.Connection,
+    chrom: str,
+    start: int,
+    end: int,
+    source: str = "variants",
+    filters: dict = {},
+    selected_samples=[],
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """Return the positions of the variants in a genomic window, with their count
+
+    Only (pos, count) pairs are read: a window over a large gene does not load
+    the variants themselves.
+
+    Examples:
+
+        >>> get_variant_positions(conn, "chr11", 125010, 125020)
+        (array([125010, 125016]), array([1, 2]))
+
+    Args:
+        conn (sqlite3.Connection): Sqlite3 connection
+        chrom (str): Chromosome, with or without "chr" prefix; None for any chromosome
+        start (int): First position of the window
+        end (int): Last position of the window
+        source (str): Selection name
+        filters (dict): nested tree of conditions
+        selected_samples (list): Samples used by samples[ANY/ALL/COUNT] conditions
+
+    Returns:
+        tuple: Sorted positions and number of distinct variants at each position,
+        as int64 arrays
+    """
+    chroms = None if chrom is None else chromosome_aliases(str(chrom))
+    query, params = qb.build_positions_query_with_params(
+        conn, chroms, start, end, source, filters, selected_samples
+    )
+    rows = conn.execute(query, params).fetchall()
+    values = np.array(rows, dtype=np.int64).reshape(-1, 2)
+    return values[:, 0], values[:, 1]
 
 
 def get_variant_groupby_for_samples(conn: sqlite3.Connection, groupby: str, samples: List[int], gt_threshold=0, order_by=True) -> typing.Tuple[dict]:
@@ -2992,34 +3957,220 @@ def get_samples(conn: sqlite3.Connection):
     return (dict(data) for data in conn.execute("SELECT * FROM samples"))
 
 
-def search_samples(conn: sqlite3.Connection, name: str, families=[], tags=[], classifications=[]):
+def get_samples_by_names(conn: sqlite3.Connection, names: List[str]):
+    """Yield the samples with these names, sorted by id"""
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    query = "SELECT * FROM samples WHERE name IN (SELECT value FROM json_each(?)) ORDER BY id"
+    for sample in cursor.execute(query, (json.dumps(list(names)),)):
+        yield dict(sample)
+
+
+# Sample tags are stored as a cst.HAS_OPERATOR separated list in samples.tags;
+# the sample_tags table has one row per (tag, sample), kept up to date by triggers
 
-    query = """
-    SELECT * FROM samples
+
+def _split_sample_tags(source: str) -> str:
+    """Return a query of the (tag, sample_id) rows of the tags of the samples
+
+    Tags are split by a recursive query, so that they may contain any character.
+
+    Args:
+        source (str): Table or subquery with the id and tags columns of samples
     """
+    sep = cst.HAS_OPERATOR
+    return f"""SELECT trim(tag), sample_id FROM (
+        WITH RECURSIVE split(sample_id, tag, rest) AS (
+            SELECT id, '', coalesce(tags, '') || '{sep}' FROM {source}
+            UNION ALL
+            SELECT sample_id, substr(rest, 1, instr(rest, '{sep}') - 1),
+            substr(rest, instr(rest, '{sep}') + 1) FROM split WHERE rest != ''
+        )
+        SELECT sample_id, tag FROM split
+    ) WHERE trim(tag) != ''"""
+
+
+def create_table_sample_tags(conn: sqlite3.Connection):
+    """Create the sample_tags table, the index of the tags of the samples
+
+    Tags are compared case insensitively, so that the primary key serves
+    case insensitive prefix searches.
+    """
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS sample_tags (
+        tag TEXT NOT NULL COLLATE NOCASE,
+        sample_id INTEGER NOT NULL,
+        PRIMARY KEY (tag, sample_id)
+        ) WITHOUT ROWID"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sample_tags_sample_id ON sample_tags (sample_id)")
+
+
+def create_samples_search_indexes(conn: sqlite3.Connection):
+    """Create the indexes used by :meth:`search_samples` on the samples table"""
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_samples_name_nocase ON samples (name COLLATE NOCASE)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_samples_family_id ON samples (family_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_samples_classification ON samples (classification)")
+
+
+def create_sample_tags_triggers(conn: sqlite3.Connection):
+    """Create the triggers which keep sample_tags up to date with samples.tags"""
+    insert = f"""INSERT OR IGNORE INTO sample_tags (tag, sample_id)
+    {_split_sample_tags("(SELECT NEW.id AS id, NEW.tags AS tags)")};"""
+    delete = "DELETE FROM sample_tags WHERE sample_id = OLD.id;"
 
+    for event in ("insert", "update", "delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS sample_tags_after_{event}_on_samples")
+    conn.execute(
+        f"""CREATE TRIGGER sample_tags_after_insert_on_samples AFTER INSERT ON samples
+        BEGIN {insert} END"""
+    )
+    conn.execute(
+        f"""CREATE TRIGGER sample_tags_after_update_on_samples AFTER UPDATE OF tags ON samples
+        BEGIN {delete} {insert} END"""
+    )
+    conn.execute(
+        f"""CREATE TRIGGER sample_tags_after_delete_on_samples AFTER DELETE ON samples
+        BEGIN {delete} END"""
+    )
+
+
+def update_sample_tags(conn: sqlite3.Connection):
+    """Index the tags of all the samples, and create the search indexes
+
+    Projects created by older versions are searched without these indexes
+    until this function is called (it is called by :meth:`import_reader`).
+    """
+    create_table_sample_tags(conn)
+    conn.execute("DELETE FROM sample_tags")
+    conn.execute(
+        f"INSERT OR IGNORE INTO sample_tags (tag, sample_id) {_split_sample_tags('samples')}"
+    )
+    create_sample_tags_triggers(conn)
+    create_samples_search_indexes(conn)
+    conn.commit()
+
+
+def get_sample_tags(conn: sqlite3.Connection) -> List[str]:
+    """Return the tags of the samples, sorted and unique case insensitively"""
+    if not _has_sample_tags(conn):
+        tags = {}
+        for row in conn.execute("SELECT tags FROM samples"):
+            for tag in (row[0] or "").split(cst.HAS_OPERATOR):
+                tags.setdefault(tag.strip().lower(), tag.strip())
+        return sorted((tag for tag in tags.values() if tag), key=str.lower)
+    return [row[0] for row in conn.execute("SELECT DISTINCT tag FROM sample_tags ORDER BY tag")]
+
+
+def _has_sample_tags(conn: sqlite3.Connection) -> bool:
+    return cached_lookup(conn, "sample_tags", lambda c: table_exists(c, "sample_tags"))
+
+
+def _sample_name_clause(name: str, prefix=False) -> tuple:
+    """Return the clause of the samples whose name contains name, case insensitive
+
+    If prefix is True, only the names starting with name match; this search
+    uses the idx_samples_name_nocase index.
+    """
+    if prefix:
+        return (
+            "(name COLLATE NOCASE >= ? AND name COLLATE NOCASE < ?)",
+            [name, name + MAX_CHAR],
+        )
+    return "name LIKE ? ESCAPE '\\'", [f"%{escape_like(name)}%"]
+
+
+def _sample_tags_clause(conn: sqlite3.Connection, tags: List[str], prefix=False) -> tuple:
+    """Return the clause of the samples with one of the tags (or a tag starting with them)"""
+    if _has_sample_tags(conn):
+        if prefix:
+            conditions = " OR ".join(["(tag >= ? AND tag < ?)"] * len(tags))
+            params = [value for tag in tags for value in (tag, tag + MAX_CHAR)]
+        else:
+            conditions = "tag IN (SELECT value FROM json_each(?))"
+            params = [json.dumps(list(tags))]
+        return f"id IN (SELECT sample_id FROM sample_tags WHERE {conditions})", params
+
+    # Projects without tag index
+    sep = cst.HAS_OPERATOR
+    pattern = "%{sep}{tag}%" if prefix else "%{sep}{tag}{sep}%"
+    conditions = " OR ".join([f"('{sep}' || tags || '{sep}') LIKE ? ESCAPE '\\'"] * len(tags))
+    params = [pattern.format(sep=sep, tag=escape_like(tag)) for tag in tags]
+    return f"({conditions})", params
+
+
+def escape_like(value: str) -> str:
+    """Escape the wildcards of a LIKE pattern, with the '\\' escape character"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _samples_page(query: str, params: list, limit: int = None, offset: int = 0) -> tuple:
+    """Add the order and the page of the results to a samples query"""
+    query += " ORDER BY id"
+    if limit is not None:
+        query += " LIMIT ? OFFSET ?"
+        params = params + [limit, offset]
+    return query, params
+
+
+def search_samples(
+    conn: sqlite3.Connection,
+    name: str,
+    families=[],
+    tags=[],
+    classifications=[],
+    limit: int = None,
+    offset: int = 0,
+    prefix: bool = False,
+):
+    """Yield the samples matching all the criteria, sorted by id
+
+    Family ids, tags (see :meth:`update_sample_tags`), classifications and
+    name prefixes are searched with indexes.
+
+    Args:
+        conn (sqlite3.Connection): Sqlite3 connection
+        name (str): Part of the sample names, case insensitive
+        families (list[str]): Family ids
+        tags (list[str]): Samples with one of these tags
+        classifications (list[int]): Classifications
+        limit (int): Maximum number of samples; all of them if None
+        offset (int): Number of matching samples to skip
+        prefix (bool): If True, the names must start with name
+
+    Yields:
+        dict: Samples
+    """
     clauses = []
+    params = []
 
     if name:
-        clauses.append(f"name LIKE '%{name}%'")
+        clause, clause_params = _sample_name_clause(name, prefix)
+        clauses.append(clause)
+        params += clause_params
 
     if families:
-        families_clause = ",".join(f"'{i}'" for i in families)
-        clauses.append(f"family_id IN ({families_clause})")
+        clauses.append("family_id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(list(families)))
 
     if classifications:
-        classification_clause = ",".join(f"{i}" for i in classifications)
-        clauses.append(f" classification IN ({classification_clause})")
+        clauses.append("classification IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps([int(i) for i in classifications]))
 
-    # if tags:
-    #     tag_clause = ",".join(f"'{i}'" for i in tags)
-    #     clauses.append(f" tags IN ({tag_clause})")
+    if tags:
+        clause, clause_params = _sample_tags_clause(conn, tags)
+        clauses.append(clause)
+        params += clause_params
 
+    query = "SELECT * FROM samples"
     if clauses:
         query += " WHERE " + " AND ".join(clauses)
 
-    print(query)
-    for sample in conn.execute(query):
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    for sample in cursor.execute(*_samples_page(query, params, limit, offset)):
         yield dict(sample)
 
 
@@ -3385,6 +4536,9 @@ def import_reader(
         import_vcf = None
     insert_samples(conn, samples=reader.get_samples(), import_id=import_id, import_vcf=import_vcf)
 
+    # Tags and search indexes of the samples
+    update_sample_tags(conn)
+
     # insert ped
     if pedfile:
         if progress_callback:
@@ -3399,6 +4553,8 @@ def import_reader(
     if progress_callback:
         progress_callback("Insert variants. This can take a while")
     create_annotations_indexes(conn)
+    # Dictionaries are computed at once after the insertion
+    drop_field_values_triggers(conn)
     insert_variants(
         conn,
         get_clean_variants(reader.get_variants()),
@@ -3425,6 +4581,22 @@ def import_reader(
         progress_callback("Variants counts. This can take a while")
     update_variants_counts(conn, progress_callback)
 
+    # Metrics of the new variants are added to the project metrics
+    if progress_callback:
+        progress_callback("Compute metrics")
+    project_metrics.update_metrics(conn)
+
+    # Values of text fields, for autocompletion
+    if progress_callback:
+        progress_callback("Compute field values")
+    update_field_values(conn, progress_callback=progress_callback)
+
+    # Move the imported data from the WAL file to the database file
+    try:
+        checkpoint(conn, "TRUNCATE")
+    except sqlite3.DatabaseError as e:
+        LOGGER.warning("Cannot checkpoint after import: %s", e)
+
     # database creation complete
     if progress_callback:
         progress_callback("Database creation complete")
@@ -0,0 +1,139 @@
+"""Progress handler for SQLite queries: progress report, time budget and cancellation
+
+SQLite calls the progress handler of a connection every `steps` instructions
+of its virtual machine. :class:`ProgressHandler` uses these calls to:
+
+- report the progress of the query (number of VM steps and elapsed time)
+- stop the query when its time budget is exceeded
+- stop the query when :meth:`ProgressHandler.cancel` has been called, from
+  any thread. It doesn't block: the query stops at the next call.
+
+Examples:
+
+    handler = ProgressHandler(budget=QUERY_TIME_BUDGETS["count"])
+    try:
+        count = handler.run(conn, lambda conn: command.count_cmd(conn, filters=filters))
+    except QueryTimeout:
+        count = None
+
+Connections opened by :mod:`cutevariant.core.parallel` for the same query use
+the handler of the query connection.
+"""
+# Standard imports
+import sqlite3
+import time
+from typing import Callable
+
+# Default time budget in seconds of each query class; None means no limit
+QUERY_TIME_BUDGETS = {
+    "page": 10.0,
+    "count": 5.0,
+    "group_by": 30.0,
+    "stats": 60.0,
+}
+
+# Number of VM instructions between two calls of the handler
+PROGRESS_STEPS = 10_000
+
+# Minimal delay in seconds between two progress reports
+REPORT_INTERVAL = 0.1
+
+
+class QueryCancelled(sqlite3.OperationalError):
+    """Raised when a query has been cancelled"""
+
+
+class QueryTimeout(sqlite3.OperationalError):
+    """Raised when a query exceeds its time budget"""
+
+
+class ProgressHandler:
+    """Progress handler of SQLite connections
+
+    Attributes:
+        budget (float/None): Time budget in seconds; None means no limit
+        callback (Callable/None): Called with (steps, elapsed seconds) at most
+            every REPORT_INTERVAL seconds, from the thread running the query
+        steps (int): Number of VM instructions between two calls
+        cancelled (bool): True if the query has been cancelled
+        timed_out (bool): True if the query has exceeded its budget
+    """
+
+    def __init__(self, budget: float = None, callback: Callable = None, steps=PROGRESS_STEPS):
+        self.budget = budget
+        self.callback = callback
+        self.steps = steps
+        self.cancelled = False
+        self.timed_out = False
+        self.vm_steps = 0
+        self.start_time = time.perf_counter()
+        self._last_report = self.start_time
+
+    def __call__(self) -> int:
+        """Called by sqlite; return non zero to interrupt the query"""
+        if self.cancelled:
+            return 1
+
+        self.vm_steps += self.steps
+        now = time.perf_counter()
+        elapsed = now - self.start_time
+
+        if self.budget is not None and elapsed > self.budget:
+            self.timed_out = True
+            return 1
+
+        if self.callback and now - self._last_report >= REPORT_INTERVAL:
+            self._last_report = now
+            self.callback(self.vm_steps, elapsed)
+
+        return 0
+
+    @property
+    def elapsed(self) -> float:
+        """Return seconds elapsed since the handler was started"""
+        return time.perf_counter() - self.start_time
+
+    def cancel(self):
+        """Stop the query at the next call of the handler
+
+        This method can be called from any thread and doesn't wait.
+        """
+        self.cancelled = True
+
+    def install(self, conn: sqlite3.Connection):
+        """Set the handler on the connection"""
+        conn.set_progress_handler(self, self.steps)
+        try:
+            # Read by the parallel executor to install it on its own connections
+            conn.progress_handler = self
+        except AttributeError:
+            # Not a CachedConnection
+            pass
+
+    def uninstall(self, conn: sqlite3.Connection):
+        """Remove the handler from the connection"""
+        conn.set_progress_handler(None, 0)
+        try:
+            conn.progress_handler = None
+        except AttributeError:
+            pass
+
+    def run(self, conn: sqlite3.Connection, function: Callable):
+        """Return function(conn), executed with the handler installed on conn
+
+        Raises:
+            QueryCancelled: If cancel() has been called
+            QueryTimeout: If the query has exceeded its budget
+        """
+        self.start_time = self._last_report = time.perf_counter()
+        self.install(conn)
+        try:
+            return function(conn)
+        except sqlite3.OperationalError as e:
+            if self.cancelled:
+                raise QueryCancelled("Query cancelled") from e
+            if self.timed_out:
+                raise QueryTimeout(f"Query exceeded its time budget ({self.budget:g}s)") from e
+            raise
+        finally:
+            self.uninstall(conn)
@@ -0,0 +1,156 @@
+"""REGEXP function for SQLite and helpers to pre-filter regular expressions in SQL
+
+SQLite has no REGEXP implementation: `x REGEXP y` calls a user function
+registered by :meth:`cutevariant.core.sql.get_sql_connection`. This is a Python
+call per row, which is slow on large annotation tables.
+
+To avoid most of these calls, the query builder asks :meth:`regexp_prefilters`
+for the literal substrings that any match must contain, and writes cheap SQL
+tests (`instr`, `GLOB`, `LIKE`) in front of the REGEXP call.
+
+Examples:
+
+    regexp_prefilters("^CFTR.+del")
+    # ("CFTR", ["del"], False)
+    # => `gene` GLOB 'CFTR*' AND instr(`gene`, 'del') > 0 AND `gene` REGEXP '^CFTR.+del'
+"""
+# Standard imports
+import re
+from functools import lru_cache
+
+try:
+    # Python >= 3.11
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+REGEXP_CACHE_SIZE = 256
+
+_REPEAT_OPCODES = {
+    getattr(sre_parse, name)
+    for name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(sre_parse, name)
+}
+
+
+@lru_cache(maxsize=REGEXP_CACHE_SIZE)
+def compile_regexp(pattern: str) -> re.Pattern:
+    """Return the compiled pattern, cached"""
+    return re.compile(pattern)
+
+
+def regexp(pattern: str, value) -> bool:
+    """REGEXP function for SQLite
+
+    `value REGEXP pattern` is evaluated by sqlite as `regexp(pattern, value)`.
+
+    Returns:
+        bool: True if pattern is found in value; None if value is NULL
+    """
+    if value is None:
+        return None
+
+    if not isinstance(value, str):
+        value = str(value)
+
+    return compile_regexp(pattern).search(value) is not None
+
+
+def _collect_literals(items, literals: list):
+    """Append to literals the runs of characters required by the parsed items"""
+    run = []
+
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+
+        if run:
+            literals.append("".join(run))
+            run = []
+
+        if op is sre_parse.SUBPATTERN:
+            # (group, add_flags, del_flags, pattern); skip inline flags like (?i:...)
+            _, add_flags, del_flags, pattern = av
+            if not add_flags and not del_flags:
+                _collect_literals(pattern, literals)
+
+        elif op in _REPEAT_OPCODES:
+            # (min, max, pattern); the pattern is required at least once
+            if av[0] >= 1:
+                _collect_literals(av[2], literals)
+
+    if run:
+        literals.append("".join(run))
+
+
+@lru_cache(maxsize=REGEXP_CACHE_SIZE)
+def regexp_prefilters(pattern: str) -> tuple:
+    """Return the literal substrings that any match of pattern contains
+
+    Args:
+        pattern (str): A python regular expression
+
+    Returns:
+        tuple: (prefix, literals, ignore_case)
+            - prefix (str/None): Literal the value must start with
+            - literals (list[str]): Literals the value must contain (prefix excluded)
+            - ignore_case (bool): True if literals must be compared without case.
+              In this case, prefix is None and literals are ASCII only.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (re.error, RecursionError, OverflowError):
+        # sqlite will raise the error when calling the REGEXP function
+        return None, [], False
+
+    flags = parsed.state.flags
+    ignore_case = bool(flags & re.IGNORECASE)
+    items = list(parsed)
+
+    prefix = None
+    if items and items[0][0] is sre_parse.AT:
+        at_code = items[0][1]
+        if at_code is sre_parse.AT_BEGINNING_STRING or (
+            at_code is sre_parse.AT_BEGINNING and not flags & re.MULTILINE
+        ):
+            run = []
+            for op, av in items[1:]:
+                if op is not sre_parse.LITERAL:
+                    break
+                run.append(chr(av))
+
+            if run:
+                prefix = "".join(run)
+                items = items[1 + len(run) :]
+
+    literals = []
+    _collect_literals(items, literals)
+
+    if ignore_case:
+        # sqlite LIKE ignores case for ASCII characters only
+        literals = [i for i in literals + [prefix or ""] if i and i.isascii()]
+        prefix = None
+
+    # Keep the order but remove duplicates
+    literals = list(dict.fromkeys(literals))
+
+    return prefix, literals, ignore_case
+
+
+def glob_escape(literal: str) -> str:
+    """Escape GLOB special characters of a literal
+
+    Examples:
+        glob_escape("a*b") ==> "a[*]b"
+    """
+    return re.sub(r"([*?\[])", r"[\1]", literal)
+
+
+def like_escape(literal: str, escape: str = "\\") -> str:
+    """Escape LIKE special characters of a literal with the given escape character
+
+    Examples:
+        like_escape("50%") ==> "50\\%"
+    """
+    return re.sub(r"([%_\\])", lambda m: escape + m.group(1), literal)
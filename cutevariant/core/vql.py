@@ -11,6 +11,10 @@
 """
 
 
+import copy
+import re
+from functools import lru_cache
+
 import textx
 from pkg_resources import resource_string
 from typing import Tuple
@@ -123,6 +127,10 @@ def value(self):
                 if field[1] in ("?", "ALL"):
                     name = OPERATORS["ALL"]
 
+                # samples[COUNT >= 2] => $count>=2
+                if field[1].startswith("COUNT"):
+                    name = "$count" + "".join(field[1][len("COUNT") :].split())
+
                 field = f"samples.{name}.{field[2]}"
 
         return {field: {op: val}}
@@ -147,7 +155,21 @@ def value(self):
 class SetExpression(metaclass=model_class):
     @property
     def value(self):
-        return "test"
+        """Return the expression as nested tuples (operator, left, right)
+
+        Operators are applied from left to right:
+        "A | B & C" gives ("&", ("|", "A", "B"), "C")
+        """
+        expression = self.op[0].value
+        for operator, operand in zip(self.op[1::2], self.op[2::2]):
+            expression = (operator, expression, operand.value)
+        return expression
+
+
+class SetOperand(metaclass=model_class):
+    @property
+    def value(self):
+        return self.op if isinstance(self.op, str) else self.op.value
 
 
 class FilterOperand(metaclass=model_class):
@@ -174,7 +196,6 @@ class OrderBy(metaclass=model_class):
     @property
     def value(self):
 
-        print("DIRECTION", self.direction)
         if not self.direction:
             self.direction = "ASC"
 
@@ -239,16 +260,23 @@ def value(self):
         }
 
 
-class SetCmd(metaclass=model_class):
+class SetCmdFull(metaclass=model_class):
     @property
     def value(self):
-        return {
-            "cmd": "set_cmd",
-            "target": self.target,
-            "first": self.first,
-            "operator": self.op,
-            "second": self.second,
-        }
+        expression = self.expression.value
+
+        if isinstance(expression, tuple) and all(isinstance(i, str) for i in expression):
+            # Operation between 2 selections
+            operator, first, second = expression
+            return {
+                "cmd": "set_cmd",
+                "target": self.target,
+                "first": first,
+                "operator": operator,
+                "second": second,
+            }
+
+        return {"cmd": "set_cmd", "target": self.target, "expression": expression}
 
 
 class BedCmd(metaclass=model_class):
@@ -308,17 +336,254 @@ def value(self):
         }
 
 
-METAMODEL = textx.metamodel_from_str(
-    resource_string(__name__, "vql.tx").decode(),  # grammar extraction from vql.tx
-    classes=model_class.classes,
-    debug=False,
-    ignore_case=True,
-)
+# Number of parsed VQL statements kept in memory
+VQL_CACHE_SIZE = 512
+
+
+@lru_cache(maxsize=None)
+def get_metamodel() -> textx.metamodel.TextXMetaModel:
+    """Return the VQL metamodel
+
+    Building the metamodel from vql.tx takes time: it is done on first use,
+    not when the module is imported.
+    """
+    return textx.metamodel_from_str(
+        resource_string(__name__, "vql.tx").decode(),  # grammar extraction from vql.tx
+        classes=model_class.classes,
+        debug=False,
+        ignore_case=True,
+    )
+
+
+def __getattr__(name):
+    # Backward compatibility: METAMODEL used to be built at import time
+    if name == "METAMODEL":
+        return get_metamodel()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# ============ Fast parser ==================================
+# Terminals of vql.tx; textX applies IGNORECASE to the regex of the grammar only
+_WS = re.compile(r"[ \t\n\r]*")
+_ID = re.compile(r"[^\d\W]\w*\b")
+_FIELD_ID = re.compile(r"[^\d\W]([\w\.]*\.)?\w*\b", re.IGNORECASE)
+_MATH_OPERATOR = re.compile(r">=|<=|=~|!=|=|>|<|!~|has|!has|!in|in", re.IGNORECASE)
+_FLOAT = re.compile(r"[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?(?<=[\w\.])(?![\w\.])")
+_INT = re.compile(r"[-+]?[0-9]+\b")
+_STRING = re.compile(r'("(\\"|[^"])*")|(\'(\\\'|[^\'])*\')')
+_BOOL = re.compile(r"(True|true|False|false|0|1)\b")
+
+
+class _NoMatch(Exception):
+    """The rule doesn't match: the parser backtracks, like textX does"""
+
+
+class _Unsupported(Exception):
+    """The statement must be parsed by textX"""
+
+
+class _SelectParser:
+    """Hand-written parser for the most common VQL statement
+
+        SELECT fields FROM source [WHERE filters] [ORDER BY fields]
+
+    It follows the PEG rules of vql.tx and returns the same object as textX.
+    Sample functions (samples['boby'].gt), wordsets, comments and
+    multiple statements are not supported: parse() raises _Unsupported or
+    _NoMatch, and the statement must be parsed by textX.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+
+    def skip_ws(self):
+        self.pos = _WS.match(self.text, self.pos).end()
+
+    def keyword(self, keyword: str) -> bool:
+        """Consume keyword (case insensitive) if present"""
+        self.skip_ws()
+        end = self.pos + len(keyword)
+        if self.text[self.pos : end].lower() == keyword.lower():
+            self.pos = end
+            return True
+        return False
+
+    def regex(self, regex: re.Pattern) -> str:
+        self.skip_ws()
+        match = regex.match(self.text, self.pos)
+        if not match:
+            raise _NoMatch()
+        self.pos = match.end()
+        return match.group()
+
+    def parse(self) -> dict:
+        if not self.keyword("SELECT"):
+            raise _NoMatch()
+
+        fields = [self.field()]
+        while self.keyword(","):
+            fields.append(self.field())
+
+        if not self.keyword("FROM"):
+            raise _Unsupported()
+        source = self.regex(_ID)
+
+        filters = {}
+        if self.keyword("WHERE"):
+            filters = self.filter_expression()
+
+        order_by = []
+        if self.keyword("ORDER BY"):
+            order_by.append(self.order_by())
+            while self.keyword(","):
+                order_by.append(self.order_by())
+
+        self.skip_ws()
+        if self.pos != len(self.text):
+            raise _NoMatch()
+
+        return {
+            "cmd": "select_cmd",
+            "fields": fields,
+            "source": source,
+            "filters": filters,
+            "order_by": order_by,
+        }
+
+    def field(self) -> str:
+        # FieldIdentifier: Function|FieldId
+        start = self.pos
+        try:
+            self.regex(_ID)
+            if self.keyword("["):
+                raise _Unsupported()
+        except _NoMatch:
+            pass
+        self.pos = start
+        return self.regex(_FIELD_ID)
+
+    def order_by(self) -> tuple:
+        field = self.field()
+        ascending = True
+        if self.keyword("ASC"):
+            ascending = True
+        elif self.keyword("DESC"):
+            ascending = False
+        return (field, ascending)
+
+    def filter_expression(self) -> dict:
+        key = "$and"
+        operands = [self.filter_operand()]
+
+        while True:
+            start = self.pos
+            try:
+                if self.keyword("AND"):
+                    operator = "$and"
+                elif self.keyword("OR"):
+                    operator = "$or"
+                else:
+                    break
+                operands.append(self.filter_operand())
+                key = operator
+            except _NoMatch:
+                self.pos = start
+                break
+
+        return {key: operands}
+
+    def filter_operand(self) -> dict:
+        start = self.pos
+        try:
+            return self.filter_term()
+        except _NoMatch:
+            self.pos = start
+
+        if not self.keyword("("):
+            raise _NoMatch()
+        expression = self.filter_expression()
+        if not self.keyword(")"):
+            raise _NoMatch()
+        return expression
+
+    def filter_term(self) -> dict:
+        field = self.field()
+        operator = OPERATORS.get(self.regex(_MATH_OPERATOR).upper(), "$eq")
+        value = self.value()
+        if value == "NULL":
+            value = None
+        return {field: {operator: value}}
+
+    def value(self, in_tuple=False):
+        # ValueIdentifier: (NUMBER|STRING|BOOL|Tuple|WordSetIdentifier|"NULL")
+        for regex, convert in (
+            (_FLOAT, float),
+            (_INT, float),
+            (_STRING, lambda x: x[1:-1].replace(r"\"", '"').replace(r"\'", "'")),
+            (_BOOL, lambda x: x == "1" or x.lower() == "true"),
+        ):
+            start = self.pos
+            try:
+                return convert(self.regex(regex))
+            except _NoMatch:
+                self.pos = start
+
+        if self.keyword("("):
+            if in_tuple:
+                raise _Unsupported()
+            items = [self.value(in_tuple=True)]
+            while self.keyword(","):
+                items.append(self.value(in_tuple=True))
+            if not self.keyword(")"):
+                raise _NoMatch()
+            return items
+
+        if self.keyword("WORDSET["):
+            raise _Unsupported()
+
+        if self.keyword("NULL"):
+            return "NULL"
+
+        raise _NoMatch()
+
+
+def parse_select_fast(raw_vql: str) -> dict:
+    """Parse a simple SELECT statement without textX
+
+    Returns:
+        dict: VQL object, or None if the statement must be parsed by textX
+    """
+    if "#" in raw_vql or ";" in raw_vql:
+        return None
+
+    try:
+        return _SelectParser(raw_vql).parse()
+    except (_NoMatch, _Unsupported):
+        return None
+
+
+@lru_cache(maxsize=VQL_CACHE_SIZE)
+def _parse_vql(raw_vql: str) -> tuple:
+    """Return the VQL objects of raw_vql; results are cached"""
+    command = parse_select_fast(raw_vql)
+    if command is not None:
+        return (command,)
+
+    try:
+        raw_model = get_metamodel().model_from_str(raw_vql)
+    except textx.exceptions.TextXSyntaxError as err:
+        raise VQLSyntaxError(*error_message_from_err(err, raw_vql))
+
+    return tuple(command.value for command in raw_model.commands)
 
 
 def parse_vql(raw_vql: str) -> list:
     """Execute multiline VQL statement separated by ";"
 
+    Parsed statements are cached; simple SELECT statements are parsed
+    without textX (see :meth:`parse_select_fast`).
+
     Returns:
          (generator[dict]): yield 1 VQL object (a dictionnary) per command
 
@@ -331,12 +596,8 @@ def parse_vql(raw_vql: str) -> list:
             'filter': 'None'
         }
     """
-    try:
-        raw_model = METAMODEL.model_from_str(raw_vql)
-    except textx.exceptions.TextXSyntaxError as err:
-        raise VQLSyntaxError(*error_message_from_err(err, raw_vql))
-
-    yield from (command.value for command in raw_model.commands)
+    # VQL objects are mutable: return copies of the cached objects
+    yield from (copy.deepcopy(command) for command in _parse_vql(raw_vql))
 
 
 def parse_one_vql(raw_vql: str) -> dict:
@@ -1,5 +1,6 @@
 # Custom imports
 from cutevariant.core import command as cmd
+from cutevariant.core import parallel
 from cutevariant.core.querybuilder import build_sql_query
 
 from cutevariant import LOGGER
@@ -13,6 +14,8 @@ class AbstractWriter:
     Attributes:
 
         device: a file object typically returned by open("w")
+        samples (list): Names of the selected samples; they are used by the
+            samples[ANY/ALL/COUNT] filters, like in the variant view
 
     Example:
 
@@ -57,15 +60,21 @@ def total_count(self) -> int:
         """
 
         return cmd.count_cmd(
-            self.conn, fields=self.fields, source=self.source, filters=self.filters
+            self.conn,
+            fields=self.fields,
+            source=self.source,
+            filters=self.filters,
+            selected_samples=self.samples,
         )["count"]
 
     def get_variants(self):
 
-        yield from cmd.select_cmd(
+        # Large projects are read on several threads, by ranges of variants
+        yield from parallel.select(
             self.conn,
             fields=self.fields,
             source=self.source,
             filters=self.filters,
             limit=None,
+            selected_samples=self.samples,
         )
@@ -1,7 +1,7 @@
 import vcf
 
 from cutevariant.core import sql
-from cutevariant.core import command as cmd
+from cutevariant.core import parallel
 from cutevariant.core.writer import AbstractWriter
 
 import json
@@ -211,7 +211,7 @@ def async_save(self, *args, **kwargs):
 
         # Start the actual variant writing loop
         for index, variant in enumerate(
-            cmd.select_cmd(
+            parallel.select(
                 self.conn,
                 ["chr", "pos", "rsid", "ref", "alt", "qual"] + custom_fields,
                 self.source,
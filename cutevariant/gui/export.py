@@ -114,7 +114,9 @@ def __init__(self, conn, filename, fields, source, filters, selected_samples, pa
         )
 
     def save(self):
-        writer = BedWriter(self.conn, self.filename, self.fields, self.source, self.filters)
+        writer = BedWriter(
+            self.conn, self.filename, self.fields, self.source, self.filters, self.samples
+        )
 
         success = self.save_from_writer(writer, "Saving BED file")
         if success:
@@ -172,7 +174,9 @@ def save(self):
                 self, self.tr("Error"), self.tr("No file name set. Nothing to save")
             )
 
-        writer = CsvWriter(self.conn, self.filename, self.fields, self.source, self.filters)
+        writer = CsvWriter(
+            self.conn, self.filename, self.fields, self.source, self.filters, self.samples
+        )
         writer.separator = self.combo.currentData()
         success = self.save_from_writer(writer, "Saving CSV file")
         if success:
@@ -23,6 +23,7 @@
     Signal,
     QSize,
     QPoint,
+    QTimer,
 )
 from PySide6.QtWidgets import *
 from PySide6.QtGui import QIcon, QKeySequence, QDesktopServices
@@ -58,6 +59,9 @@
 
 import copy
 
+# Milliseconds during which state changes are gathered before plugins are refreshed
+REFRESH_DELAY = 50
+
 
 class StateData:
     """A dictonnary like object which monitor which key changed
@@ -209,6 +213,13 @@ def __init__(self, parent=None):
         self._project_is_opening = False
         self._is_initialize = True
 
+        # Plugins refreshed when the state data stops changing (see refresh_plugins)
+        self._plugins_to_refresh = []
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(REFRESH_DELAY)
+        self._refresh_timer.timeout.connect(self._refresh_scheduled_plugins)
+
     def set_state_data(self, key: str, value: typing.Any):
         """set state data value from key
 
@@ -369,6 +380,12 @@ def refresh_plugins(self, sender: plugin.PluginWidget = None, force_refresh=Fals
         - the plugin is not visible
         - the plugin specified a class variable REFRESH_STATE_DATA = ["fields"]
 
+        Plugins are not refreshed immediately: the refresh is delayed until the
+        state data has not changed for REFRESH_DELAY ms. A plugin requested
+        by several changes in the meantime is refreshed once, and the central
+        plugin (the variant view) is refreshed first, so that its queries are
+        started before the queries of the side panels.
+
         Args:
             sender (PluginWidget): from a plugin, you can pass "self" as argument
         """
@@ -393,8 +410,25 @@ def refresh_plugins(self, sender: plugin.PluginWidget = None, force_refresh=Fals
 
         # Clear state_changed set
         self._state_data.clear_changed()
-        for plugin in plugin_to_refresh:
-            plugin.on_refresh()
+        for plugin_obj in plugin_to_refresh:
+            if plugin_obj not in self._plugins_to_refresh:
+                self._plugins_to_refresh.append(plugin_obj)
+
+        # Restart the delay
+        self._refresh_timer.start()
+
+    def _refresh_scheduled_plugins(self):
+        """Refresh the plugins gathered by refresh_plugins, central plugin first"""
+        plugins = sorted(
+            self._plugins_to_refresh,
+            key=lambda plugin_obj: plugin_obj.LOCATION != plugin.CENTRAL_LOCATION,
+        )
+        self._plugins_to_refresh = []
+        for plugin_obj in plugins:
+            try:
+                plugin_obj.on_refresh()
+            except Exception as e:
+                LOGGER.exception(e)
 
         self.update_status_bar()
 
@@ -585,6 +619,11 @@ def open_database_from_file(self, filepath, reset=True):
         # Create connection
         self.conn = get_sql_connection(filepath)
 
+        # Connections of the previous project are no longer needed;
+        # open those of the first background queries (variants and count)
+        sql.close_connection_pools()
+        sql.get_connection_pool(filepath).warm_up(2)
+
         try:
             # DB version filter
             db_version = get_metadatas(self.conn).get("cutevariant_version")
@@ -643,8 +682,12 @@ def open_database(self, conn, reset=True):
         self._project_is_opening = False
 
     def close_database(self):
+        # Forget the refreshes scheduled for the closed project
+        self._refresh_timer.stop()
+        self._plugins_to_refresh = []
+
         if self.conn:
-            self.conn.close()
+            sql.close_sql_connection(self.conn)
             self._state_data.reset()
             self.setWindowTitle("Cutevariant")
 
@@ -940,6 +983,10 @@ def closeEvent(self, event):
         # Don't forget to tell all the plugins that the window is being closed
         for plugin_obj in self.plugins.values():
             plugin_obj.on_close()
+
+        if self.conn:
+            sql.close_sql_connection(self.conn)
+        sql.close_connection_pools()
         super().closeEvent(event)
 
     def on_save_session(self):
@@ -75,6 +75,26 @@
     This module contains almost one class named `WordSetWidget` that inherits
     from `PluginWidget`.
 
+
+Background queries
+------------------
+
+Plugins must not create their own threads to query the project. Widgets and
+dialogs submit their queries with `submit_query()` (or create a `SqlThread`
+with `create_sql_thread()`): they are executed by the threads of the shared
+:class:`cutevariant.gui.sql_executor.SqlExecutor`, with the priority of their
+query class and within the concurrency limit of the plugin
+(`plugin_query_limits` in the app config).
+
+Example:
+
+    token = self.submit_query(
+        lambda conn: sql.get_variants_count(conn),
+        callback=self.on_count_loaded,
+        query_class="count",
+    )
+    token.cancel()
+
 """
 # Standard import
 import os
@@ -87,6 +107,8 @@
 # Cutevariant import
 from cutevariant.config import Config
 from cutevariant.gui import settings
+from cutevariant.gui.sql_executor import CancellationToken, get_sql_executor
+from cutevariant.gui.sql_thread import SqlThread
 import cutevariant.commons as cm
 from cutevariant import LOGGER
 
@@ -95,7 +117,52 @@
 FOOTER_LOCATION = 3
 
 
-class PluginWidget(QWidget):
+class PluginQueryMixin:
+    """Background queries of the plugins, on behalf of their plugin name
+
+    Used by PluginWidget and PluginDialog, which provide the `conn` and
+    `plugin_name` attributes.
+    """
+
+    def submit_query(
+        self,
+        function,
+        callback=None,
+        error_callback=None,
+        query_class: str = None,
+        **kwargs,
+    ) -> CancellationToken:
+        """Run function(conn) in the background on the project of the plugin
+
+        Callbacks are called in the GUI thread.
+        See :meth:`cutevariant.gui.sql_executor.SqlExecutor.submit` for the
+        other arguments.
+
+        Args:
+            function (Callable): Function taking a sqlite3.Connection
+            callback (Callable): Called with the result of the function
+            error_callback (Callable): Called with the exception raised by the function
+            query_class (str): "page", "count", "group_by", "stats" or None
+
+        Returns:
+            CancellationToken: Token to cancel the query
+        """
+        return get_sql_executor().submit(
+            self.conn,
+            function,
+            callback,
+            error_callback,
+            query_class=query_class,
+            plugin=self.plugin_name,
+            **kwargs,
+        )
+
+    def create_sql_thread(self, function=None, query_class: str = None) -> SqlThread:
+        """Return a SqlThread running its functions on behalf of the plugin"""
+        return SqlThread(self.conn, function, query_class, plugin=self.plugin_name)
+
+
+class PluginWidget(QWidget, PluginQueryMixin):
     """Model class for all widget plugins
 
     .. note:: Please override the functions of this class as much as possible.
@@ -177,6 +244,7 @@ def on_close(self):
 
         .. seealso:: :meth:`cutevariant/gui/mainwindow.MainWindow.reset_ui`
         """
+        get_sql_executor().cancel(self.plugin_name)
         self.close()
         self.deleteLater()
         LOGGER.debug("delete plugin... %s", self)
@@ -231,7 +299,7 @@ def create_config(self):
         return Config(self.plugin_name)
 
 
-class PluginDialog(QDialog):
+class PluginDialog(QDialog, PluginQueryMixin):
     """Model class for all tool menu plugins
 
     These plugins are based on DialogBox; this means that they could be opened
@@ -248,6 +316,11 @@ def __init__(self, parent=None):
         super().__init__(parent)
         self.conn = None
 
+    def done(self, result: int):
+        """Overrided: cancel the queries of the dialog when it is closed"""
+        get_sql_executor().cancel(self.plugin_name)
+        super().done(result)
+
     @property
     def plugin_name(self):
         return cm.camel_to_snake(self.__class__.__name__.replace("Dialog", ""))
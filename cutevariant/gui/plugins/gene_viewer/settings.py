@@ -8,13 +8,12 @@
 from cutevariant.gui.plugin import PluginSettingsWidget
 from cutevariant.gui.settings import AbstractSettingsWidget
 from cutevariant.gui import FIcon
+from cutevariant.core import gene_store
 import cutevariant.constants as cst
 
 from cutevariant.gui.widgets import FileEdit
 
-import sqlite3
 import os
-import gzip
 
 import glob
 
@@ -24,6 +23,8 @@
 def zipped_text_to_sqlite(ref_filename: str, db_filename: str):
     """Converts a zipped text file (.txt.gz) with genomic annotation data into a sqlite3 database
 
+    See :meth:`cutevariant.core.gene_store.import_refgene`.
+
     Args:
         ref_filename (str): File name of the zipped text file containing the genomic annotation data
         db_filename (str): Path to save the database to
@@ -32,60 +33,7 @@ def zipped_text_to_sqlite(ref_filename: str, db_filename: str):
         FileNotFoundError: If ref_filename is not a path to an existing file
     """
 
-    # Create databases
-    conn = sqlite3.connect(db_filename)
-
-    if not os.path.isfile(ref_filename):
-        raise FileNotFoundError("%s : No such file or directory !")
-
-    conn.execute(
-        """
-        CREATE TABLE genes(  
-        id INTEGER PRIMARY KEY,
-        transcript_name TEXT, 
-        tx_start INTEGER, 
-        tx_end INTEGER,
-        cds_start INTEGER,
-        cds_end INTEGER,
-        exon_starts TEXT,
-        exon_ends TEXT,
-        gene TEXT
-        )
-
-    """
-    )
-
-    data = []
-    with gzip.open(ref_filename, "rb") as file:
-        for index, line in enumerate(file):
-            if line:
-                line = line.decode("utf-8").strip().split("\t")
-
-                transcript = line[1]
-                txStart = line[4]
-                txEnd = line[5]
-                cdsStart = line[6]
-                cdsEnd = line[7]
-                exonStarts = ",".join([i for i in line[9].split(",") if i.isnumeric()])
-                exonEnds = ",".join([i for i in line[10].split(",") if i.isnumeric()])
-                gene = line[12]
-
-                data.append(
-                    (
-                        None,
-                        transcript,
-                        txStart,
-                        txEnd,
-                        cdsStart,
-                        cdsEnd,
-                        exonStarts,
-                        exonEnds,
-                        gene,
-                    )
-                )
-
-    conn.executemany("INSERT INTO genes VALUES(?,?,?,?,?,?,?,?,?);", data)
-    conn.commit()
+    gene_store.import_refgene(ref_filename, db_filename)
 
 
 def open_link(url: typing.Union[QUrl, str]):
@@ -18,7 +18,7 @@
 from cutevariant.gui import style, plugin, FIcon, MainWindow
 from cutevariant.core.querybuilder import build_vql_query, build_sql_query
 
-from cutevariant.core import sql
+from cutevariant.core import sql, gene_store
 from cutevariant import LOGGER
 
 from cutevariant.gui.widgets import VqlSyntaxHighlighter
@@ -87,8 +87,8 @@ def load(self, data: dict):
         """From sqlite dict"""
         self.cds_start = data["cds_start"]
         self.cds_end = data["cds_end"]
-        self.exon_starts = [int(i) for i in data["exon_starts"].split(",")]
-        self.exon_ends = [int(i) for i in data["exon_ends"].split(",")]
+        self.exon_starts = gene_store.unpack_positions(data["exon_starts"])
+        self.exon_ends = gene_store.unpack_positions(data["exon_ends"])
         self.tx_start = data["tx_start"]
         self.tx_end = data["tx_end"]
         self.transcript_name = data["transcript_name"]
@@ -956,8 +956,7 @@ def load_config(self):
             self.stack_layout.setCurrentIndex(0)
         else:
             self.stack_layout.setCurrentIndex(1)
-            self.gene_conn = sqlite3.connect(db_path)
-            self.gene_conn.row_factory = sqlite3.Row
+            self.gene_conn = gene_store.get_gene_connection(db_path)
             self.load_gene_names()
             self.load_transcript_names()
 
@@ -965,7 +964,7 @@ def load_gene_names(self):
         """Called on startup by __init__, loads whole annotation table to populate gene names combobox"""
 
         if self.gene_conn:
-            gene_names = [s["gene"] for s in self.gene_conn.execute("SELECT gene FROM genes")]
+            gene_names = gene_store.get_gene_names(self.gene_conn)
             self.gene_name_combo.clear()
             self.gene_name_combo.addItems(gene_names)
 
@@ -973,12 +972,7 @@ def load_transcript_names(self):
         """Called whenever the selected gene changes. Allows the user to select the transcript of interest."""
         if self.gene_conn:
             transcript_names = (
-                [
-                    s["transcript_name"]
-                    for s in self.gene_conn.execute(
-                        f"SELECT transcript_name FROM genes WHERE gene = '{self.selected_gene}'"
-                    )
-                ]
+                gene_store.get_transcript_names(self.gene_conn, self.selected_gene)
                 if self.selected_gene is not None
                 else []
             )
@@ -1024,9 +1018,30 @@ def update_view(self):
         # Udpate gene view
         gene = self.gene_name_combo.currentText()
         transcript = self.transcript_name_combo.currentText()
-        query = f"SELECT transcript_name,tx_start,tx_end,cds_start,cds_end,exon_starts,exon_ends,gene FROM genes WHERE gene = '{gene}' AND transcript_name='{transcript}'"
-        result = self.gene_conn.execute(query).fetchone()
+        result = gene_store.get_transcript(self.gene_conn, gene, transcript)
+        if result is None:
+            return
+
+        source = self.mainwindow.get_state_data("source")
+        filters = {}
+        if result["chrom"] is None:
+            # Databases of older versions have no chrom: filter on gene field
+            filters = self.gene_filters(gene)
+
+        # Only positions of the transcript window are read
+        positions, _ = sql.get_variant_positions(
+            self.conn, result["chrom"], result["tx_start"], result["tx_end"], source, filters
+        )
+        current_pos = self.current_variant["pos"]
+        variants = [(pos, pos == current_pos, 0.5) for pos in positions.tolist()]
+
+        gene = Gene()
+        self.view.variants = variants
+        gene.load(result)
+        self.view.set_gene(gene)
 
+    def gene_filters(self, gene: str) -> dict:
+        """Return filters on the gene field of the config, if it exists in the project"""
         # Config
         config_gene_viewer = Config("gene_viewer")
         gene_field = config_gene_viewer.get("gene_field", "")
@@ -1043,31 +1058,13 @@ def update_view(self):
                 name = field["name"]
                 list_of_fields.append(f"ann.{name}")
 
-        # Filters on gene field
-        filters = {}
         # field exists in project
         if gene_field in list_of_fields:
-            filters = {"$and": [{f"""{gene_field}""": gene}]}
-        # field DOES NOT exists in project
-        else:
-            LOGGER.warning("Gene fields %s not in project", gene_field)
-
-        # Get all variants
-        fields = ["pos"]
-        source = self.mainwindow.get_state_data("source")
-
-        variants = []
+            return {"$and": [{f"""{gene_field}""": gene}]}
 
-        for v in sql.get_variants(self.conn, fields, source, filters, limit=None):
-            pos = v["pos"]
-            selected = pos == self.current_variant["pos"]
-            variants.append((pos, selected, 0.5))
-
-        if result is not None:
-            gene = Gene()
-            self.view.variants = variants
-            gene.load(dict(result))
-            self.view.set_gene(gene)
+        # field DOES NOT exists in project
+        LOGGER.warning("Gene fields %s not in project", gene_field)
+        return {}
 
         # self.load_exons()
 
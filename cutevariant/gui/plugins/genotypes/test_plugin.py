@@ -46,3 +46,28 @@ def test_model(conn, qtbot, qtmodeltester):
 
     model.clear()
     assert model.rowCount() == 0
+
+
+def test_model_page(conn, qtbot):
+
+    model = w.GenotypeModel()
+    model.conn = conn
+    model.set_samples(["sacha", "boby"])
+    model.set_page_variant_ids([1, 2, 3])
+
+    model.set_variant_id(1)
+    with qtbot.waitSignals([model.load_finished], timeout=5000):
+        model.load()
+
+    # The other variants of the page are read from the matrix, without thread
+    with qtbot.waitSignals([model.load_finished], timeout=1000):
+        model.set_variant_id(2)
+        model.load()
+    assert not model.is_running()
+    assert [i["name"] for i in model._genotypes] == [
+        i["name"] for i in sql.get_genotypes(conn, 2, ["gt"], ["sacha", "boby"])
+    ]
+
+    # Edits invalidate the matrix
+    model.edit([0], {"classification": 2})
+    assert not model.matrix.is_valid(conn)
@@ -17,6 +17,7 @@
 
 # Custom imports
 from cutevariant.core import sql, command
+from cutevariant.core.genotype_matrix import GenotypeMatrix
 from cutevariant.core.reader import BedReader
 from cutevariant.gui import plugin, FIcon, style
 from cutevariant.constants import DEFAULT_SELECTION_NAME
@@ -75,20 +76,8 @@ def paintSection(self, painter: QPainter, rect: QRect, section: int):
 
         # genotype icon
         GENOTYPE_ICONS = {key: FIcon(val) for key, val in cst.GENOTYPE_ICONS.items()}
-        genotype_sample_name = self.model().get_genotype(section)["name"]
-        genotype_variant_id = self.model().get_genotype(section)["variant_id"]
-
-        genotype = ""
-        if genotype_variant_id and genotype_sample_name:
-            genotype_infos = next(
-                sql.get_genotypes(
-                    self.model().conn,
-                    genotype_variant_id,
-                    ["gt"],
-                    [genotype_sample_name],
-                )
-            )
-            genotype = genotype_infos.get("gt", -1)
+        # gt is always loaded with the genotypes, see GenotypeMatrix
+        genotype = self.model().get_genotype(section).get("gt")
 
         if genotype == "NULL" or genotype is None or genotype == "":
             genotype_int = -1
@@ -149,6 +138,13 @@ def __init__(self, conn: sqlite3.Connection = None, parent=None):
         # Current variant
         self._variant_id = 0
 
+        # Variants of the page of the current variant, loaded with it
+        self._page_variant_ids = []
+
+        # Genotypes of the page variants (see GenotypeMatrix)
+        self.matrix = None
+        self._loading_stamp = None
+
         self._headers = []
         self.fields_descriptions = {}
 
@@ -156,7 +152,7 @@ def __init__(self, conn: sqlite3.Connection = None, parent=None):
         self.classifications = []
 
         # Creates the samples loading thread
-        self._load_samples_thread = SqlThread(self.conn)
+        self._load_samples_thread = SqlThread(self.conn, plugin="genotypes")
 
         # Connect samples loading thread's signals (started, finished, error, result ready)
         self._load_samples_thread.started.connect(lambda: self.samples_are_loading.emit(True))
@@ -201,6 +197,10 @@ def set_variant_id(self, variant_id: int):
     def get_variant_id(self) -> int:
         return self._variant_id
 
+    def set_page_variant_ids(self, variant_ids: typing.List[int]):
+        """Set the variants whose genotypes are read with the current variant"""
+        self._page_variant_ids = list(variant_ids or [])
+
     def data(self, index: QModelIndex, role: Qt.ItemDataRole) -> typing.Any:
         """override"""
         if not index.isValid():
@@ -236,17 +236,30 @@ def headerData(self, section: int, orientation: Qt.Orientation, role: int):
 
     def on_samples_loaded(self):
 
+        matrix = self._load_samples_thread.results
+        # The stamp is taken from the GUI connection, before the query
+        matrix.stamp = self._loading_stamp
+        self.matrix = matrix
+        self.set_genotypes(matrix.genotypes(self.get_variant_id()))
+
+    def set_genotypes(self, genotypes: typing.List[dict]):
+
         self.beginResetModel()
 
-        self._genotypes = self._load_samples_thread.results
+        self._genotypes = genotypes
+        toolTip.get_tooltip_service().prefetch(
+            self.conn, [self.get_variant_id()], [genotype["name"] for genotype in genotypes]
+        )
 
         if len(self._genotypes) > 0:
             self._headers = [
                 i for i in self._genotypes[0].keys() if i not in ("sample_id", "variant_id")
             ]
 
-        if "classification" not in self._fields:
-            self._headers.remove("classification")
+        # gt and classification are always loaded for the vertical header
+        for field in ("gt", "classification"):
+            if field not in self._fields and field in self._headers:
+                self._headers.remove(field)
 
         self.endResetModel()
 
@@ -255,7 +268,11 @@ def on_samples_loaded(self):
         self.load_finished.emit()
 
     def load(self):
-        """Start async queries to get sample fields for the selected variant
+        """Load sample fields for the selected variant
+
+        Genotypes of all the variants of the page are read at once, in a
+        thread. They are kept in a :class:`GenotypeMatrix`; the other variants of
+        the page are then loaded from memory, while the database is unchanged.
 
         Called by:
             - on_change_query() from the view.
@@ -267,44 +284,34 @@ def load(self):
         if self.conn is None:
             return
 
-        if not self.get_samples():
-            self.clear()
-            return
-
         if self.is_running():
             LOGGER.debug("Cannot load data. Thread is not finished. You can call interrupt() ")
             self.interrupt()
 
-        # mandatory field
-
-        # Create load_func to run asynchronously: load samples
-
-        used_fields = copy.deepcopy(self.get_fields()) or []
-        if "classification" not in used_fields:
-            used_fields.append("classification")
+        # Without selected samples, the genotypes of all the samples are shown
+        variant_id = self.get_variant_id()
+        fields = list(self.get_fields() or [])
 
-        load_samples_func = partial(
-            sql.get_genotypes,
-            variant_id=self.get_variant_id(),
-            fields=used_fields,
-            samples=self.get_samples(),
-        )
-
-        # Start the run
         self._start_timer = time.perf_counter()
+        self.load_started.emit()
 
-        # # Create function HASH for CACHE
-        # self._sample_hash = hash(load_samples_func.func.__name__ + str(load_samples_func.keywords))
+        if (
+            self.matrix is not None
+            and self.matrix.covers(variant_id, self.get_samples(), fields)
+            and self.matrix.is_valid(self.conn)
+        ):
+            self.set_genotypes(self.matrix.genotypes(variant_id, self.get_samples(), fields))
+            return
 
-        self.load_started.emit()
+        variant_ids = [variant_id]
+        if variant_id in self._page_variant_ids:
+            variant_ids = self._page_variant_ids
+
+        matrix = GenotypeMatrix(variant_ids, self.get_samples(), fields)
+        self._loading_stamp = sql.database_stamp(self.conn)
 
-        # # Launch the first thread "count" or by pass it using the cache
-        # if self._sample_hash in self._load_count_cache:
-        #     self._load_variant_thread.results = self._load_count_cache[self._count_hash]
-        #     self.on_samples_loaded()
-        # else:
         self._load_samples_thread.conn = self.conn
-        self._load_samples_thread.start_function(lambda conn: list(load_samples_func(conn)))
+        self._load_samples_thread.start_function(matrix.load)
 
     def sort(self, column: int, order: Qt.SortOrder) -> None:
         self.beginResetModel()
@@ -379,6 +386,8 @@ def edit(self, rows: list, data: dict):
             del new_data["name"]
 
             sql.update_genotypes(self.conn, new_data)
+            if self.matrix is not None:
+                self.matrix.invalidate()
             self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount()))
             self.headerDataChanged.emit(Qt.Vertical, row, row)
 
@@ -436,6 +445,7 @@ def __init__(self, parent=None, conn=None):
         )
 
         self.view.setItemDelegate(self.delegate)
+        toolTip.get_tooltip_service().data_loaded.connect(self.on_tooltip_data_loaded)
 
         self.add_sample_button = QPushButton(self.tr("Add samples ..."))
         self.add_sample_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
@@ -922,6 +932,7 @@ def on_add_filter(self):
     def on_open_project(self, conn):
         self.conn = conn
         self.model.conn = conn
+        self.model.matrix = None
         self.model.clear()
         self.load_all_filters()
 
@@ -983,6 +994,7 @@ def on_refresh(self):
 
         self.model.set_fields(fields)
         self.model.set_variant_id(variant_id)
+        self.model.set_page_variant_ids(self.mainwindow.get_state_data("page_variant_ids") or [])
         self.model.set_samples(samples)
         self.model.load()
 
@@ -994,6 +1006,7 @@ def on_refresh(self):
         # self.view.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
 
     def on_close_project(self):
+        self.model.matrix = None
         self.model.clear()
 
     def show_error(self, message):
@@ -1003,6 +1016,10 @@ def show_error(self, message):
     def on_load_finished(self):
         self.show_error("")
 
+    def on_tooltip_data_loaded(self):
+        """Show the loaded data in the tooltip of the hovered genotype"""
+        toolTip.refresh_loading_tooltip(self.view)
+
 
 # self.view.horizontalHeader().setSectionResizeMode(
 #     0, QHeaderView.ResizeToContents
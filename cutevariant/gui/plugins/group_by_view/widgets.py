@@ -57,7 +57,7 @@ class GroupByViewWidget(PluginWidget):
 
     ENABLE = True
 
-    REFRESH_STATE_DATA = {"fields", "filters", "source"}
+    REFRESH_STATE_DATA = {"fields", "filters", "source", "samples"}
 
     def __init__(self, parent=None, conn=None):
         super().__init__()
@@ -173,6 +173,7 @@ def _load_groupby(self):
                 self.mainwindow.get_state_data("fields"),
                 self.mainwindow.get_state_data("source"),
                 self.mainwindow.get_state_data("filters"),
+                self.mainwindow.get_state_data("samples") or [],
             )
 
     def on_double_click(self):
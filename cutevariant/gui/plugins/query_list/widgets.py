@@ -13,6 +13,9 @@
 from PySide6.QtGui import *
 from PySide6.QtCore import *
 
+# Maximum number of samples proposed by the completer
+SAMPLE_COMPLETION_LIMIT = 50
+
 
 class QueryWidget(QWidget):
     def __init__(self, parent: QWidget = None, conn: sqlite3.Connection = None) -> None:
@@ -47,8 +50,8 @@ def _fill_completer(self):
         Fill the model with the SQL keywords and database fields
         """
         if self.conn:
-            # preload samples , selection and wordset
-            samples = [i["name"] for i in sql.get_samples(self.conn)]
+            # preload selection and wordset; samples are searched while typing
+            self._sample_fields = []
             selections = [i["name"] for i in sql.get_selections(self.conn)]
             wordsets = [i["name"] for i in sql.get_wordsets(self.conn)]
 
@@ -99,19 +102,36 @@ def _fill_completer(self):
                     name = "samples[ALL].{}".format(field["name"])
                     self.code_edit.completer.model.add_item(name, description, icon, color)
 
-                    # Overwrite name
-                    for sample in samples:
-                        name = "samples['{}'].{}".format(sample, field["name"])
-                        description = "<b>{}</b> ({}) from {} {} <br/><br/> {}".format(
-                            field["name"],
-                            field["type"],
-                            field["category"],
-                            sample,
-                            field["description"],
-                        )
-                        self.code_edit.completer.model.add_item(name, description, icon, color)
+                    self._sample_fields.append((field, icon, color))
 
             self.code_edit.completer.model.endResetModel()
+            self.code_edit.completer.items_provider = self._sample_completions
+
+    def _sample_completions(self, prefix: str) -> list:
+        """Return the completer items of the samples whose name starts with prefix
+
+        Only SAMPLE_COMPLETION_LIMIT samples are read from the database.
+        """
+        if not prefix or not self._sample_fields:
+            return []
+        items = []
+        samples = sql.search_samples(
+            self.conn, prefix, limit=SAMPLE_COMPLETION_LIMIT, prefix=True
+        )
+        for sample in samples:
+            for field, icon, color in self._sample_fields:
+                name = "samples['{}'].{}".format(sample["name"], field["name"])
+                description = "<b>{}</b> ({}) from {} {} <br/><br/> {}".format(
+                    field["name"],
+                    field["type"],
+                    field["category"],
+                    sample["name"],
+                    field["description"],
+                )
+                items.append(
+                    {"name": name, "description": description, "icon": icon, "color": color}
+                )
+        return items
 
     def set_item(self, item: dict):
         self.line_edit.setText(item.get("name", ""))
@@ -11,7 +11,8 @@
 
 from cutevariant import LOGGER
 from cutevariant import constants as cst
-from cutevariant.core import sql
+from cutevariant.core import sql, report
+from cutevariant.core.sql_progress import QueryCancelled
 from cutevariant.config import Config
 from cutevariant.gui import plugin, style, MainWindow
 from cutevariant.gui.widgets import SampleDialog
@@ -54,13 +55,10 @@ def clear(self):
         self.endResetModel()
 
     def load(self):
-        """Loads all the samples from the database"""
+        """Loads the selected samples from the database"""
         if self.conn:
             self.beginResetModel()
-            self._samples.clear()
-            for sample in sql.get_samples(self.conn):
-                if sample["name"] in self._selected_samples:
-                    self._samples.append(sample)
+            self._samples = list(sql.get_samples_by_names(self.conn, self._selected_samples))
             self.endResetModel()
 
     def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole):
@@ -478,6 +476,8 @@ def _setup_actions(self):
         self.source_action.triggered.connect(self.on_create_samples_source_from_selected)
         self.genotype_action = QAction(FIcon(0xF0B38), "Add genotypes from all samples")
         self.genotype_action.triggered.connect(self.on_add_genotypes)
+        self.report_action = QAction(FIcon(0xF1009), "Create reports...")
+        self.report_action.triggered.connect(self.on_create_reports)
 
     def contextMenuEvent(self, event: QContextMenuEvent) -> None:
         """override"""
@@ -506,6 +506,8 @@ def contextMenuEvent(self, event: QContextMenuEvent) -> None:
         menu.addAction(self.create_filter_action_union)
         menu.addAction(self.clear_filter_action)
         menu.addAction(self.source_action)
+        menu.addSeparator()
+        menu.addAction(self.report_action)
 
         menu.exec(event.globalPos())
 
@@ -599,6 +601,53 @@ def on_remove(self):
         self.remove_all_sample_fields()
         self.on_create_samples_source(source_name=SAMPLES_SELECTION_NAME)
 
+    def on_create_reports(self):
+        """Create the HTML reports of the selected samples, in parallel"""
+        sample_ids = []
+        for index in self.view.selectionModel().selectedRows():
+            sample_ids.append(self.model.get_sample(index.row())["id"])
+        if not sample_ids:
+            return
+
+        template = Config("report").get("html_template", None)
+        if not template:
+            QMessageBox.warning(
+                self, "No template defined", "Please configure a template from settings"
+            )
+            return
+
+        output_dir = QFileDialog.getExistingDirectory(self, "Reports directory", QDir.homePath())
+        if not output_dir:
+            return
+
+        def create_reports(conn):
+            db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+            # Installed by the executor; cancelled with the other tasks of the plugin
+            handler = getattr(conn, "progress_handler", None)
+            return report.create_sample_reports(
+                db_path,
+                sample_ids,
+                template,
+                output_dir,
+                cancelled=lambda: handler is not None and handler.cancelled,
+            )
+
+        def on_created(reports):
+            self.mainwindow.status_bar.showMessage(
+                self.tr("{} report(s) created in {}").format(len(reports), output_dir)
+            )
+            QDesktopServices.openUrl(QUrl.fromLocalFile(output_dir))
+
+        def on_error(error):
+            if isinstance(error, QueryCancelled):
+                self.mainwindow.status_bar.showMessage(self.tr("Reports cancelled"))
+                return
+            LOGGER.error("Cannot create the reports: %s", error)
+            QMessageBox.critical(self, "Reports", f"Cannot create the reports: {error}")
+
+        self.mainwindow.status_bar.showMessage(self.tr("Creating reports..."))
+        self.submit_query(create_reports, on_created, on_error)
+
     def on_clear_samples(self):
         self.model.clear()
         self.on_model_changed()
@@ -1,3 +1,4 @@
+import json
 import sqlite3
 
 from PySide6.QtGui import *
@@ -41,7 +42,7 @@ def __init__(self):
         self.conn = None
         self.current_table = []
 
-        self._load_stats_thread = SqlThread(self.conn)
+        self._load_stats_thread = SqlThread(self.conn, query_class="stats", plugin="stats")
         self._load_stats_thread.started.connect(lambda: self.stats_is_loading.emit(True))
         self._load_stats_thread.finished.connect(lambda: self.stats_is_loading.emit(False))
         self._load_stats_thread.result_ready.connect(self.on_stats_loaded)
@@ -50,6 +51,9 @@ def __init__(self):
         self._user_has_interrupt = False
 
         self.field_name = ""
+        self.source = "variants"
+        self.filters = {}
+        self.selected_samples = []
 
     def is_stats_loading(self):
         return self._load_stats_thread.isRunning()
@@ -90,8 +94,8 @@ def on_stats_loaded(self):
 
         self.current_table.clear()
 
-        if self.field_name not in self.cache:
-            self.cache[self.field_name] = self._load_stats_thread.results
+        if self.cache_key() not in self.cache:
+            self.cache[self.cache_key()] = self._load_stats_thread.results
 
         self.current_table = list(self._load_stats_thread.results.items())
 
@@ -154,20 +158,39 @@ def load(self, field_name):
         if not self.conn:
             return
 
-        if self.is_stats_loading():
-            LOGGER.debug("Cannot load data. Thread is not finished. You can call interrupt() ")
-            return
-
         self.field_name = field_name
+        key = self.cache_key()
 
-        if field_name in self.cache:
-            self._load_stats_thread.results = self.cache[field_name]
+        if key in self.cache:
+            self._load_stats_thread.interrupt()
+            self._load_stats_thread.results = self.cache[key]
             self.on_stats_loaded()
         else:
+            source, filters, samples = self.source, self.filters, self.selected_samples
+            # A load in progress is cancelled and replaced by this one
             self._load_stats_thread.start_function(
-                lambda conn: get_field_info(conn, field_name, StatsModel.metrics.keys())
+                lambda conn: get_field_info(
+                    conn,
+                    field_name,
+                    source,
+                    filters,
+                    metrics=StatsModel.metrics.keys(),
+                    selected_samples=samples,
+                ),
+                caching_hash=("stats",) + key,
             )
 
+    def cache_key(self) -> tuple:
+        """Return the key of the current stats in the cache:
+        (field, source, filters, selected samples)
+        """
+        return (
+            self.field_name,
+            self.source,
+            json.dumps(self.filters, sort_keys=True),
+            tuple(self.selected_samples),
+        )
+
 
 class LoadingTableView(QTableView):
     """Movie animation displayed on VariantView for long SQL queries executed
@@ -216,6 +239,7 @@ class StatsWidget(plugin.PluginWidget):
     """
 
     ENABLE = False
+    REFRESH_STATE_DATA = {"source", "filters", "samples"}
 
     error_raised = Signal(str)
 
@@ -272,6 +296,16 @@ def set_connection(self, conn: sqlite3.Connection):
     def on_open_project(self, conn: sqlite3.Connection):
         self.set_connection(conn)
 
+    def on_refresh(self):
+        """Overrided from PluginWidget: compute the stats of the current variants"""
+        if not self.mainwindow:
+            return
+        self.stats_model.source = self.mainwindow.get_state_data("source") or "variants"
+        self.stats_model.filters = self.mainwindow.get_state_data("filters") or {}
+        self.stats_model.selected_samples = self.mainwindow.get_state_data("samples") or []
+        if self.conn:
+            self.stats_model.load(self.combobox_field.currentText())
+
 
 class TestWidget(QMainWindow):
     def __init__(self, parent=None):
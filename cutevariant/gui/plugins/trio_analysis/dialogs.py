@@ -12,35 +12,28 @@
     QSizePolicy,
     QSpacerItem,
     QDialogButtonBox,
+    QMessageBox,
 )
 from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QThreadPool
 
 # Custom imports
 from cutevariant.gui.ficon import FIcon
 from cutevariant.gui.plugin import PluginDialog
-from cutevariant.gui.sql_thread import SqlThread
-from cutevariant.core import sql
+from cutevariant.core import sql, inheritance
 
 
 class TrioAnalysisDialog(PluginDialog):
 
     ENABLE = True
 
-    DE_NOVO = 0
-    AUTOSOMAL_RECESSIVE = 1
-    AUTOSOMAL_DOMINANT = 2
-    X_LINKED_RECESSIVE = 3
-
     def __init__(self, conn=None, parent=None):
         super().__init__(parent)
         self.conn = conn
 
         self.type_combo = QComboBox()
 
-        self.type_combo.addItem(self.tr("De novo mutation"), self.DE_NOVO)
-        self.type_combo.addItem(self.tr("Autosomal Recessive"), self.AUTOSOMAL_RECESSIVE)
-        self.type_combo.addItem(self.tr("Autosomal Dominant"), self.AUTOSOMAL_DOMINANT)
-        self.type_combo.addItem(self.tr("X-linked Recessive"), self.X_LINKED_RECESSIVE)
+        for mode, label in inheritance.MODES.items():
+            self.type_combo.addItem(self.tr(label), mode)
 
         self.form_box = QGroupBox()
         self.father_combo = QComboBox()
@@ -119,74 +112,27 @@ def check_form(self):
         self.button_box.button(QDialogButtonBox.Apply).setEnabled(valid_form)
 
     def create_filter(self):
-        """build filter and send to the mainwindow.set_state_data"""
-
-        filter_type = self.type_combo.currentData()
-
-        father = self.father_combo.currentText()
-        mother = self.mother_combo.currentText()
-        child = self.child_combo.currentText()
-
-        if filter_type == self.DE_NOVO:
-            filters = {
-                "$and": [
-                    {f"samples.{father}.gt": 0},
-                    {f"samples.{mother}.gt": 0},
-                    {f"samples.{child}.gt": 1},
-                ]
-            }
-
-        elif filter_type == self.AUTOSOMAL_RECESSIVE:
-            filters = {
-                "$and": [
-                    {f"samples.{father}.gt": 1},
-                    {f"samples.{mother}.gt": 1},
-                    {f"samples.{child}.gt": 2},
-                ]
-            }
-
-        elif filter_type == self.AUTOSOMAL_DOMINANT:
-            filters = {
-                "$and": [
-                    {f"samples.{child}.gt": 1.0},
-                    {
-                        "$or": [
-                            {
-                                "$and": [
-                                    {
-                                        f"samples.{father}.gt": 1.0,
-                                    },
-                                    {
-                                        f"samples.{mother}.gt": 0.0,
-                                    },
-                                ]
-                            },
-                            {
-                                "$and": [
-                                    {
-                                        f"samples.{father}.gt": 0.0,
-                                    },
-                                    {
-                                        f"samples.{mother}.gt": 1.0,
-                                    },
-                                ]
-                            },
-                        ]
-                    },
-                ]
-            }
-
-        elif filter_type == self.X_LINKED_RECESSIVE:
-            filters = {
-                "$and": [
-                    {"chr": "X"},
-                    {f"samples.{father}.gt": 0},
-                    {f"samples.{mother}.gt": 1},
-                    {f"samples.{child}.gt": 0},
-                ]
-            }
-
-        self.mainwindow.set_state_data("filters", filters)
+        """Store the variants of the trio analysis as a selection and use it as source"""
+
+        mode = self.type_combo.currentData()
+
+        samples = {i["name"]: i["id"] for i in sql.get_samples(self.conn)}
+        father = samples[self.father_combo.currentText()]
+        mother = samples[self.mother_combo.currentText()]
+        child = samples[self.child_combo.currentText()]
+        name = f"{mode}_{self.child_combo.currentText()}"
+
+        selection_id = inheritance.create_trio_selection(
+            self.conn, mode, father, mother, child, name
+        )
+        if selection_id is None:
+            QMessageBox.information(
+                self, self.tr("Trio analysis"), self.tr("No variant matches this analysis")
+            )
+            return
+
+        self.mainwindow.set_state_data("source", name)
+        self.mainwindow.set_state_data("filters", {})
         self.mainwindow.refresh_plugins()
         self.close()
 
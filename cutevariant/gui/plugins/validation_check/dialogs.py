@@ -12,14 +12,13 @@
     QSizePolicy,
     QSpacerItem,
     QDialogButtonBox,
+    QMessageBox,
 )
 from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QThreadPool
-from numpy import array
 
 # Custom imports
 from cutevariant.gui.ficon import FIcon
 from cutevariant.gui.plugin import PluginDialog
-from cutevariant.gui.sql_thread import SqlThread
 from cutevariant.core import sql
 
 
@@ -31,6 +30,24 @@ class ValidationCheckDialog(PluginDialog):
     PATHOGENIC = 1
     LIKELY_PATHOGENIC = 2
 
+    # Selection replaced by each request
+    SELECTION_NAME = "validation_check"
+
+    # Variant ids of each request, read in one grouped pass over the genotypes
+    QUERIES = {
+        # Carried by samples with a validated genotype (2) and unassigned ones (0)
+        ALREADY_VALIDATED: """SELECT variant_id AS id FROM genotypes WHERE gt >= 1
+        GROUP BY variant_id HAVING MAX(classification = 2) AND MAX(classification = 0)""",
+        PATHOGENIC: """SELECT genotypes.variant_id AS id FROM genotypes
+        INNER JOIN variants ON variants.id = genotypes.variant_id
+        WHERE genotypes.classification = 0 AND genotypes.gt >= 1
+        AND variants.classification IN (5)""",
+        LIKELY_PATHOGENIC: """SELECT genotypes.variant_id AS id FROM genotypes
+        INNER JOIN variants ON variants.id = genotypes.variant_id
+        WHERE genotypes.classification = 0 AND genotypes.gt >= 1
+        AND variants.classification IN (4, 5)""",
+    }
+
     def __init__(self, conn=None, parent=None):
         super().__init__(parent)
         self.conn = conn
@@ -108,33 +125,25 @@ def check_form(self):
         valid_form = True
         self.button_box.button(QDialogButtonBox.Apply).setEnabled(valid_form)
 
-    def create_filter(self, conn: sqlite3.Connection):
-        """build filter and send to the mainwindow.set_state_data"""
+    def create_filter(self):
+        """Store the variants of the request as a selection and use it as source"""
 
         filter_type = self.type_combo.currentData()
 
-        # Default request
-        request = "SELECT variant_id FROM genotypes WHERE genotypes.classification IN (2) AND genotypes.gt >=1 GROUP BY genotypes.classification, genotypes.variant_id INTERSECT SELECT variant_id FROM genotypes WHERE genotypes.classification IN (0) AND genotypes.gt >=1 GROUP BY genotypes.classification, genotypes.variant_id"
-
-        # Type of request
-        if filter_type == self.ALREADY_VALIDATED:
-            request = "SELECT distinct(variant_id) FROM genotypes WHERE genotypes.classification IN (2) AND genotypes.gt >=1 GROUP BY genotypes.classification, genotypes.variant_id INTERSECT SELECT variant_id FROM genotypes WHERE genotypes.classification IN (0) AND genotypes.gt >=1 GROUP BY genotypes.classification, genotypes.variant_id"
-        elif filter_type == self.PATHOGENIC:
-            request = "SELECT distinct(variant_id) FROM genotypes WHERE genotypes.classification IN (0) AND genotypes.gt >=1 AND genotypes.variant_id IN (SELECT id FROM variants WHERE variants.classification IN (5))"
-        elif filter_type == self.LIKELY_PATHOGENIC:
-            request = "SELECT distinct(variant_id) FROM genotypes WHERE genotypes.classification IN (0) AND genotypes.gt >=1 AND genotypes.variant_id IN (SELECT id FROM variants WHERE variants.classification IN (4,5))"
-
-        # create variant list
-        variants = [{"id": record[0]} for record in self.conn.execute(request)]
-
-        # create filters
-        if len(variants) != 0:
-            filters = {"$or": variants}
-        else:
-            filters = {"$or": [{"id": 0}]}
-
-        # launch request/filters
-        self.mainwindow.set_state_data("filters", filters)
+        selection_id = sql.insert_selection_from_sql(
+            self.conn,
+            self.QUERIES[filter_type],
+            self.SELECTION_NAME,
+            description=self.type_combo.currentText(),
+        )
+        if selection_id is None:
+            QMessageBox.information(
+                self, self.tr("Validation check"), self.tr("No variant matches this request")
+            )
+            return
+
+        self.mainwindow.set_state_data("source", self.SELECTION_NAME)
+        self.mainwindow.set_state_data("filters", {})
         self.mainwindow.refresh_plugins()
         self.close()
 
@@ -176,6 +176,7 @@ def __init__(self):
 
         self.row_count_box = QSpinBox()
         self.memory_box = QSpinBox()
+        self.infinite_scroll_box = QCheckBox(self.tr("Load rows while scrolling (restart required)"))
 
         self.memory_box.setSuffix(" MB")
 
@@ -185,17 +186,20 @@ def __init__(self):
         f_layout = QFormLayout(self)
         f_layout.addRow(self.tr("Rows per page"), self.row_count_box)
         f_layout.addRow(self.tr("Memory Cache"), self.memory_box)
+        f_layout.addRow(self.tr("Infinite scroll"), self.infinite_scroll_box)
 
     def save(self):
         config = self.section_widget.create_config()
         config["rows_per_page"] = self.row_count_box.value()
         config["memory_cache"] = self.memory_box.value()
+        config["infinite_scroll"] = self.infinite_scroll_box.isChecked()
         config.save()
 
     def load(self):
         config = self.section_widget.create_config()
         self.row_count_box.setValue(config.get("rows_per_page", 50))
         self.memory_box.setValue(config.get("memory_cache", 32))
+        self.infinite_scroll_box.setChecked(bool(config.get("infinite_scroll", False)))
 
 
 class LinkSettings(AbstractSettingsWidget):
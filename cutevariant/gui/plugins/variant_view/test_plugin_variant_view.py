@@ -2,6 +2,7 @@
 from tests import utils
 import pytest
 import tempfile
+from collections.abc import Mapping
 
 # Qt imports
 from PySide6 import QtCore, QtWidgets
@@ -99,6 +100,40 @@ def test_model_pagination(qtbot, conn):
     # assert model.page == 1
 
 
+def test_lazy_model(qtbot, conn):
+
+    model = widgets.LazyVariantModel()
+    model.conn = conn
+    model.limit = 2
+    model.window = 1
+    model.fields = ["chr", "pos", "ref", "alt"]
+    model.order_by = [("pos", False)]
+
+    with qtbot.waitSignal(model.load_finished, timeout=10000):
+        model.load()
+
+    assert model.total == 3
+    assert model.rowCount() == 2
+    assert model.pageCount() == 1
+
+    # The next chunk is inserted when the view asks for more rows
+    qtbot.waitUntil(lambda: 1 in model.variants.chunks)
+    assert model.canFetchMore()
+    with qtbot.waitSignal(model.rowsInserted, timeout=10000):
+        model.fetchMore()
+
+    assert model.rowCount() == 3
+    assert not model.canFetchMore()
+
+    # Only one chunk is kept: the first one is loaded again when it is displayed
+    assert model.variant(0) == {}
+    with qtbot.waitSignal(model.dataChanged, timeout=10000):
+        model.data(model.index(0, 0))
+
+    positions = [model.variant(row)["pos"] for row in range(2)]
+    assert positions == sorted(positions, reverse=True)
+
+
 def test_model_data(qtbot, conn):
 
     model = widgets.VariantModel()
@@ -111,7 +146,7 @@ def test_model_data(qtbot, conn):
 
     #  Test read variant
     variant = model.variant(0)
-    assert isinstance(variant, dict)
+    assert isinstance(variant, Mapping)
 
     # Check if fields present in variant
     for field in model.fields:
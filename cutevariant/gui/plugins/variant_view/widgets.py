@@ -7,7 +7,7 @@
 import sqlite3
 import time
 import datetime
-from collections import defaultdict
+from collections import defaultdict, deque
 import copy
 import sys
 import string
@@ -113,7 +113,8 @@ class VariantModel(QAbstractTableModel):
     See Qt model/view programming for more information
     https://doc.qt.io/qt-5/model-view-programming.html
 
-    Variants are stored internally as a list of variants.
+    Variants are stored internally as a list of variants
+    (:class:`cutevariant.core.command.Row`, which share the same column index).
     By default, there is only one variant per row until a user selects a field
     from annotations or from multiple samples.
     Duplicated variants will be displayed in this case. It is advised to use the
@@ -123,7 +124,11 @@ class VariantModel(QAbstractTableModel):
     Signals:
         variant_loaded(bool): Emit when variant are loaded
         count_loaded(bool): Emit when total count are loaded
+            If the count has exceeded its time budget, `total` is a lower bound
+            and `count_is_estimate` is True.
         error_raised(str): Emit message when threads or something else encounter errors
+        query_progress(int, float): Emit sqlite VM steps and elapsed seconds of
+            the running queries
     """
 
     # emit when variant results is loaded
@@ -142,15 +147,20 @@ class VariantModel(QAbstractTableModel):
 
     error_raised = Signal(str)
     interrupted = Signal()
+    query_progress = Signal(int, float)
 
     sort_changed = Signal(str, bool)
 
+    # Variants are displayed by pages of `limit` rows (see setPage())
+    paginated = True
+
     def __init__(self, conn=None, parent=None):
         super().__init__()
         self.limit = 50
         self.memory_cache = 32
         self.page = 1  #
         self.total = 0
+        self.count_is_estimate = False
         self.variants = []
         self.headers = []
 
@@ -165,6 +175,8 @@ def __init__(self, conn=None, parent=None):
 
         self.filters = dict()
         self.source = "variants"
+        # Samples used by samples[ANY], samples[ALL] and samples[COUNT>=k] filters
+        self.selected_samples = []
         self.group_by = []
         self.having = {}
         self.order_by = []
@@ -176,21 +188,29 @@ def __init__(self, conn=None, parent=None):
         self.mutex = QMutex()
 
         # Thread (1 for getting variant, 1 for getting count variant )
-        self._load_variant_thread = SqlThread(self.conn)
-        self._load_count_thread = SqlThread(self.conn)
+        # Queries are stopped when they exceed the time budget of their class
+        self._load_variant_thread = SqlThread(self.conn, query_class="page", plugin="variant_view")
+        self._load_count_thread = SqlThread(self.conn, query_class="count", plugin="variant_view")
 
         self._load_variant_thread.started.connect(lambda: self.variant_is_loading.emit(True))
         self._load_variant_thread.finished.connect(lambda: self.variant_is_loading.emit(False))
+        self._load_variant_thread.finished.connect(self._on_thread_finished)
         self._load_variant_thread.result_ready.connect(self.on_variant_loaded)
         self._load_variant_thread.error.connect(self.error_raised)
+        self._load_variant_thread.progress.connect(self.query_progress)
 
         self._load_count_thread.started.connect(lambda: self.count_is_loading.emit(True))
         self._load_count_thread.finished.connect(lambda: self.count_is_loading.emit(False))
+        self._load_count_thread.finished.connect(self._on_thread_finished)
         self._load_count_thread.result_ready.connect(self.on_count_loaded)
+        self._load_count_thread.timed_out.connect(self.on_count_timed_out)
+        self._load_count_thread.progress.connect(self.query_progress)
 
         self._finished_thread_count = 0
         self._user_has_interrupt = False
         self._is_loading = False
+        # load() has been called while threads were running
+        self._load_pending = False
 
         # Create results cache because Thread doesn't use the memoization cache from command.py.
         # This is because Thread create a new connection and change the function signature used by the cache.
@@ -270,8 +290,9 @@ def set_cache(self, cachesize=32):
         if hasattr(self, "_load_count_cache"):
             self._load_count_cache.clear()
 
+        # Size of cached pages, including their rows and values
         self._load_variant_cache = cachetools.LFUCache(
-            maxsize=cachesize * 1_048_576, getsizeof=sys.getsizeof
+            maxsize=cachesize * 1_048_576, getsizeof=cm.deep_getsizeof
         )
         self._load_count_cache = cachetools.LFUCache(maxsize=1000)
 
@@ -282,6 +303,10 @@ def cache_size(self):
     def max_cache_size(self):
         return self._load_variant_cache.maxsize
 
+    def memory_size(self):
+        """Return the size in bytes of the variants loaded in the model"""
+        return cm.deep_getsizeof(self.variants)
+
     def clear(self):
         """Reset the current model
 
@@ -401,14 +426,10 @@ def headerData(self, section, orientation=Qt.Horizontal, role=Qt.DisplayRole):
         # vertical header
         if role == Qt.ToolTipRole and orientation == Qt.Vertical:
             variant = self.variant(section)
-            variant = variant | dict(
-                sql.get_variant(
-                    conn=self.conn,
-                    variant_id=variant["id"],
-                    with_annotations=True,
-                    with_samples=True,
-                )
-            )
+            details = toolTip.get_tooltip_service().variant(self.conn, variant["id"])
+            if details is None:
+                return toolTip.LOADING_TEXT
+            variant = variant | details
             variant_tooltip = toolTip.variant_tooltip(
                 data=variant, conn=self.conn, fields=self.fields
             )
@@ -505,13 +526,9 @@ def find_row_id_from_variant_id(self, variant_id: int) -> list:
     def interrupt(self):
         """Interrupt current query if active
 
-        This is a blocking function...
-
-        call interrupt and wait for the error_raised signals ...
-        If nothing happen after 1000 ms, by pass and continue
-        If I don't use the dead time, it is waiting for an infinite time
-        at startup ... Because at startup, loading is called 2 times.
-        One time by the register_plugin and a second time by the plugin.show_event
+        This function doesn't block: the running queries stop at the next call
+        of their progress handler. If load() is called meanwhile, it is
+        executed when the threads are finished.
         """
 
         interrupted = False
@@ -520,14 +537,12 @@ def interrupt(self):
             if self._load_count_thread.isRunning():
                 self._user_has_interrupt = True
                 self._load_count_thread.interrupt()
-                self._load_count_thread.wait(1000)
                 interrupted = True
 
         if self._load_variant_thread:
             if self._load_variant_thread.isRunning():
                 self._user_has_interrupt = True
                 self._load_variant_thread.interrupt()
-                self._load_variant_thread.wait(1000)
                 interrupted = True
 
         if interrupted:
@@ -558,11 +573,15 @@ def load(self):
         if self.conn is None:
             return
 
-        if self.is_running() or self._is_loading:
-            LOGGER.debug("Cannot load data. Thread is not finished. You can call interrupt() ")
+        if self.is_running():
+            LOGGER.debug("Threads are not finished. Interrupt them and load when finished")
+            self._load_pending = True
+            self.interrupt()
             return
 
+        self._load_pending = False
         self._is_loading = True
+        self.count_is_estimate = False
         LOGGER.debug("Start loading")
         self.mutex.lock()
         offset = (self.page - 1) * self.limit
@@ -574,6 +593,7 @@ def load(self):
         # LOGGER.debug("Page queried: %s", self.page)
 
         query_fields = set(self.fields + self._extra_fields)
+        order_by = self._query_order_by()
 
         # Store SQL query for debugging purpose
         self.debug_sql = build_sql_query(
@@ -583,7 +603,8 @@ def load(self):
             filters=self.filters,
             limit=self.limit,
             offset=offset,
-            order_by=self.order_by,
+            order_by=order_by,
+            selected_samples=self.selected_samples,
         )
 
         LOGGER.debug(self.debug_sql)
@@ -595,7 +616,9 @@ def load(self):
             filters=self.filters,
             limit=self.limit,
             offset=offset,
-            order_by=self.order_by,
+            order_by=order_by,
+            selected_samples=self.selected_samples,
+            compact=True,
         )
 
         # Create count_func to run asynchronously: count variants
@@ -604,6 +627,7 @@ def load(self):
             fields=query_fields,
             source=self.source,
             filters=self.filters,
+            selected_samples=self.selected_samples,
         )
 
         # Start the run
@@ -620,7 +644,7 @@ def load(self):
             self._load_count_thread.results = self._load_count_cache[self._count_hash]
             self.on_count_loaded()
         else:
-            self._load_count_thread.start_function(count_function)
+            self._load_count_thread.start_function(count_function, caching_hash=self._count_hash)
 
         # Launch the second thread "count" or by pass it using the cache
         if self._variant_hash in self._load_variant_cache:
@@ -628,7 +652,9 @@ def load(self):
             self.on_variant_loaded()
 
         else:
-            self._load_variant_thread.start_function(lambda conn: list(load_func(conn)))
+            self._load_variant_thread.start_function(
+                lambda conn: list(load_func(conn)), caching_hash=self._variant_hash
+            )
 
         self.mutex.unlock()
 
@@ -647,7 +673,8 @@ def on_variant_loaded(self):
         self._load_variant_cache[self._variant_hash] = self._load_variant_thread.results.copy()
 
         # Load variants
-        self.variants = self._load_variant_thread.results
+        self._set_variants(self._load_variant_thread.results)
+        self._prefetch_tooltips(self._load_variant_thread.results)
         if self.variants:
             # Set headers of the view
             self.headers = list(self.variants[0].keys())
@@ -659,13 +686,24 @@ def on_variant_loaded(self):
         self.endResetModel()
         self.variant_loaded.emit()
 
-        #  Test if both thread are finished
-        self._finished_thread_count += 1
-        if self._finished_thread_count == 2:
-            self._end_timer = time.perf_counter()
-            self.elapsed_time = self._end_timer - self._start_timer
-            self._is_loading = False
-            self.load_finished.emit()
+        if self.count_is_estimate:
+            self._estimate_total()
+            self.count_loaded.emit()
+
+        self._on_query_finished()
+
+    def _prefetch_tooltips(self, variants: list):
+        """Load in the background the data shown by the tooltips of variants"""
+        variant_ids = [variant["id"] for variant in variants]
+        toolTip.get_tooltip_service().prefetch(self.conn, variant_ids)
+
+    def _query_order_by(self) -> list:
+        """Return the order by clause of the queries"""
+        return self.order_by
+
+    def _set_variants(self, variants: list):
+        """Store the variants loaded by the variant query"""
+        self.variants = variants
 
     def on_count_loaded(self):
         """
@@ -676,9 +714,26 @@ def on_count_loaded(self):
         self._load_count_cache[self._count_hash] = self._load_count_thread.results.copy()
 
         self.total = self._load_count_thread.results["count"]
+        self.count_is_estimate = False
         self.count_loaded.emit()
 
-        #  Test if both thread are finished
+        self._on_query_finished()
+
+    def on_count_timed_out(self):
+        """
+        Triggered when count_thread has exceeded its time budget
+
+        The count is replaced by a lower bound computed from the loaded page,
+        so the current page and the next one stay reachable.
+        """
+        self.count_is_estimate = True
+        self._estimate_total()
+        self.count_loaded.emit()
+
+        self._on_query_finished()
+
+    def _on_query_finished(self):
+        """Emit load_finished when both the variant and the count queries are done"""
         self._finished_thread_count += 1
         if self._finished_thread_count == 2:
             self._end_timer = time.perf_counter()
@@ -686,6 +741,18 @@ def on_count_loaded(self):
             self._is_loading = False
             self.load_finished.emit()
 
+    def _estimate_total(self):
+        """Set total to the number of variants known to exist"""
+        self.total = (self.page - 1) * self.limit + len(self.variants)
+        if len(self.variants) >= self.limit:
+            # The page is full: there is probably a next page
+            self.total += 1
+
+    def _on_thread_finished(self):
+        """Execute load() if it has been called while threads were running"""
+        if self._load_pending and not self.is_running():
+            self.load()
+
     def hasPage(self, page: int) -> bool:
         """Return True if <page> exists otherwise return False"""
         return (page - 1) >= 0 and (page - 1) * self.limit < self.total
@@ -741,6 +808,14 @@ def variant(self, row: int) -> dict:
         """Return variant data according index"""
         return self.variants[row]
 
+    def page_variant_ids(self, row: int) -> list:
+        """Return the ids of the variants displayed with the variant of row
+
+        Plugins showing data of the current variant can read the data of these
+        variants in the same query.
+        """
+        return list(dict.fromkeys(variant["id"] for variant in self.variants))
+
     def is_variant_loading(self):
         if self._load_variant_thread:
             return self._load_variant_thread.isRunning()
@@ -759,6 +834,354 @@ def removeColumn(self, column: int, parent: QModelIndex = QModelIndex()) -> bool
         self.endRemoveColumns()
 
 
+class ChunkedRows:
+    """Rows of a query, stored by chunks of `chunk_size` rows
+
+    The model exposes the first `length` rows. Rows of a chunk which is not in
+    memory (evicted, or not loaded yet) are None.
+
+    Attributes:
+        chunk_size (int): Number of rows per chunk
+        chunks (dict): {chunk index: list of rows}
+        length (int): Number of rows inserted in the model
+    """
+
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self.chunks = {}
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, row: int):
+        if row < 0:
+            row += self.length
+        if not 0 <= row < self.length:
+            raise IndexError(row)
+
+        chunk = self.chunks.get(row // self.chunk_size)
+        if chunk is None:
+            return None
+        return chunk[row % self.chunk_size]
+
+    def __iter__(self):
+        for row in range(self.length):
+            yield self[row]
+
+    def clear(self):
+        self.chunks.clear()
+        self.length = 0
+
+
+class LazyVariantModel(VariantModel):
+    """VariantModel which loads variants while the view is scrolled
+
+    Instead of pages, variants are read by chunks of `limit` rows:
+
+    - the first chunk is loaded by :meth:`load`, with the count
+    - the next chunk is prefetched in a background thread as soon as the
+      previous one is received, and inserted when the view asks for it
+      (see canFetchMore() and fetchMore())
+    - only `window` chunks are kept in memory. The chunks far from the
+      displayed rows are evicted, and loaded again when they are displayed.
+
+    Each chunk is read with a keyset cursor (the order by values of the last
+    row of the previous chunk) instead of an OFFSET, so reading the 1000th chunk
+    is as fast as reading the first one. Cursors are kept to load evicted chunks
+    again. Queries with annotations or samples fields return several rows per
+    variant; these chunks are read with an OFFSET.
+    """
+
+    paginated = False
+
+    def __init__(self, conn=None, parent=None):
+        super().__init__(conn, parent)
+        # Maximum number of chunks in memory
+        self.window = 20
+        self.variants = ChunkedRows(self.limit)
+
+        # Keyword arguments of select_cmd for the current query
+        self._chunk_query = {}
+        # Keyset filters of each chunk; None if the chunk is read with an OFFSET
+        self._cursors = []
+        self._use_keyset = False
+        # Index of the last chunk of the query, or None if unknown
+        self._last_chunk = None
+        # True if all the rows of the query are inserted in the model
+        self._fetched_all = True
+        # Chunks waiting for the chunk thread, displayed chunks first
+        self._chunk_requests = deque()
+        self._loading_chunk = None
+        # True if the view has asked for the next chunk before it was received
+        self._fetch_pending = False
+        self._current_chunk = 0
+        # Incremented by each load, to ignore chunks of previous queries
+        self._generation = 0
+
+        self._chunk_thread = SqlThread(self.conn, query_class="page", plugin="variant_view")
+        self._chunk_thread.result_ready.connect(self._on_chunk_loaded)
+        self._chunk_thread.finished.connect(self._on_chunk_thread_finished)
+        self._chunk_thread.error.connect(self.error_raised)
+
+    @VariantModel.conn.setter
+    def conn(self, conn):
+        """Set sqlite connection"""
+        VariantModel.conn.fset(self, conn)
+        if conn:
+            self._chunk_thread.conn = conn
+
+    def _query_order_by(self) -> list:
+        """Return the order by clause, made unique by the variant id"""
+        order_by = list(self.order_by or [])
+        if "id" not in (field for field, _ in order_by):
+            order_by.append(("id", True))
+        return order_by
+
+    def load(self):
+        """Overrided: load the first chunk of variants and the variant count"""
+        if self.conn is None or self.is_running():
+            super().load()
+            return
+
+        self.page = 1
+        self._generation += 1
+        self._chunk_requests.clear()
+        self._fetch_pending = False
+        # Don't read chunks for the rows of the previous query
+        self._cursors = []
+        self._fetched_all = True
+
+        query_fields = set(self.fields + self._extra_fields)
+        self._chunk_query = {
+            "fields": query_fields,
+            "source": self.source,
+            "filters": self.filters,
+            "order_by": self._query_order_by(),
+            "selected_samples": self.selected_samples,
+            "compact": True,
+        }
+        # Rows are unique only if there is one row per variant
+        self._use_keyset = not any(
+            field.startswith(("ann.", "samples.")) for field in query_fields
+        )
+        super().load()
+
+    def _set_variants(self, variants: list):
+        """Overrided: store the first chunk and prefetch the next one"""
+        self.variants = ChunkedRows(self.limit)
+        self.variants.chunks[0] = variants
+        self.variants.length = len(variants)
+        self._cursors = [None]
+        self._last_chunk = None
+        self._current_chunk = 0
+        self._store_cursor(0, variants)
+        self._fetched_all = self._last_chunk == 0
+        self._request_chunk(1)
+
+    def _store_cursor(self, index: int, rows: list):
+        """Store the cursor of the chunk following the chunk `index`"""
+        if len(rows) < self.limit:
+            self._last_chunk = index
+            return
+
+        if index + 1 == len(self._cursors):
+            cursor = None
+            if self._use_keyset:
+                cursor = querybuilder.keyset_filters(
+                    self._chunk_query["filters"], self._chunk_query["order_by"], rows[-1]
+                )
+            self._cursors.append(cursor)
+
+    def _request_chunk(self, index: int, displayed=False):
+        """Ask the chunk thread to load the chunk `index`
+
+        Args:
+            displayed (bool): If True, the chunk is loaded before prefetched chunks
+        """
+        if self._last_chunk is not None and index > self._last_chunk:
+            return
+
+        if (
+            index in self.variants.chunks
+            or index == self._loading_chunk
+            or index in self._chunk_requests
+        ):
+            return
+
+        if displayed:
+            self._chunk_requests.appendleft(index)
+        else:
+            self._chunk_requests.append(index)
+
+        self._load_next_chunk()
+
+    def _load_next_chunk(self):
+        """Start the chunk thread with the next requested chunk"""
+        if self._chunk_thread.isRunning() or self._load_pending:
+            return
+
+        while self._chunk_requests:
+            index = self._chunk_requests.popleft()
+            # A chunk can only be read after the previous one
+            if index < len(self._cursors) and index not in self.variants.chunks:
+                break
+        else:
+            return
+
+        cursor = self._cursors[index]
+        if cursor is None:
+            filters, offset = self._chunk_query["filters"], index * self.limit
+        else:
+            filters, offset = cursor, 0
+
+        load_func = functools.partial(
+            cmd.select_cmd,
+            **dict(self._chunk_query, filters=filters),
+            limit=self.limit,
+            offset=offset,
+        )
+        self._loading_chunk = index
+        generation = self._generation
+        self._chunk_thread.start_function(lambda conn: (generation, index, list(load_func(conn))))
+
+    def _on_chunk_loaded(self):
+        """Triggered when the chunk thread has loaded a chunk"""
+        generation, index, rows = self._chunk_thread.results
+        if generation != self._generation:
+            return
+
+        self.variants.chunks[index] = rows
+        self._store_cursor(index, rows)
+        self._prefetch_tooltips(rows)
+
+        first_row = index * self.limit
+        if first_row < len(self.variants):
+            # The chunk has been evicted and is displayed again
+            last_row = first_row + len(rows) - 1
+            self.dataChanged.emit(
+                self.index(first_row, 0), self.index(last_row, self.columnCount() - 1)
+            )
+            self.headerDataChanged.emit(Qt.Vertical, first_row, last_row)
+        elif self._fetch_pending:
+            self._fetch_pending = False
+            self.fetchMore()
+
+        self._evict_chunks(keep=index)
+
+    def _on_chunk_thread_finished(self):
+        """Load the next requested chunk, or execute a pending load()"""
+        self._loading_chunk = None
+        if self._load_pending:
+            self._on_thread_finished()
+        else:
+            self._load_next_chunk()
+
+    def _evict_chunks(self, keep: int):
+        """Remove the chunks farthest from the displayed rows, except `keep`"""
+        chunks = self.variants.chunks
+        while len(chunks) > max(self.window, 1):
+            farthest = max(
+                (index for index in chunks if index != keep),
+                key=lambda index: abs(index - self._current_chunk),
+            )
+            del chunks[farthest]
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        """Overrided: Return True if the query has rows not inserted in the model"""
+        if parent.isValid():
+            return False
+        return not self._fetched_all
+
+    def fetchMore(self, parent=QModelIndex()):
+        """Overrided: Insert the next chunk, or load it if it is not received yet"""
+        if parent.isValid():
+            return
+
+        first_row = len(self.variants)
+        index = first_row // self.limit
+        rows = self.variants.chunks.get(index)
+        if rows is None:
+            self._fetch_pending = True
+            self._request_chunk(index, displayed=True)
+            return
+
+        if rows:
+            self.beginInsertRows(QModelIndex(), first_row, first_row + len(rows) - 1)
+            self.variants.length += len(rows)
+            self.endInsertRows()
+
+        self._current_chunk = index
+        if index == self._last_chunk:
+            self._fetched_all = True
+        else:
+            self._request_chunk(index + 1)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        """Overrided: return index data, and load it if its chunk has been evicted"""
+        if index.isValid() and index.row() < len(self.variants):
+            chunk = index.row() // self.limit
+            self._current_chunk = chunk
+            if self.variants[index.row()] is None:
+                self._request_chunk(chunk, displayed=True)
+                return self.tr("Loading...") if role == Qt.DisplayRole else None
+
+        return super().data(index, role)
+
+    def headerData(self, section, orientation=Qt.Horizontal, role=Qt.DisplayRole):
+        """Overrided: no tooltip for the rows which are not loaded"""
+        if orientation == Qt.Vertical and self.variants[section] is None:
+            return None
+        return super().headerData(section, orientation, role)
+
+    def variant(self, row: int) -> dict:
+        """Return variant data according index; empty if the row is not loaded"""
+        variant = self.variants[row]
+        if variant is None:
+            self._request_chunk(row // self.limit, displayed=True)
+            return {}
+        return variant
+
+    def page_variant_ids(self, row: int) -> list:
+        """Overrided: return the ids of the variants of the chunk of row"""
+        rows = self.variants.chunks.get(row // self.limit) or []
+        return list(dict.fromkeys(variant["id"] for variant in rows))
+
+    def find_row_id_from_variant_id(self, variant_id: int) -> list:
+        """Overrided: Find the ids of the loaded rows with the given variant_id"""
+        return [
+            row_id
+            for row_id, variant in enumerate(self.variants)
+            if variant is not None and variant["id"] == variant_id
+        ]
+
+    def clear(self):
+        """Overrided: Reset the model and forget the chunks being loaded"""
+        self._generation += 1
+        self._chunk_requests.clear()
+        self._cursors = []
+        self._fetched_all = True
+        super().clear()
+
+    def interrupt(self):
+        """Overrided: Also interrupt the chunk thread"""
+        self._chunk_requests.clear()
+        if self._chunk_thread.isRunning():
+            self._chunk_thread.interrupt()
+        super().interrupt()
+
+    def is_running(self):
+        return super().is_running() or self._chunk_thread.isRunning()
+
+    def hasPage(self, page: int) -> bool:
+        """Overrided: All variants are on the first page"""
+        return page == 1
+
+    def pageCount(self):
+        """Overrided: All variants are on the first page"""
+        return 1
+
+
 class LoadingTableView(QTableView):
     """Movie animation displayed on VariantView for long SQL queries executed
     in background.
@@ -816,10 +1239,12 @@ class VariantView(QWidget):
     filters_menu_changed = Signal(dict)
     vql_button_clicked = Signal()
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, infinite_scroll=False):
         """
         Args:
             parent: parent widget
+            infinite_scroll (bool): If True, variants are loaded while the view
+                is scrolled instead of by pages (see :class:`LazyVariantModel`)
         """
         super().__init__(parent)
 
@@ -839,7 +1264,7 @@ def __init__(self, parent=None):
         )
 
         # Setup model
-        self.model = VariantModel()
+        self.model = LazyVariantModel() if infinite_scroll else VariantModel()
         self.delegate = formatter.FormatterDelegate()
         self.delegate.set_formatter(CutestyleFormatter())
 
@@ -862,6 +1287,7 @@ def __init__(self, parent=None):
         self.view.setModel(self.model)
 
         self.view.setItemDelegate(self.delegate)
+        toolTip.get_tooltip_service().data_loaded.connect(self.on_tooltip_data_loaded)
         # setup bottom bar toolbar
         spacer = QWidget()
         spacer.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
@@ -908,6 +1334,7 @@ def __init__(self, parent=None):
         # Connection
         self.model.variant_loaded.connect(self.on_variant_loaded)
         self.model.count_loaded.connect(self.on_count_loaded)
+        self.model.query_progress.connect(self.on_query_progress)
         self.model.load_finished.connect(self.on_load_finished)
         self.model.count_is_loading.connect(self.set_tool_loading)
         self.model.variant_is_loading.connect(self.set_view_loading)
@@ -1163,9 +1590,10 @@ def on_variant_loaded(self):
         #         self.select_row(0)
         #     else:
         #         self.no_variant.emit()
+        rows = cm.bytes_to_readable(self.model.memory_size())
         cache = cm.bytes_to_readable(self.model.cache_size())
         max_cache = cm.bytes_to_readable(self.model.max_cache_size())
-        self.cache_label.setText(str(" Cache {} of {}".format(cache, max_cache)))
+        self.cache_label.setText(str(" Rows {} Cache {} of {}".format(rows, cache, max_cache)))
 
         self.view.scrollToTop()
 
@@ -1184,8 +1612,17 @@ def on_count_loaded(self):
             self.page_box.setText(str(self.model.page))
             self.set_pagging_enabled(True)
 
-        text = self.tr("{} line(s) Page {} on {}")
-        text = text.format(self.model.total, self.model.page, self.model.pageCount())
+        if not self.model.paginated and self.model.count_is_estimate:
+            text = self.tr("More than {} line(s)").format(self.model.total - 1)
+        elif not self.model.paginated:
+            text = self.tr("{} line(s)").format(self.model.total)
+        elif self.model.count_is_estimate:
+            # The count has exceeded its time budget
+            text = self.tr("More than {} line(s) Page {}")
+            text = text.format(self.model.total - 1, self.model.page)
+        else:
+            text = self.tr("{} line(s) Page {} on {}")
+            text = text.format(self.model.total, self.model.page, self.model.pageCount())
         self.info_label.setText(text)
 
         #  Set focus to view ! Otherwise it stay on page_box
@@ -1195,6 +1632,10 @@ def on_load_finished(self):
         self.time_label.setText(str(" Executed in %.2gs " % (self.model.elapsed_time)))
         self.load_finished.emit()
 
+    def on_query_progress(self, steps: int, elapsed: float):
+        """Show the elapsed time of the running queries"""
+        self.time_label.setText(self.tr(" Running for %.1fs ") % elapsed)
+
     def set_formatter(self, formatter_class):
 
         self.delegate.set_formatter(formatter_class)
@@ -1841,6 +2282,10 @@ def on_double_clicked(self, index: QModelIndex):
         # self.open_editor(index)
         self.update_favorites()
 
+    def on_tooltip_data_loaded(self):
+        """Show the loaded data in the tooltip of the hovered variant"""
+        toolTip.refresh_loading_tooltip(self.view)
+
     def on_double_clicked_vertical_header(self, index: QModelIndex):
         """
         Action on doubleClick on verticalHeader
@@ -1968,7 +2413,13 @@ def create_external_links_menu(self):
 
     def show_unique_values(self, field: str):
         groupby_dialog = GroupbyDialog(self.conn, self)
-        groupby_dialog.load(field, self.model.fields, self.model.source, self.model.filters)
+        groupby_dialog.load(
+            field,
+            self.model.fields,
+            self.model.source,
+            self.model.filters,
+            self.model.selected_samples,
+        )
         if groupby_dialog.exec() == QDialog.Accepted:
             selected_values = groupby_dialog.get_selected_values()
             if selected_values:
@@ -2007,7 +2458,8 @@ def __init__(self, parent=None):
         super().__init__(parent)
 
         # Create the variant view
-        self.view = VariantView(parent=self)
+        infinite_scroll = self.create_config().get("infinite_scroll", False)
+        self.view = VariantView(parent=self, infinite_scroll=infinite_scroll)
 
         # Setup layout
         main_layout = QVBoxLayout(self)
@@ -2155,6 +2607,7 @@ def on_refresh(self):
             self.view.filters = self.mainwindow.get_state_data("filters")
             self.view.model.order_by = self.mainwindow.get_state_data("order_by")
             self.view.model.source = self.mainwindow.get_state_data("source")
+            self.view.model.selected_samples = self.mainwindow.get_state_data("samples") or []
 
             self.view.load(reset_page=True)
 
@@ -2172,9 +2625,12 @@ def on_variant_clicked(self, index: QModelIndex):
 
             # TODO Make current_variant state data take the value of the whole variant (with annotations and samples!)
             variant = self.view.model.variant(index.row())
+            page_variant_ids = self.view.model.page_variant_ids(index.row())
 
         if self.mainwindow:
             self.mainwindow.set_state_data("current_variant", variant)
+            # Plugins can load the data of these variants with the current one
+            self.mainwindow.set_state_data("page_variant_ids", page_variant_ids)
             # Request a refresh of the variant_info plugin
             self.mainwindow.refresh_plugins(self)
 
@@ -35,6 +35,9 @@
 
 from cutevariant import LOGGER
 
+# Maximum number of samples proposed by the completer
+SAMPLE_COMPLETION_LIMIT = 50
+
 
 class VqlEditorWidget(plugin.PluginWidget):
     """Exposed class to manage VQL/SQL queries from the mainwindow"""
@@ -121,8 +124,8 @@ def _fill_completer(self):
 
         Fill the model with the SQL keywords and database fields
         """
-        # preload samples , selection and wordset
-        samples = [i["name"] for i in sql.get_samples(self.conn)]
+        # preload selection and wordset; samples are searched while typing
+        self._sample_fields = []
         selections = [i["name"] for i in sql.get_selections(self.conn)]
         wordsets = [i["name"] for i in sql.get_wordsets(self.conn)]
 
@@ -173,19 +176,10 @@ def _fill_completer(self):
                 name = "samples[ALL].{}".format(field["name"])
                 self.text_edit.completer.model.add_item(name, description, icon, color)
 
-                # Overwrite name
-                for sample in samples:
-                    name = "samples['{}'].{}".format(sample, field["name"])
-                    description = "<b>{}</b> ({}) from {} {} <br/><br/> {}".format(
-                        field["name"],
-                        field["type"],
-                        field["category"],
-                        sample,
-                        field["description"],
-                    )
-                    self.text_edit.completer.model.add_item(name, description, icon, color)
+                self._sample_fields.append((field, icon, color))
 
         self.text_edit.completer.model.endResetModel()
+        self.text_edit.completer.items_provider = self._sample_completions
 
         # if field["category"] == "samples":
         #     for sample in samples:
@@ -193,6 +187,32 @@ def _fill_completer(self):
         # else:
         #     keywords.append(field["name"])
 
+    def _sample_completions(self, prefix: str) -> list:
+        """Return the completer items of the samples whose name starts with prefix
+
+        Only SAMPLE_COMPLETION_LIMIT samples are read from the database.
+        """
+        if not prefix or not self._sample_fields:
+            return []
+        items = []
+        samples = sql.search_samples(
+            self.conn, prefix, limit=SAMPLE_COMPLETION_LIMIT, prefix=True
+        )
+        for sample in samples:
+            for field, icon, color in self._sample_fields:
+                name = "samples['{}'].{}".format(sample["name"], field["name"])
+                description = "<b>{}</b> ({}) from {} {} <br/><br/> {}".format(
+                    field["name"],
+                    field["type"],
+                    field["category"],
+                    sample["name"],
+                    field["description"],
+                )
+                items.append(
+                    {"name": name, "description": description, "icon": icon, "color": color}
+                )
+        return items
+
     def check_vql(self) -> bool:
         """Check VQL statement; return True if OK, False when an error occurs
 
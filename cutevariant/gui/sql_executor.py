@@ -0,0 +1,382 @@
+"""Shared executor of the background database work of the GUI
+
+All the queries sent to the database in the background (variants, counts,
+group by, stats, metrics...) are executed by the threads of a single
+:class:`SqlExecutor`, instead of one thread per plugin:
+
+- The number of OS threads is bounded by the size of the thread pool
+  (`query_thread_count` in the app config).
+- Each plugin can run at most a few tasks at once (`plugin_query_limits` in the
+  app config); the other tasks of the plugin wait in the executor.
+- Tasks are started by order of priority. By default, the priority is given
+  by the query class (see :data:`cutevariant.core.query_scheduler.QUERY_PRIORITIES`).
+- Each submitted task returns a :class:`CancellationToken` to stop it, whether
+  it waits or runs.
+- Callbacks are called in the GUI thread.
+
+Tasks are run through :class:`cutevariant.core.query_scheduler.QueryScheduler`,
+which limits the number of concurrent queries on the database.
+
+Examples:
+
+    executor = get_sql_executor()
+    token = executor.submit(
+        conn,
+        lambda conn: count_cmd(conn, filters=filters),
+        callback=lambda result: print(result["count"]),
+        query_class="count",
+        plugin="variant_view",
+    )
+    token.cancel()
+"""
+# Standard imports
+import heapq
+import itertools
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from functools import partial
+from typing import Callable
+
+# Qt imports
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Qt, Signal
+
+# Custom imports
+from cutevariant.config import Config
+from cutevariant.core.sql import get_connection_pool, retry_when_busy
+from cutevariant.core.query_scheduler import (
+    QUERY_PRIORITIES,
+    QueryScheduler,
+    get_query_scheduler,
+)
+from cutevariant.core.sql_progress import ProgressHandler, QueryCancelled, QUERY_TIME_BUDGETS
+
+from cutevariant import LOGGER
+
+# Default number of threads of the executor
+THREAD_COUNT = 4
+
+# Default number of tasks running at once for a plugin
+PLUGIN_LIMIT = 2
+
+_executor = None
+
+
+def database_file(conn: sqlite3.Connection) -> str:
+    """Return the file path of the main database of the connection
+
+    Raises:
+        ValueError: If the database is not stored in a file
+    """
+    db_file = conn.execute("PRAGMA database_list").fetchone()[2]
+    if not db_file:
+        raise ValueError("Cannot run background queries without a file database")
+    return db_file
+
+
+def time_budget(query_class: str) -> float:
+    """Return the time budget in seconds of the query class, or None if unlimited"""
+    if not query_class:
+        return None
+
+    budgets = dict(QUERY_TIME_BUDGETS)
+    budgets.update(Config("app").get("query_time_budgets") or {})
+    return budgets.get(query_class)
+
+
+class CancellationToken:
+    """Handle to cancel a submitted task
+
+    A task cancelled before its start is never executed. A running query stops
+    at the next call of its progress handler.
+
+    Attributes:
+        cancelled (bool): True if cancel() has been called
+    """
+
+    def __init__(self, handler: ProgressHandler = None):
+        self.handler = handler or ProgressHandler()
+        self._done = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.handler.cancelled
+
+    def cancel(self):
+        """Cancel the task"""
+        self.handler.cancel()
+
+    def is_done(self) -> bool:
+        """Return True if the task has stopped, whatever the reason"""
+        return self._done.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until the task has stopped
+
+        Args:
+            timeout (float): Maximum time to wait in seconds, None to wait forever
+
+        Returns:
+            bool: False if the timeout has expired
+        """
+        return self._done.wait(timeout)
+
+
+class SqlTask(QRunnable):
+    """A function executed with a connection of the pool of its database
+
+    The task can also be executed synchronously by calling :meth:`execute`.
+
+    Attributes:
+        db_file (str): File path of the database
+        function (Callable): Function taking a sqlite3.Connection
+        query_class (str): "page", "count", "group_by", "stats" or None
+        plugin (str): Name of the plugin which submitted the task, or None
+        priority (int): Higher priorities are started first
+        key (Hashable): Identical running tasks with a key share their result
+        token (CancellationToken): Token to cancel the task
+    """
+
+    def __init__(
+        self,
+        db_file: str,
+        function: Callable,
+        query_class: str = None,
+        plugin: str = None,
+        priority: int = None,
+        key=None,
+        progress_callback: Callable = None,
+    ):
+        super().__init__()
+        # The executor keeps a reference on the task until it is finished
+        self.setAutoDelete(False)
+
+        self.db_file = db_file
+        self.function = function
+        self.query_class = query_class
+        self.plugin = plugin
+        if priority is None:
+            priority = len(QUERY_PRIORITIES) - QueryScheduler.priority(query_class)
+        self.priority = priority
+        self.key = key
+        self.token = CancellationToken(
+            ProgressHandler(time_budget(query_class), progress_callback)
+        )
+        self.result = None
+        self.error = None
+        # Called from the worker thread when the task has stopped
+        self.on_start = None
+        self.on_done = None
+
+    def execute(self):
+        """Run the function in the calling thread and return its result
+
+        Raises:
+            QueryCancelled: If the task has been cancelled
+            QueryTimeout: If the query has exceeded its time budget
+        """
+        if self.token.cancelled:
+            raise QueryCancelled("Query cancelled")
+
+        key = None if self.key is None else (self.db_file, self.key)
+        return get_query_scheduler().run(
+            self._execute_function,
+            self.query_class,
+            key,
+            cancelled=lambda: self.token.cancelled,
+        )
+
+    def _execute_function(self):
+        """Run the function with a connection borrowed from the pool"""
+        pool = get_connection_pool(self.db_file)
+        conn = pool.acquire()
+        try:
+            return self.token.handler.run(conn, partial(retry_when_busy, self.function))
+        finally:
+            pool.release(conn)
+
+    def run(self):
+        """Overrided from QRunnable: executed by a thread of the pool"""
+        if self.on_start:
+            self.on_start(self)
+        try:
+            self.result = self.execute()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.token._done.set()
+            if self.on_done:
+                self.on_done(self)
+
+
+class SqlExecutor(QObject):
+    """Run the background tasks of all the plugins on a shared thread pool
+
+    Attributes:
+        pool (QThreadPool): Threads executing the tasks
+        plugin_limits (dict): Maximum number of running tasks per plugin name;
+            the "default" key applies to the plugins which are not listed.
+            Tasks without plugin are only limited by the size of the pool.
+    """
+
+    # Forward the events of the worker threads to the GUI thread
+    _task_started = Signal(object)
+    _task_done = Signal(object)
+
+    def __init__(self, thread_count: int = THREAD_COUNT, plugin_limits: dict = None, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(thread_count)
+        self.plugin_limits = {"default": PLUGIN_LIMIT}
+        self.plugin_limits.update(plugin_limits or {})
+
+        # Tasks submitted and not finished, with their callbacks
+        self._tasks = {}
+        # Number of started tasks per plugin
+        self._running = Counter()
+        # Heaps of (-priority, order, task) of the tasks waiting for their plugin
+        self._pending = defaultdict(list)
+        self._counter = itertools.count()
+
+        self._task_started.connect(self._on_task_started, Qt.QueuedConnection)
+        self._task_done.connect(self._on_task_done, Qt.QueuedConnection)
+
+    def plugin_limit(self, plugin: str) -> int:
+        """Return the maximum number of tasks running at once for the plugin"""
+        return self.plugin_limits.get(plugin, self.plugin_limits["default"])
+
+    def running_count(self, plugin: str = None) -> int:
+        """Return the number of started tasks of the plugin, or of all plugins"""
+        if plugin is None:
+            return sum(self._running.values())
+        return self._running[plugin]
+
+    def pending_count(self, plugin: str = None) -> int:
+        """Return the number of tasks waiting for their plugin limit"""
+        if plugin is None:
+            return sum(len(heap) for heap in self._pending.values())
+        return len(self._pending[plugin])
+
+    def submit(
+        self,
+        conn,
+        function: Callable,
+        callback: Callable = None,
+        error_callback: Callable = None,
+        query_class: str = None,
+        plugin: str = None,
+        priority: int = None,
+        key=None,
+        started_callback: Callable = None,
+        progress_callback: Callable = None,
+        finished_callback: Callable = None,
+    ) -> CancellationToken:
+        """Run function(conn) in the background
+
+        Callbacks are called in the GUI thread. Exactly one of callback and
+        error_callback is called, then finished_callback.
+
+        Args:
+            conn (sqlite3.Connection or str): Connection to the project, or the
+                file path of its database. The function receives another
+                connection to the same file.
+            function (Callable): Function taking a sqlite3.Connection
+            callback (Callable): Called with the result of the function
+            error_callback (Callable): Called with the exception raised by the
+                function: QueryCancelled if the task has been cancelled,
+                QueryTimeout if it has exceeded its time budget...
+            query_class (str): "page", "count", "group_by", "stats" or None
+            plugin (str): Name of the plugin submitting the task
+            priority (int): Priority of the task; higher priorities are started
+                first. Default is given by the query class.
+            key (Hashable): Identity of the query; identical running queries
+                share their result
+            started_callback (Callable): Called without argument when the task starts
+            progress_callback (Callable): Called with the number of sqlite VM
+                steps and the elapsed time, from the worker thread
+            finished_callback (Callable): Called without argument when the task
+                has stopped, whatever the reason
+
+        Returns:
+            CancellationToken: Token to cancel the task
+        """
+        if isinstance(conn, sqlite3.Connection):
+            conn = database_file(conn)
+
+        task = SqlTask(conn, function, query_class, plugin, priority, key, progress_callback)
+        task.on_start = self._task_started.emit
+        task.on_done = self._task_done.emit
+        self._tasks[task] = (callback, error_callback, started_callback, finished_callback)
+
+        if plugin is not None and self._running[plugin] >= self.plugin_limit(plugin):
+            heapq.heappush(self._pending[plugin], (-task.priority, next(self._counter), task))
+        else:
+            self._start(task)
+
+        return task.token
+
+    def cancel(self, plugin: str = None):
+        """Cancel the tasks of a plugin, or all the tasks"""
+        for task in list(self._tasks):
+            if plugin is None or task.plugin == plugin:
+                task.token.cancel()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until all the submitted tasks have stopped
+
+        Returns:
+            bool: False if the timeout has expired
+        """
+        return self.pool.waitForDone(-1 if timeout is None else int(timeout * 1000))
+
+    def _start(self, task: SqlTask):
+        if task.plugin is not None:
+            self._running[task.plugin] += 1
+        self.pool.start(task, task.priority)
+
+    def _start_pending(self, plugin: str):
+        """Start the next tasks of the plugin while it is below its limit"""
+        heap = self._pending[plugin]
+        while heap and self._running[plugin] < self.plugin_limit(plugin):
+            _, _, task = heapq.heappop(heap)
+            self._start(task)
+
+    def _on_task_started(self, task: SqlTask):
+        callbacks = self._tasks.get(task)
+        if callbacks and callbacks[2]:
+            callbacks[2]()
+
+    def _on_task_done(self, task: SqlTask):
+        callback, error_callback, _, finished_callback = self._tasks.pop(task)
+
+        if task.plugin is not None:
+            self._running[task.plugin] -= 1
+            self._start_pending(task.plugin)
+
+        try:
+            if task.error is None:
+                if callback:
+                    callback(task.result)
+            elif error_callback:
+                error_callback(task.error)
+            elif not isinstance(task.error, QueryCancelled):
+                LOGGER.error("Background query failed: %s", task.error)
+        finally:
+            if finished_callback:
+                finished_callback()
+
+
+def get_sql_executor() -> SqlExecutor:
+    """Return the executor shared by the plugins
+
+    It is configured by `query_thread_count` and `plugin_query_limits` in the
+    app config.
+    """
+    global _executor
+    if _executor is None:
+        config = Config("app")
+        _executor = SqlExecutor(
+            config.get("query_thread_count") or THREAD_COUNT,
+            config.get("plugin_query_limits"),
+        )
+    return _executor
@@ -3,27 +3,38 @@
 from typing import Callable
 
 # Qt imports
-from PySide6.QtCore import QThread, QObject, Signal
+from PySide6.QtCore import QObject, Signal
 
 # Custom imports
-from cutevariant.core.sql import get_sql_connection
+from cutevariant.core.sql_progress import QueryCancelled, QueryTimeout
+from cutevariant.gui.sql_executor import SqlTask, database_file, get_sql_executor, time_budget
 
 
 from cutevariant import LOGGER
 
 
-class SqlThread(QThread):
-    """Used to execute SQL/VQL queries in a separated thread
+class SqlThread(QObject):
+    """Used to execute SQL/VQL queries in the background
+
+    Functions are executed by the threads of the shared executor (see
+    :class:`cutevariant.gui.sql_executor.SqlExecutor`): a SqlThread doesn't own
+    an OS thread; it runs one function at a time and reports it with signals.
 
     Attributes:
         - db_file (str): File path of the database.
-        - async_conn (sqlite3.Connection): sqlite3 Connection
-        - function (Callable): Function to be executed
-        - caching_hash: A user defined hash of the request
+        - function (Callable): Function to be executed; it receives a read only
+            sqlite3 Connection borrowed from the connection pool of db_file.
+        - caching_hash: A user defined hash of the request. Threads which run
+            a function with the same hash at the same time share one execution
+            (see :class:`cutevariant.core.query_scheduler.QueryScheduler`).
         - results: Contain the result of the threaded function.
             `None`, as long as the function has not finished its execution done.
-
-
+        - query_class (str): "page", "count", "group_by", "stats" or None.
+            The function is stopped when it exceeds the time budget of its class
+            (see `query_time_budgets` in the app config). The class is also the
+            priority of the function.
+        - plugin (str): Name of the plugin, used to limit the number of
+            functions running at once for a plugin.
 
     Signals:
         - result_ready(): Emitted when results is available. If no results or error ,
@@ -31,25 +42,36 @@ class SqlThread(QThread):
         - error(str): Emitted when the function has encountered an error during
             its execution. The message is formatted with the type and the
             message of the exception.
-        - finished() : inherits from QThread
-        - starte() : inherits from QThread
-
-
-    Notes:
-        AutoDelete flag of such objects is set to False.
-        This means that QThreadPool **will not** delete these objects after
-        calling run() method.
+        - progress(int, float): Emitted during the execution with the number of
+            sqlite VM steps and the elapsed time in seconds.
+        - timed_out(): Emitted when the function has exceeded its time budget,
+            before error().
+        - cancelled(): Emitted when the function has been stopped by interrupt().
+        - started(): Emitted when the function starts
+        - finished(): Emitted when the function has stopped, whatever the reason
     """
 
     error = Signal(str)
     result_ready = Signal()
-
-    def __init__(self, conn: sqlite3.Connection = None, function: Callable = None):
+    progress = Signal(int, float)
+    timed_out = Signal()
+    cancelled = Signal()
+    started = Signal()
+    finished = Signal()
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection = None,
+        function: Callable = None,
+        query_class: str = None,
+        plugin: str = None,
+    ):
         """Init a Thread with sqlite connection and callable
 
         Notes:
-            Since sqlite3 Connection objects are not thread safe, we create a new
-            connection based on it.
+            Since sqlite3 Connection objects are not thread safe, the function
+            is executed with a read only connection to the same file, borrowed
+            from :class:`cutevariant.core.sql.ConnectionPool`.
 
 
 
@@ -63,16 +85,26 @@ def __init__(self, conn: sqlite3.Connection = None, function: Callable = None):
 
         Args:
             conn (sqlite3.Connection): sqlite3 Connexion
+            function (Callable): Function to execute
+            query_class (str): Class of the query, used to get its time budget
+            plugin (str): Name of the plugin running the queries
 
         """
 
         super().__init__()
 
         self.conn = conn
-        self._async_conn = None
         self.results = None
         self.function = function
         self.last_error = None
+        self.query_class = query_class
+        self.plugin = plugin
+        self.caching_hash = None
+        # Token of the running function
+        self._token = None
+        # Function to run when the running one is cancelled
+        self._next_function = None
+        self.finished.connect(self._start_next_function)
 
     @property
     def conn(self) -> sqlite3.Connection:
@@ -83,79 +115,145 @@ def conn(self) -> sqlite3.Connection:
         """
         return self._conn
 
-    @property
-    def async_conn(self) -> sqlite3.Connection:
-        """Return the thread connection
-        It is a clone of application connection for thread safe
-
-        Returns:
-            TYPE: Description
-        """
-        return self._async_conn
-
     @conn.setter
     def conn(self, conn):
         if conn:
             self._conn = conn
-            self._async_conn = None
-            self.db_file = conn.execute("PRAGMA database_list").fetchone()["file"]
+            self.db_file = database_file(conn)
 
-            if not self.db_file:
-                raise Exception("Cannot use SQL_Thread without a file database")
+    def isRunning(self) -> bool:
+        """Return True from the start of the function to the finished signal"""
+        return self._token is not None
 
-    def run(self):
-        """Execute the function in a new thread
+    def wait(self, msecs: int = None) -> bool:
+        """Block until the function has stopped
 
-        Note:
-            All the context of this function is executed into a separated thread.
+        Args:
+            msecs (int): Maximum time to wait in milliseconds, None to wait forever
 
+        Returns:
+            bool: False if the timeout has expired
         """
-        self.last_error = None
-        self.results = None
+        if self._token is None:
+            return True
+        return self._token.wait(None if msecs is None else msecs / 1000)
 
+    def run(self):
+        """Execute the function synchronously, in the calling thread"""
         if self.function is None:
             LOGGER.exception("no function defined")
             return
 
-        self._async_conn = get_sql_connection(self.db_file)
-        assert self.async_conn
-
+        task = self._create_task()
+        self._token = task.token
         try:
-            LOGGER.debug("thread start ")
-            self.results = self.function(self.async_conn)
-            LOGGER.debug("Thread finished")
+            task.result = task.execute()
         except Exception as e:
-            # LOGGER.exception(e)
-            self.last_error = "%s: %s" % (e.__class__.__name__, str(e))
-            self.async_conn.close()
+            task.error = e
+        self._token = None
+        self._on_task_done(task.result, task.error)
+
+    def start(self):
+        """Submit the function to the shared executor"""
+        if self.function is None:
+            LOGGER.exception("no function defined")
+            return
+
+        self.last_error = None
+        self.results = None
+
+        executor = get_sql_executor()
+        self._token = executor.submit(
+            self.db_file,
+            self.function,
+            callback=lambda results: self._on_task_done(results, None),
+            error_callback=lambda error: self._on_task_done(None, error),
+            query_class=self.query_class,
+            plugin=self.plugin,
+            key=self.caching_hash,
+            started_callback=self.started.emit,
+            progress_callback=self.progress.emit,
+            finished_callback=self._on_task_finished,
+        )
+
+    def _create_task(self) -> SqlTask:
+        return SqlTask(
+            self.db_file,
+            self.function,
+            self.query_class,
+            self.plugin,
+            key=self.caching_hash,
+            progress_callback=self.progress.emit,
+        )
+
+    def _on_task_done(self, results, error: Exception):
+        """Store the results of the function and emit the matching signal"""
+        self.last_error = None
+        self.results = results
+
+        if isinstance(error, QueryCancelled):
+            LOGGER.debug("Thread cancelled")
+            self.cancelled.emit()
+        elif isinstance(error, QueryTimeout):
+            self.last_error = "%s: %s" % (error.__class__.__name__, str(error))
+            self.timed_out.emit()
+            self.error.emit(self.last_error)
+        elif error is not None:
+            self.last_error = "%s: %s" % (error.__class__.__name__, str(error))
             self.error.emit(self.last_error)
         else:
-            self.async_conn.close()
+            LOGGER.debug("Thread finished")
             self.result_ready.emit()
 
-        return
+    def _on_task_finished(self):
+        self._token = None
+        self.finished.emit()
 
     def start_function(self, function: Callable, caching_hash=None):
         """Execute a function in the thread
 
+        If a function is running, it is cancelled (its result would be out of
+        date) and the new function starts when it has stopped.
+
         Args:
             function (Callable): Function must take con as arguments
+            caching_hash: Hash of the request; threads running a function with
+                the same hash at the same time share one execution
 
         Examples:
             thread.exec_function(lambda conn: conn.execute("SELECT ..."))
 
         """
         assert isinstance(function, Callable)
+        if self.isRunning():
+            self._next_function = (function, caching_hash)
+            self._token.cancel()
+            return
+
         self.function = function
+        self.caching_hash = caching_hash
         self.start()
 
+    def _start_next_function(self):
+        """Start the function submitted while the previous one was running"""
+        if self._next_function:
+            function, caching_hash = self._next_function
+            self._next_function = None
+            self.start_function(function, caching_hash)
+
+    def time_budget(self) -> float:
+        """Return the time budget in seconds of the query class, or None if unlimited"""
+        return time_budget(self.query_class)
+
     def interrupt(self):
-        """Interrupt the thread connection
+        """Interrupt the running function
 
-        Use this method instead of terminate.
+        The query stops as soon as sqlite calls the progress handler; this
+        method doesn't wait for it. `cancelled` is emitted when it is done.
         """
-        if self.async_conn:
-            self.async_conn.interrupt()
+        self._next_function = None
+        if self._token:
+            self._token.cancel()
 
     @property
     def function(self):
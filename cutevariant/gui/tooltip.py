@@ -1,13 +1,37 @@
 """
 Function to build tooltip 
 Code needs improvement . Avoid multiple embbeded if 
+
+Tooltips are built on the GUI thread each time the mouse hovers a cell. They
+don't query the database: their data (variants, genotypes, samples) is read
+by the shared :class:`TooltipDataService`, which prefetches the details of the
+displayed page in the background. A placeholder is shown while the data of a
+hovered item is loading. Field descriptions are cached per connection.
+
+Examples:
+
+    # When a page of variants is displayed
+    get_tooltip_service().prefetch(conn, variant_ids, samples)
+
+    # When a cell is hovered
+    genotype_tooltip(genotype, conn)
+
+    # When data_loaded is emitted, replace the placeholder of the hovered cell
+    refresh_loading_tooltip(view)
 """
+import json
 import re
 import sqlite3
 import textwrap
+from functools import partial
+
+from PySide6.QtCore import QObject, Qt, Signal
+from PySide6.QtGui import QCursor
+from PySide6.QtWidgets import QTableView, QToolTip
 
 from cutevariant.config import Config
 from cutevariant.gui import style as Style
+from cutevariant.gui.sql_executor import get_sql_executor
 from cutevariant.core import sql
 from cutevariant import constants as cst
 from cutevariant import commons as cm
@@ -15,27 +39,22 @@
 
 NO_TAG_TEXT = "<i>no tags</i>"
 NO_COMMENT_TEXT = "<i>no comment</i>"
+LOADING_TEXT = "<i>Loading...</i>"
 TEXTWRAP_WIDTH = 60
 TEXTWRAP_HOLDER = "..."
 
+_service = None
 
-def genotype_tooltip(data: dict, conn: sqlite3.Connection):
 
-    fields = [f["name"] for f in sql.get_field_by_category(conn, "samples")]
-    sample = data.get("name", None)
-    variant_id = data.get("variant_id", None)
+def get_fields_description(conn: sqlite3.Connection) -> dict:
+    """Return {field: description} of all the fields, cached per connection
 
-    # extract all info for one sample
-    genotype = {}
-    if not variant_id or not sample:
-        return "No genotype"
-    else:
-        genotype = next(sql.get_genotypes(conn, variant_id, fields, [sample]))
+    Fields are named like in the queries: "pos", "ann.gene", "samples.gt"...
+    """
 
-        # get fields description
+    def load(conn):
         fields_description = {}
         for f in sql.get_fields(conn):
-            field_name_prefix = ""
             field_name_prefix = (
                 f.get("category", "")
                 .replace("annotations", "ann.")
@@ -45,6 +64,282 @@ def genotype_tooltip(data: dict, conn: sqlite3.Connection):
             fields_description[field_name_prefix + f.get("name")] = f.get(
                 "description", f.get("name")
             )
+        return fields_description
+
+    return sql.cached_lookup(conn, "tooltip_fields_description", load)
+
+
+def get_sample_fields(conn: sqlite3.Connection) -> list:
+    """Return the names of the fields of the genotypes, cached per connection"""
+    return sql.cached_lookup(
+        conn,
+        "tooltip_sample_fields",
+        lambda conn: [f["name"] for f in sql.get_field_by_category(conn, "samples")],
+    )
+
+
+def load_tooltip_data(conn: sqlite3.Connection, variant_ids: list, samples: list = None) -> dict:
+    """Read the data shown by the tooltips of variants and of their genotypes
+
+    Each table is read in one query, whatever the number of variants.
+
+    Args:
+        conn (sqlite3.Connection): Sqlite3 connection
+        variant_ids (list): Ids of the variants
+        samples (list): Names of the samples whose genotypes are read
+
+    Returns:
+        dict: {
+            "variants": {variant id: variant fields},
+            "variant_names": {variant id: name},
+            "genotypes": {(variant id, sample name): genotype fields, like sql.get_genotypes()},
+            "samples": {sample id: sample fields} of all the samples,
+        }
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    ids = json.dumps([int(i) for i in variant_ids])
+
+    variants = {
+        row["id"]: dict(row)
+        for row in cursor.execute(
+            "SELECT * FROM variants WHERE id IN (SELECT value FROM json_each(?))", (ids,)
+        )
+    }
+
+    # The first annotation of each variant, if the name uses annotations
+    pattern = cm.variant_name_pattern()
+    annotations = {}
+    if re.findall("ann.", pattern):
+        for row in cursor.execute(
+            """SELECT * FROM annotations WHERE variant_id IN (SELECT value FROM json_each(?))
+            ORDER BY rowid""",
+            (ids,),
+        ):
+            annotations.setdefault(row["variant_id"], dict(row))
+
+    variant_names = {}
+    for variant_id, variant in variants.items():
+        first_annotations = [annotations[variant_id]] if variant_id in annotations else []
+        variant_names[variant_id] = cm.format_variant_name(
+            dict(variant, annotations=first_annotations), pattern
+        )
+
+    genotypes = {}
+    if samples:
+        sql_fields = ",".join(f"sv.`{field}`" for field in get_sample_fields(conn))
+        query = f"""SELECT v.value AS _variant, sv.sample_id, sv.variant_id, samples.name,
+        {sql_fields} FROM json_each(?) v CROSS JOIN samples
+        LEFT JOIN genotypes sv ON sv.sample_id = samples.id AND sv.variant_id = v.value
+        WHERE samples.name IN (SELECT value FROM json_each(?))"""
+        for row in cursor.execute(query, (ids, json.dumps(list(samples)))):
+            genotype = dict(row)
+            genotypes[(genotype.pop("_variant"), genotype["name"])] = genotype
+
+    samples = {row["id"]: dict(row) for row in cursor.execute("SELECT * FROM samples")}
+
+    return {
+        "variants": variants,
+        "variant_names": variant_names,
+        "genotypes": genotypes,
+        "samples": samples,
+    }
+
+
+class TooltipDataService(QObject):
+    """Cache of the data shown by the tooltips
+
+    Data is loaded in the background by :meth:`prefetch`, usually for the page
+    displayed by a view. Tooltips read it from memory with :meth:`variant`,
+    :meth:`variant_name`, :meth:`genotype` and :meth:`sample`; these methods
+    return None and start loading the data if it is not in the cache yet.
+
+    The cache is dropped when the database changes.
+
+    Signals:
+        data_loaded: Emitted when prefetched data has been added to the cache
+    """
+
+    data_loaded = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.conn = None
+        self.stamp = None
+        self.clear()
+
+    def clear(self):
+        """Drop the cached data"""
+        self.variants = {}
+        self.variant_names = {}
+        self.genotypes = {}
+        self.samples = {}
+        # (variant_id, sample name or None) being loaded
+        self._loading = set()
+
+    def _sync(self, conn: sqlite3.Connection):
+        """Drop the cache if the connection or the database has changed"""
+        stamp = sql.database_stamp(conn)
+        if conn is not self.conn or stamp != self.stamp:
+            self.clear()
+            self.conn = conn
+            self.stamp = stamp
+
+    def prefetch(self, conn: sqlite3.Connection, variant_ids: list, samples: list = None):
+        """Load in the background the data of the variants and their genotypes
+
+        Args:
+            conn (sqlite3.Connection): Connection of the project
+            variant_ids (list): Ids of the variants
+            samples (list): Names of the samples whose genotypes are loaded
+        """
+        if conn is None:
+            return
+        self._sync(conn)
+
+        samples = list(samples or [])
+        keys = set()
+        missing = []
+        for variant_id in dict.fromkeys(variant_ids):
+            if variant_id is None:
+                continue
+            wanted = {(variant_id, name) for name in samples}
+            wanted -= self.genotypes.keys()
+            if variant_id not in self.variants:
+                wanted.add((variant_id, None))
+            wanted -= self._loading
+            if wanted:
+                keys |= wanted
+                missing.append(variant_id)
+
+        if not missing and (self.samples or ("samples", None) in self._loading):
+            return
+
+        keys.add(("samples", None))
+        self._loading |= keys
+        function = partial(load_tooltip_data, variant_ids=missing, samples=samples)
+        callback = partial(self._on_loaded, conn, self.stamp)
+        finished = partial(self._on_finished, keys)
+
+        try:
+            get_sql_executor().submit(
+                conn, function, callback, finished_callback=finished, plugin="tooltip"
+            )
+        except ValueError:
+            # Databases which are not stored in a file are read synchronously
+            try:
+                callback(function(conn))
+            finally:
+                finished()
+
+    def _on_loaded(self, conn: sqlite3.Connection, stamp: tuple, data: dict):
+        if conn is not self.conn or stamp != self.stamp:
+            # The database has changed since the data has been read
+            return
+
+        self.variants.update(data["variants"])
+        self.variant_names.update(data["variant_names"])
+        self.genotypes.update(data["genotypes"])
+        self.samples.update(data["samples"])
+        self.data_loaded.emit()
+
+    def _on_finished(self, keys: set):
+        self._loading -= keys
+
+    def variant(self, conn: sqlite3.Connection, variant_id: int) -> dict:
+        """Return the fields of the variant, or None if they are loading"""
+        self._sync(conn)
+        if variant_id not in self.variants:
+            self.prefetch(conn, [variant_id])
+        return self.variants.get(variant_id)
+
+    def variant_name(self, conn: sqlite3.Connection, variant_id: int) -> str:
+        """Return the name of the variant, or None if it is loading"""
+        if not variant_id:
+            return "unknown"
+        self._sync(conn)
+        if variant_id not in self.variant_names:
+            self.prefetch(conn, [variant_id])
+        return self.variant_names.get(variant_id)
+
+    def genotype(self, conn: sqlite3.Connection, variant_id: int, sample: str) -> dict:
+        """Return the fields of the genotype, or None if they are loading"""
+        self._sync(conn)
+        if (variant_id, sample) not in self.genotypes:
+            self.prefetch(conn, [variant_id], [sample])
+        return self.genotypes.get((variant_id, sample))
+
+    def sample(self, conn: sqlite3.Connection, sample_id: int = None, name: str = None) -> dict:
+        """Return the fields of the sample with this id (or name), or None if
+        they are loading
+        """
+        self._sync(conn)
+        if not self.samples:
+            self.prefetch(conn, [])
+            return None
+
+        if sample_id is not None:
+            return self.samples.get(sample_id)
+        return next((i for i in self.samples.values() if i["name"] == name), None)
+
+
+def get_tooltip_service() -> TooltipDataService:
+    """Return the service shared by the tooltips"""
+    global _service
+    if _service is None:
+        _service = TooltipDataService()
+    return _service
+
+
+def refresh_loading_tooltip(view: QTableView, pos=None):
+    """Replace the placeholder of the visible tooltip of a view by the loaded data
+
+    Qt doesn't update a visible tooltip: the tooltip of the cell or of the
+    vertical header section under the mouse is computed again and shown if
+    the placeholder (LOADING_TEXT) is displayed.
+
+    Args:
+        view (QTableView): View whose model returns the tooltips
+        pos (QPoint): Global position of the mouse; the cursor position if None
+    """
+    if not QToolTip.isVisible() or QToolTip.text() != LOADING_TEXT:
+        return
+
+    pos = QCursor.pos() if pos is None else pos
+    header = view.verticalHeader()
+    if header.isVisible() and header.rect().contains(header.mapFromGlobal(pos)):
+        section = header.logicalIndexAt(header.mapFromGlobal(pos))
+        text = view.model().headerData(section, Qt.Vertical, Qt.ToolTipRole)
+        widget = header
+    elif view.viewport().rect().contains(view.viewport().mapFromGlobal(pos)):
+        text = view.indexAt(view.viewport().mapFromGlobal(pos)).data(Qt.ToolTipRole)
+        widget = view.viewport()
+    else:
+        return
+
+    if text and text != LOADING_TEXT:
+        QToolTip.showText(pos, text, widget)
+
+
+def genotype_tooltip(data: dict, conn: sqlite3.Connection):
+
+    sample = data.get("name", None)
+    variant_id = data.get("variant_id", None)
+
+    # extract all info for one sample
+    genotype = {}
+    if not variant_id or not sample:
+        return "No genotype"
+    else:
+        service = get_tooltip_service()
+        genotype = service.genotype(conn, variant_id, sample)
+        variant_name = service.variant_name(conn, variant_id)
+        if genotype is None or variant_name is None:
+            return LOADING_TEXT
+        genotype = dict(genotype)
+
+        # get fields description
+        fields_description = get_fields_description(conn)
 
         # all genotype values
         genotype_values_text = ""
@@ -83,9 +378,6 @@ def genotype_tooltip(data: dict, conn: sqlite3.Connection):
         genotype["classification_text"] = classification_text
         genotype["classification_color"] = classification_color
 
-        # Get variant name
-        variant_name = cm.find_variant_name(conn=conn, variant_id=variant_id, troncate=False)
-
         genotype["variant_name"] = variant_name
 
         # tag genotype
@@ -146,7 +438,10 @@ def sample_tooltip(data: dict, conn: sqlite3.Connection, genotype_classification
     # if id come from genotype add sample_id
     if "id" not in sample and "sample_id" in sample:
         sample["id"] = sample["sample_id"]
-        sample = dict(sql.get_sample(conn=conn, sample_id=sample["id"]))
+        sample = get_tooltip_service().sample(conn, sample["id"], sample.get("name"))
+        if sample is None:
+            return LOADING_TEXT
+        sample = dict(sample)
 
     # if "name" in sample:
     #     if sample["name"]:
@@ -273,33 +568,27 @@ def variant_tooltip(
 
     variant = data
 
+    service = get_tooltip_service()
+
     # if id come from genotype ad variant_id
     if "id" not in variant and "variant_id" in variant:
         variant["id"] = variant["variant_id"]
-        variant = variant | dict(
-            sql.get_variant(
-                conn=conn, variant_id=variant["id"], with_annotations=True, with_samples=True
-            )
-        )
+        details = service.variant(conn, variant["id"])
+        if details is None:
+            return LOADING_TEXT
+        variant = variant | details
 
     # get fields description
-    fields_description = {}
-    for f in sql.get_fields(conn):
-        field_name_prefix = ""
-        field_name_prefix = (
-            f.get("category", "")
-            .replace("annotations", "ann.")
-            .replace("samples", "samples.")
-            .replace("variants", "")
-        )
-        fields_description[field_name_prefix + f.get("name")] = f.get("description", f.get("name"))
+    fields_description = get_fields_description(conn)
 
     # get varant classification
     config = Config("classifications")
     variant_classifications = config.get("variants", [])
 
     # Get variant name
-    variant_name = cm.find_variant_name(conn=conn, variant_id=variant.get("id", 0), troncate=False)
+    variant_name = service.variant_name(conn, variant.get("id", 0))
+    if variant_name is None:
+        return LOADING_TEXT
 
     # variant name
     if variant_name:
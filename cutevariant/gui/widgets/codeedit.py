@@ -172,13 +172,32 @@ def __init__(self, parent=None):
         super().__init__(parent)
 
         self._items = []
+        # Items depending on the completion prefix, after the static items
+        self._dynamic_items = []
 
     def clear(self):
         """Clear model"""
         self.beginResetModel()
         self._items.clear()
+        self._dynamic_items.clear()
         self.endResetModel()
 
+    def set_dynamic_items(self, items: list):
+        """Replace the items depending on the completion prefix
+
+        Args:
+            items (list[dict]): Items with name, description, icon and color keys
+        """
+        self.beginResetModel()
+        self._dynamic_items = list(items)
+        self.endResetModel()
+
+    def item(self, row: int) -> dict:
+        """Return the static or dynamic item at row"""
+        if row < len(self._items):
+            return self._items[row]
+        return self._dynamic_items[row - len(self._items)]
+
     def add_item(self, name: str, description: str, icon=QIcon(), color=None):
         """Add items
 
@@ -203,7 +222,7 @@ def rowCount(self, parent=QModelIndex()) -> int:
             int: row count
         """
         if parent == QModelIndex():
-            return len(self._items)
+            return len(self._items) + len(self._dynamic_items)
         return 0
 
     def data(self, index: QModelIndex, role: Qt.ItemDataRole):
@@ -219,17 +238,19 @@ def data(self, index: QModelIndex, role: Qt.ItemDataRole):
         if not index.isValid():
             return None
 
+        item = self.item(index.row())
+
         if role == Qt.DisplayRole:
-            return self._items[index.row()]["name"]
+            return item["name"]
 
         if role == Qt.ToolTipRole:
-            return self._items[index.row()]["description"]
+            return item["description"]
 
         if role == Qt.DecorationRole:
-            return self._items[index.row()]["icon"]
+            return item["icon"]
 
         if role == Qt.BackgroundRole:
-            return QColor(self._items[index.row()]["color"])
+            return QColor(item["color"])
 
         return None
 
@@ -300,6 +321,9 @@ class Completer(QWidget):
     Attributes:
         delegate (CompleterDelegate): the delegate use by the view
         model (CompleterModel): the model
+        items_provider (Callable): Optional function returning the dynamic
+            items (see CompleterModel.set_dynamic_items) of a prefix. It is
+            used for the keywords too numerous to be all loaded in the model.
         proxy_model (QSortFilterProxyModel ): the proxy model used to filter model
         panel (QLabel): The description widget
         view (QListView): the view
@@ -315,6 +339,7 @@ def __init__(self, parent=None):
 
         self._target = None
         self._completion_prefix = ""
+        self.items_provider = None
 
         self.setWindowFlag(Qt.Popup)
         self.setFocusPolicy(Qt.NoFocus)
@@ -446,6 +471,8 @@ def set_completion_prefix(self, prefix: str):
             prefix (str): A prefix keyword used to filter model
         """
         self.view.clearSelection()
+        if self.items_provider:
+            self.model.set_dynamic_items(self.items_provider(prefix))
         self._completion_prefix = QRegularExpression.escape(prefix)
 
         self.proxy_model.setFilterRegularExpression(
@@ -53,13 +53,14 @@
 COLUMN_REMOVE = 4
 
 
-@lru_cache()
+@lru_cache(maxsize=256)
 def get_field_unique_values_cached(
     conn: sqlite3.Connection, field_name: str, like: str, limit: int
 ) -> list:
     """Used for autocompletion of the value field
     Return cached values of a specific field
 
+    Only used for the fields without value dictionary (see `sql.get_field_values`)
     """
     return sql.get_field_unique_values(conn, field_name, like, limit)
 
@@ -95,7 +96,7 @@ def prepare_fields(conn) -> dict:
 
 
 class FieldsCompleter(QCompleter):
-    """A custom completer to load fields values dynamically thanks to a SQL LIKE statement"""
+    """A custom completer to load fields values dynamically from the field dictionaries"""
 
     def __init__(self, conn=None, parent=None):
         super().__init__(parent)
@@ -119,8 +120,13 @@ def updateModel(self):
 
         local_completion_prefix = self.local_completion_prefix
 
-        like = f"{local_completion_prefix}%"
-        values = get_field_unique_values_cached(self.conn, self.field_name, like, self.limit)
+        # Values of the field dictionary, most frequent first
+        values = sql.get_field_values(
+            self.conn, self.field_name, local_completion_prefix, self.limit
+        )
+        if values is None:
+            like = f"{local_completion_prefix}%"
+            values = get_field_unique_values_cached(self.conn, self.field_name, like, self.limit)
         self.source_model.setStringList(values)
 
     def splitPath(self, path: str):
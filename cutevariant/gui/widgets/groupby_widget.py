@@ -37,7 +37,7 @@ def __init__(
         super().__init__(parent)
         self._raw_data = []
         self._conn = conn
-        self.load_groupby_thread = SqlThread(self._conn)
+        self.load_groupby_thread = SqlThread(self._conn, query_class="group_by", plugin="group_by")
         self.load_groupby_thread.started.connect(self.groupby_started)
         self.load_groupby_thread.finished.connect(self.groubpby_finished)
         self.load_groupby_thread.result_ready.connect(self._on_data_available)
@@ -48,6 +48,7 @@ def __init__(
         self._fields = ["chr", "pos", "ref", "alt"]
         self._source = "variants"
         self._filters = {}
+        self._selected_samples = []
         self._order_by_count = True
 
         self.is_loading = False
@@ -171,7 +172,13 @@ def sort(self, column: int, order: Qt.SortOrder):
         if column < self.columnCount():
             self._order_by_count = column == 1
             self._order_desc = order == Qt.DescendingOrder
-            self.load(self._field_name, self._fields, self._source, self._filters)
+            self.load(
+                self._field_name,
+                self._fields,
+                self._source,
+                self._filters,
+                self._selected_samples,
+            )
 
     def setData(
         self, index: QModelIndex, value: typing.Any, role: int = int(Qt.DisplayRole)
@@ -188,15 +195,16 @@ def load(
         fields,
         source,
         filters,
+        selected_samples=None,
     ):
         """Counts unique values inside field_name
 
         Args:
             conn (sqlite3.Connection): Access to cutevariant's project database
             field_name (str): The field you want the number of unique values of
+            selected_samples (list): Samples used by samples[ANY/ALL/COUNT] filters,
+                like in the variant view
         """
-        if self.is_loading:
-            return
         if not self._conn:
             return
 
@@ -204,16 +212,18 @@ def load(
         self._fields = fields
         self._source = source
         self._filters = filters
+        self._selected_samples = list(selected_samples or [])
+        # The counts don't depend on the displayed fields: only on the grouped one
+        args = (field_name, None, source, filters, self._order_by_count, self._order_desc)
+        samples = self._selected_samples
         groupby_func = lambda conn: sql.get_variant_as_group(
-            conn,
-            self._field_name,
-            self._fields,
-            self._source,
-            self._filters,
-            self._order_by_count,
-            self._order_desc,
+            conn, *args, selected_samples=samples
+        )
+        # A load in progress is cancelled and replaced by this one
+        self.load_groupby_thread.start_function(
+            lambda conn: list(groupby_func(conn)),
+            caching_hash=("group_by", repr(args), repr(samples)),
         )
-        self.load_groupby_thread.start_function(lambda conn: list(groupby_func(conn)))
         self.is_loading = True
 
     def _on_data_available(self):
@@ -296,6 +306,7 @@ def load(
         fields: list,
         source: str,
         filters: dict,
+        selected_samples: list = None,
     ):
         if self.conn:
             self.groupby_model.load(
@@ -303,6 +314,7 @@ def load(
                 fields,
                 source,
                 filters,
+                selected_samples,
             )
 
     def start_loading(self):
@@ -343,9 +355,9 @@ def __init__(self, conn: sqlite3.Connection = None, parent: QWidget = None):
         self.vlayout.addLayout(self.bottom_layout)
         # self.vlayout.addWidget(self.btn_box)
 
-    def load(self, field, fields, source, filters):
+    def load(self, field, fields, source, filters, selected_samples=None):
         if self.conn:
-            self.view.load(field, fields, source, filters)
+            self.view.load(field, fields, source, filters, selected_samples)
 
     def get_selected_values(self) -> typing.List[str]:
         return self.view.groupby_model.get_selected_values()
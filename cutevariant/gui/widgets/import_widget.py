@@ -560,7 +560,7 @@ def run(self):
                     progress_callback=self.emit_progress,
                 )
 
-            self.conn.close()
+            sql.close_sql_connection(self.conn)
 
         except BaseException as e:
             self.progress_changed.emit(0, str(e))
@@ -38,6 +38,8 @@ class SamplesEditorModel(QAbstractTableModel):
 
     """A Model showing sqlite samples
 
+    Samples are fetched by pages of PAGE_SIZE, when the view scrolls down.
+
     Attributes:
         conn (sqlite.Connection)
         query (str): Samples filters
@@ -50,10 +52,13 @@ class SamplesEditorModel(QAbstractTableModel):
 
     """
 
+    PAGE_SIZE = 200
+
     def __init__(self, conn: sqlite3.Connection, parent=None):
         super().__init__(parent)
         self._data = []
         self._headers = ["name", "family", "Statut", "Tags"]
+        self._has_more = False
         self.query = ""
         self.conn = conn
 
@@ -95,14 +100,39 @@ def headerData(self, section: int, orientation: Qt.Orientation, role: Qt.ItemDat
         if role == Qt.DisplayRole and orientation == Qt.Horizontal:
             return self._headers[section]
 
+    def _fetch_page(self) -> list:
+        """Return the next page of samples"""
+        samples = list(
+            sql.get_samples_from_query(
+                self.conn, self.query, limit=self.PAGE_SIZE + 1, offset=len(self._data)
+            )
+        )
+        # One more sample than the page tells if there are other pages
+        self._has_more = len(samples) > self.PAGE_SIZE
+        return samples[: self.PAGE_SIZE]
+
     def load(self):
-        """Load samples from sqlite"""
+        """Load the first page of samples from sqlite"""
         if self.conn:
             self.beginResetModel()
-            self._data = list(sql.get_samples_from_query(self.conn, self.query))
-
+            self._data = []
+            self._data = self._fetch_page()
             self.endResetModel()
 
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        """override"""
+        return parent == QModelIndex() and self._has_more
+
+    def fetchMore(self, parent=QModelIndex()):
+        """override: load the next page of samples"""
+        if not self.canFetchMore(parent):
+            return
+        samples = self._fetch_page()
+        if samples:
+            self.beginInsertRows(QModelIndex(), len(self._data), len(self._data) + len(samples) - 1)
+            self._data.extend(samples)
+            self.endInsertRows()
+
     def get_sample(self, row: int) -> dict:
         """Get all sample from row"""
         return self._data[row]
@@ -209,14 +239,7 @@ def _load_filters(self):
 
             # Load Tags
             self.tag_choice.clear()
-            tags = sql.get_tags_from_samples(self.conn)
-            tags_list = []
-            for tag in tags:
-                tag_list = tag.split(",")
-                for t in tag_list:
-                    if t not in tags_list:
-                        tags_list.append(t)
-            for tag in tags_list:
+            for tag in sql.get_sample_tags(self.conn):
                 self.tag_choice.add_item(QIcon(), tag, data=tag)
 
     def clear_filters(self):
@@ -22,6 +22,25 @@ def test_select_cmd(conn):
     assert "pos" in variant
 
 
+def test_select_cmd_compact(conn):
+    fields = ["chr", "pos", "ann.gene", "count_hom"]
+    expected = list(command.select_cmd(conn, fields, limit=None))
+    rows = list(command.select_cmd(conn, fields, limit=None, compact=True))
+
+    assert rows == expected
+    assert [dict(row) for row in rows] == expected
+    # All rows share the same column index
+    assert all(row._columns is rows[0]._columns for row in rows)
+    assert rows[0]["ann.gene"] == expected[0]["ann.gene"]
+    assert rows[0].get("unknown") is None
+
+    row = rows[0]
+    row.update({"pos": 3, "comment": "hello"})
+    assert row["pos"] == 3 and row["comment"] == "hello"
+    assert "comment" not in rows[1]
+    assert row | {"chr": "X"} == dict(expected[0], pos=3, comment="hello", chr="X")
+
+
 def test_select_cmd_with_set(conn):
     """Test the select query of gene sets"""
     # Import fake words (gene) as a new set called "test"
@@ -138,6 +157,43 @@ def test_set_cmd(conn):
     assert variants_in_selection == expected
 
 
+def test_set_cmd_expression(conn):
+    """Test set expressions of any arity against the equivalent SQL queries"""
+    command.create_cmd(conn, source="variants", target="A", filters={"pos": {"$gt": 124000}})
+    command.create_cmd(conn, source="variants", target="B", filters={"ref": "C"})
+    command.create_cmd(conn, source="variants", target="C", filters={"alt": "A"})
+
+    def ids(filters):
+        return {variant["id"] for variant in command.select_cmd(conn, ["id"], filters=filters)}
+
+    a, b, c = ids({"pos": {"$gt": 124000}}), ids({"ref": "C"}), ids({"alt": "A"})
+    expressions = [
+        (("&", ("|", "A", "B"), "C"), (a | b) & c),
+        (("-", "variants", ("|", "A", "B")), ids({}) - (a | b)),
+        (("|", ("&", "A", "B"), ("-", "C", "A")), (a & b) | (c - a)),
+    ]
+
+    for i, (expression, expected) in enumerate(expressions):
+        name = f"D{i}"
+        ret = command.set_cmd(conn, target=name, expression=expression)
+        assert ret
+        assert ids_of_selection(conn, name) == expected
+        # The count is stored with the selection
+        selection = [s for s in sql.get_selections(conn) if s["name"] == name][0]
+        assert selection["count"] == len(expected)
+
+    # Same through VQL
+    list(command.execute(conn, "CREATE E = (A | B) & C"))
+    assert ids_of_selection(conn, "E") == (a | b) & c
+
+    with pytest.raises(vql.VQLSyntaxError):
+        command.set_cmd(conn, target="F", expression=("|", "A", "unknown"))
+
+
+def ids_of_selection(conn, name):
+    return {variant["id"] for variant in command.select_cmd(conn, ["id"], source=name)}
+
+
 def test_import_cmd(conn):
     """Test import wordset from file (import_cmd is for word sets only FOR NOW)
 
@@ -0,0 +1,55 @@
+import gzip
+
+import pytest
+
+from cutevariant.core import gene_store
+
+# bin, name, chrom, strand, txStart, txEnd, cdsStart, cdsEnd, exonCount, exonStarts,
+# exonEnds, score, name2, ...
+REFGENE = [
+    "0\tNM_1\tchr7\t+\t100\t900\t150\t800\t2\t100,500,\t300,900,\t0\tCFTR\tcmpl\tcmpl\t0,0,",
+    "0\tNM_2\tchr7\t+\t100\t600\t150\t550\t1\t100,\t600,\t0\tCFTR\tcmpl\tcmpl\t0,",
+    "0\tNM_3\tchr11\t-\t2000\t3000\t2100\t2900\t1\t2000,\t3000,\t0\tGJB2\tcmpl\tcmpl\t0,",
+]
+
+
+@pytest.fixture
+def gene_conn(tmp_path):
+    ref_filename = str(tmp_path / "refGene.txt.gz")
+    with gzip.open(ref_filename, "wt") as file:
+        file.write("\n".join(REFGENE) + "\n")
+
+    db_filename = str(tmp_path / "refGene.db")
+    gene_store.import_refgene(ref_filename, db_filename)
+    conn = gene_store.get_gene_connection(db_filename)
+    yield conn
+    conn.close()
+
+
+def test_pack_positions():
+    assert gene_store.unpack_positions(gene_store.pack_positions([10, 2**31])) == [10, 2**31]
+    assert gene_store.unpack_positions(gene_store.pack_positions([])) == []
+    # Databases of older versions
+    assert gene_store.unpack_positions("10,20") == [10, 20]
+
+
+def test_import_refgene(gene_conn):
+    indexes = {row[1] for row in gene_conn.execute("PRAGMA index_list(genes)")}
+    assert {"idx_genes_gene", "idx_genes_location"} <= indexes
+
+    assert gene_store.get_gene_names(gene_conn) == ["CFTR", "GJB2"]
+    assert gene_store.get_transcript_names(gene_conn, "CFTR") == ["NM_1", "NM_2"]
+
+    transcript = gene_store.get_transcript(gene_conn, "CFTR", "NM_1")
+    assert transcript["chrom"] == "chr7"
+    assert (transcript["tx_start"], transcript["tx_end"]) == (100, 900)
+    assert transcript["exon_starts"] == [100, 500]
+    assert transcript["exon_ends"] == [300, 900]
+    assert transcript["exon_count"] == 2
+
+    assert gene_store.get_transcript(gene_conn, "CFTR", "NM_3") is None
+
+
+def test_missing_file():
+    with pytest.raises(FileNotFoundError):
+        gene_store.import_refgene("missing.txt.gz", ":memory:")
@@ -0,0 +1,56 @@
+from cutevariant.core import sql
+from cutevariant.core.genotype_matrix import GenotypeMatrix, MISSING_GT
+
+
+def test_genotype_matrix(file_conn):
+    samples = [sample["name"] for sample in sql.get_samples(file_conn)]
+    variant_ids = [variant["id"] for variant in sql.get_variants(file_conn, ["id"], limit=None)]
+    fields = ["gt", "dp"]
+
+    matrix = GenotypeMatrix(variant_ids, samples + ["unknown"], fields).load(file_conn)
+    matrix.stamp = sql.database_stamp(file_conn)
+    assert matrix.samples == samples
+    assert matrix.gt.shape == (len(variant_ids), len(samples))
+
+    for variant_id in variant_ids:
+        expected = list(
+            sql.get_genotypes(file_conn, variant_id, fields + ["classification"], samples)
+        )
+        assert matrix.genotypes(variant_id) == expected
+
+        gt = [MISSING_GT if i["gt"] is None else i["gt"] for i in expected]
+        assert matrix.gt[matrix.variant_index[variant_id]].tolist() == gt
+
+    assert matrix.covers(variant_ids[0], samples[:1], ["dp"])
+    # Only the requested samples and fields are returned
+    expected = sql.get_genotypes(
+        file_conn, variant_ids[0], ["gt", "dp", "classification"], samples[:1]
+    )
+    assert matrix.genotypes(variant_ids[0], samples[:1], ["dp"]) == list(expected)
+    assert not matrix.covers(variant_ids[0], samples, ["ad"])
+    assert not matrix.covers(-1, samples, fields)
+
+    # Any change of the database invalidates the matrix
+    assert matrix.is_valid(file_conn)
+    genotype = matrix.genotypes(variant_ids[0])[0]
+    sql.update_genotypes(
+        file_conn,
+        {"variant_id": variant_ids[0], "sample_id": genotype["sample_id"], "classification": 1},
+    )
+    assert not matrix.is_valid(file_conn)
+
+
+def test_genotype_matrix_all_samples(file_conn):
+    samples = [sample["name"] for sample in sql.get_samples(file_conn)]
+
+    # No requested sample means all the samples, like sql.get_genotypes()
+    matrix = GenotypeMatrix([1, 2], [], ["gt"]).load(file_conn)
+    assert matrix.samples == samples
+    assert matrix.genotypes(1) == list(sql.get_genotypes(file_conn, 1, ["gt", "classification"]))
+    assert matrix.genotypes(1, []) == matrix.genotypes(1)
+    assert matrix.covers(1, [], ["gt"])
+    assert matrix.covers(1, samples[:1], ["gt"])
+
+    # A matrix of some samples doesn't cover all of them
+    matrix = GenotypeMatrix([1, 2], samples[:1], ["gt"]).load(file_conn)
+    assert not matrix.covers(1, [], ["gt"])
@@ -0,0 +1,159 @@
+import pytest
+
+from cutevariant.core import sql, inheritance
+
+# chr, gene, (father gt, mother gt, child gt); None if the genotype is missing
+VARIANTS = [
+    ("chr1", "A", (0, 0, 1)),
+    ("chr1", "B", (1, 1, 2)),
+    ("chr1", "C", (1, 0, 1)),
+    ("chr1", "C", (0, 1, 1)),
+    ("chr1", "D", (1, 0, 1)),
+    ("chrX", "E", (0, 1, 1)),
+    ("chr1", "A", (None, 0, 1)),
+]
+
+EXPECTED = {
+    "de_novo": [1],
+    "autosomal_recessive": [2],
+    "autosomal_dominant": [3, 4, 5, 6],
+    "x_linked_recessive": [6],
+    "compound_heterozygous": [3, 4],
+}
+
+
+@pytest.fixture
+def conn():
+    conn = sql.get_sql_connection(":memory:")
+    sql.create_database_schema(conn)
+    for name in ("father", "mother", "child"):
+        sql.insert_sample(conn, name)
+
+    for variant_id, (chrom, gene, gts) in enumerate(VARIANTS, 1):
+        conn.execute(
+            "INSERT INTO variants (id, chr, pos, ref, alt) VALUES (?,?,?,?,?)",
+            (variant_id, chrom, variant_id * 10, "A", "T"),
+        )
+        conn.execute("INSERT INTO annotations (variant_id, gene) VALUES (?,?)", (variant_id, gene))
+        for sample_id, gt in enumerate(gts, 1):
+            if gt is not None:
+                conn.execute(
+                    "INSERT INTO genotypes (sample_id, variant_id, gt) VALUES (?,?,?)",
+                    (sample_id, variant_id, gt),
+                )
+    conn.commit()
+    return conn
+
+
+@pytest.mark.parametrize("mode", inheritance.MODES)
+def test_create_trio_selection(conn, mode):
+    selection_id = inheritance.create_trio_selection(conn, mode, 1, 2, 3)
+    selection = [s for s in sql.get_selections(conn) if s["id"] == selection_id][0]
+    assert selection["name"] == f"{mode}_child"
+    assert sql.get_selection_variant_ids(conn, selection["name"]).tolist() == EXPECTED[mode]
+
+    # The selection is replaced
+    assert inheritance.create_trio_selection(conn, mode, 1, 2, 3) is not None
+    assert [s["name"] for s in sql.get_selections(conn)].count(f"{mode}_child") == 1
+
+
+def test_create_trio_selection_pedigree(conn):
+    # Daughters are affected by X-linked recessive variants if homozygous
+    set_pedigree(conn, 3, sex=inheritance.FEMALE)
+    assert inheritance.create_trio_selection(conn, "x_linked_recessive", 1, 2, 3) is None
+
+    # Unaffected parents don't carry dominant variants
+    set_pedigree(conn, 1, phenotype=inheritance.UNAFFECTED)
+    selection_id = inheritance.create_trio_selection(conn, "autosomal_dominant", 1, 2, 3)
+    assert selection_id is not None
+    assert sql.get_selection_variant_ids(conn, "autosomal_dominant_child").tolist() == [4, 6]
+
+    # No selection without variant
+    conn.execute("UPDATE genotypes SET gt = 0 WHERE sample_id = 3")
+    assert inheritance.create_trio_selection(conn, "de_novo", 1, 2, 3) is None
+
+    with pytest.raises(ValueError):
+        inheritance.create_trio_selection(conn, "unknown", 1, 2, 3)
+
+
+def set_pedigree(conn, sample_id, family_id="fam", father_id=0, mother_id=0, sex=0, phenotype=0):
+    conn.execute(
+        """UPDATE samples SET family_id = ?, father_id = ?, mother_id = ?, sex = ?, phenotype = ?
+        WHERE id = ?""",
+        (family_id, father_id, mother_id, sex, phenotype, sample_id),
+    )
+
+
+def test_analyse_trio(conn):
+    set_pedigree(conn, 1, sex=inheritance.MALE)
+    set_pedigree(conn, 2, sex=inheritance.FEMALE)
+    set_pedigree(conn, 3, father_id=1, mother_id=2, phenotype=inheritance.AFFECTED)
+
+    # Same variants as the trio queries
+    results = inheritance.analyse_families(conn)
+    assert {mode: ids.tolist() for mode, ids in results["fam"].items()} == EXPECTED
+
+    # Without affected child, nothing is found
+    set_pedigree(conn, 3, father_id=1, mother_id=2)
+    results = inheritance.analyse_families(conn, ["fam"], ["de_novo"])
+    assert results["fam"]["de_novo"].tolist() == []
+
+
+def test_analyse_family(conn):
+    # Affected son and daughter, unaffected son
+    for name in ("son", "daughter", "brother"):
+        sql.insert_sample(conn, name)
+    set_pedigree(conn, 1, sex=inheritance.MALE)
+    set_pedigree(conn, 2, sex=inheritance.FEMALE)
+    set_pedigree(conn, 4, father_id=1, mother_id=2, sex=1, phenotype=inheritance.AFFECTED)
+    set_pedigree(conn, 5, father_id=1, mother_id=2, sex=2, phenotype=inheritance.AFFECTED)
+    set_pedigree(conn, 6, father_id=1, mother_id=2, sex=1, phenotype=inheritance.UNAFFECTED)
+    # Another family must not change the results
+    set_pedigree(conn, 3, family_id="other", phenotype=inheritance.AFFECTED)
+
+    # father, mother, son, daughter, brother
+    genotypes = {
+        1: (0, 0, 1, 0, 0),  # de novo in the son only
+        2: (1, 1, 2, 2, 1),  # recessive
+        3: (1, 1, 2, 2, 2),  # homozygous in the unaffected brother
+        4: (1, 0, 1, 1, 0),  # dominant, compound heterozygous with 5
+        5: (0, 1, 1, 1, 0),
+        6: (0, 1, 1, 2, 0),  # X-linked, the daughter is homozygous
+        7: (0, 1, 1, 1, 1),  # X-linked, but the brother carries it
+    }
+    conn.execute("DELETE FROM genotypes")
+    conn.execute("UPDATE variants SET chr = 'chrX' WHERE id IN (6, 7)")
+    conn.execute("UPDATE annotations SET gene = 'C' WHERE variant_id = 5")
+    conn.execute("UPDATE annotations SET gene = 'E' WHERE variant_id = 7")
+    for variant_id, gts in genotypes.items():
+        for sample_id, gt in zip((1, 2, 4, 5, 6), gts):
+            conn.execute(
+                "INSERT INTO genotypes (sample_id, variant_id, gt) VALUES (?,?,?)",
+                (sample_id, variant_id, gt),
+            )
+
+    results = inheritance.analyse_families(conn)
+    assert {mode: ids.tolist() for mode, ids in results["fam"].items()} == {
+        "de_novo": [1],
+        "autosomal_recessive": [2],
+        "autosomal_dominant": [4, 5],
+        "x_linked_recessive": [6],
+        "compound_heterozygous": [4, 5],
+    }
+    # No trio in the other family
+    assert all(len(ids) == 0 for ids in results["other"].values())
+
+
+def test_create_family_selections(conn):
+    set_pedigree(conn, 3, father_id=1, mother_id=2, phenotype=inheritance.AFFECTED)
+
+    selections = inheritance.create_family_selections(conn, ["fam"])
+    for mode, ids in EXPECTED.items():
+        assert selections["fam"][mode] is not None
+        assert sql.get_selection_variant_ids(conn, f"{mode}_fam").tolist() == ids
+
+    # Outdated results are removed
+    conn.execute("UPDATE genotypes SET gt = 0 WHERE sample_id = 3")
+    selections = inheritance.create_family_selections(conn, ["fam"], ["de_novo"])
+    assert selections == {"fam": {"de_novo": None}}
+    assert "de_novo_fam" not in [s["name"] for s in sql.get_selections(conn)]
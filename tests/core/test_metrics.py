@@ -0,0 +1,62 @@
+import json
+
+from cutevariant.core import sql, metrics
+
+
+def count(conn, condition):
+    return conn.execute(f"SELECT COUNT(*) FROM variants WHERE {condition}").fetchone()[0]
+
+
+def test_metrics_at_import(file_conn):
+    # Stored by import_reader
+    stored = json.loads(sql.get_metadatas(file_conn)[metrics.METADATA_KEY])
+    assert stored == metrics.get_metrics(file_conn)
+
+    transitions = " OR ".join(f"(ref = '{r}' AND alt = '{a}')" for r, a in metrics.TRANSITIONS)
+    transversions = " OR ".join(f"(ref = '{r}' AND alt = '{a}')" for r, a in metrics.TRANSVERSIONS)
+    assert stored["variant_count"] == count(file_conn, "1")
+    assert stored["snp_count"] == count(file_conn, "is_snp = 1")
+    assert stored["indel_count"] == count(file_conn, "is_indel = 1")
+    assert stored["transition_count"] == count(file_conn, transitions)
+    assert stored["transversion_count"] == count(file_conn, transversions)
+    assert stored["sample_count"] == len(list(sql.get_samples(file_conn)))
+
+    # Each variant is counted once per gene
+    genes = file_conn.execute(
+        """SELECT gene, COUNT(DISTINCT variant_id) FROM annotations
+        WHERE gene IS NOT NULL GROUP BY gene"""
+    )
+    assert stored["genes"] == {gene: variant_count for gene, variant_count in genes}
+
+    table = metrics.metrics_table(stored)
+    assert table["Variant count"] == stored["variant_count"]
+    assert table["Tr/tv ratio"] == round(
+        stored["transition_count"] / stored["transversion_count"], 2
+    )
+
+
+def test_incremental_metrics(file_conn):
+    full = metrics.get_metrics(file_conn)
+
+    # Metrics of the first variants, as if the other ones were added later
+    file_conn.execute("DELETE FROM metadatas WHERE key = ?", (metrics.METADATA_KEY,))
+    file_conn.execute("CREATE TABLE later_variants AS SELECT * FROM variants WHERE id > 5")
+    file_conn.execute(
+        "CREATE TABLE later_annotations AS SELECT * FROM annotations WHERE variant_id > 5"
+    )
+    file_conn.execute("DELETE FROM annotations WHERE variant_id > 5")
+    file_conn.execute("DELETE FROM variants WHERE id > 5")
+    partial = metrics.update_metrics(file_conn)
+    assert partial["variant_count"] == 5
+    assert partial["last_variant_id"] == 5
+
+    file_conn.execute("INSERT INTO variants SELECT * FROM later_variants")
+    file_conn.execute("INSERT INTO annotations SELECT * FROM later_annotations")
+    assert metrics.update_metrics(file_conn) == full
+
+
+def test_empty_project():
+    file_conn = sql.get_sql_connection(":memory:")
+    sql.create_database_schema(file_conn)
+    assert metrics.get_metrics(file_conn) == metrics.empty_metrics()
+    assert metrics.metrics_table(metrics.empty_metrics())["Tr/tv ratio"] is None
@@ -0,0 +1,85 @@
+import pytest
+
+from cutevariant.core import parallel, command
+
+from tests import utils
+
+FILTERS = [
+    {},
+    {"$and": [{"pos": {"$gt": 100}}]},
+    {"$and": [{"ann.gene": {"$ne": None}}]},
+    {"$or": [{"ref": "A"}, {"samples.$any.gt": 1}]},
+]
+
+
+@pytest.fixture
+def conn(file_conn, monkeypatch):
+    """File database split into ranges of 1 or 2 variants"""
+    monkeypatch.setattr(parallel, "PARALLEL_WORKERS", 5)
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_VARIANTS", 0)
+    return file_conn
+
+
+def test_id_ranges(conn):
+    ranges = parallel.id_ranges(conn)
+    first, last = conn.execute("SELECT MIN(id), MAX(id) FROM variants").fetchone()
+
+    assert len(ranges) == 5
+    assert ranges[0][0] == first
+    assert ranges[-1][1] == last
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert start == end + 1
+
+    # Not enough variants, in memory database, or uncommitted data
+    assert parallel.id_ranges(conn, min_variants=1000) == [None]
+    assert parallel.id_ranges(utils.create_conn()) == [None]
+    conn.execute("UPDATE variants SET favorite = 1 WHERE id = 1")
+    assert parallel.id_ranges(conn) == [None]
+    conn.rollback()
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_count(conn, filters):
+    fields = ["chr", "pos", "ann.gene"]
+    expected = len(list(command.select_cmd(conn, fields, filters=filters, limit=None)))
+    assert parallel.count(conn, fields, "variants", filters) == expected
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_group_count(conn, filters):
+    fields = ["chr", "pos", "ann.gene"]
+    expected = {}
+    for variant in command.select_cmd(conn, fields, filters=filters, limit=None):
+        if variant["ann.gene"] is not None:
+            expected[variant["ann.gene"]] = expected.get(variant["ann.gene"], 0) + 1
+
+    observed = parallel.group_count(conn, "ann.gene", fields, "variants", filters)
+    assert {k: v for k, v in observed.items() if v} == expected
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+@pytest.mark.parametrize("limit, offset", [(None, 0), (3, 0), (4, 5)])
+def test_select(conn, filters, limit, offset):
+    fields = ["chr", "pos", "ref", "ann.gene"]
+    order_by = [("ref", False), ("ann.gene", True), ("id", True)]
+
+    expected = list(
+        command.select_cmd(conn, fields, "variants", filters, order_by, limit=limit, offset=offset)
+    )
+    observed = list(
+        parallel.select(conn, fields, "variants", filters, order_by, limit=limit, offset=offset)
+    )
+    assert observed == expected
+
+    # Without order, all rows are returned
+    expected = list(command.select_cmd(conn, fields, "variants", filters, limit=None))
+    observed = list(parallel.select(conn, fields, "variants", filters))
+    assert sorted(observed, key=repr) == sorted(expected, key=repr)
+
+
+def test_select_stop(conn, monkeypatch):
+    monkeypatch.setattr(parallel, "FETCH_SIZE", 1)
+    rows = parallel.select(conn, ["chr", "pos"])
+    assert next(rows)
+    # Threads stop when the generator is closed
+    rows.close()
@@ -0,0 +1,124 @@
+import threading
+import time
+
+from cutevariant.core.query_scheduler import QueryScheduler
+from cutevariant.core.sql_progress import QueryCancelled
+
+
+def run_in_thread(function, *args, **kwargs):
+    """Start function in a thread and return (thread, results)"""
+    results = []
+
+    def target():
+        try:
+            results.append(function(*args, **kwargs))
+        except Exception as e:
+            results.append(e)
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread, results
+
+
+def wait_until(condition, timeout=5):
+    end = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < end
+        time.sleep(0.01)
+
+
+def test_priorities():
+    scheduler = QueryScheduler(max_running=1)
+    release = threading.Event()
+    order = []
+
+    # Keep the only slot busy
+    busy, _ = run_in_thread(scheduler.run, release.wait, "stats")
+    wait_until(lambda: scheduler.running_count == 1)
+
+    threads = []
+    for query_class in ("stats", "group_by", "count"):
+        thread, _ = run_in_thread(scheduler.run, lambda c=query_class: order.append(c), query_class)
+        threads.append(thread)
+        wait_until(lambda: scheduler.waiting_count == len(threads))
+
+    # Page queries don't wait for a slot
+    assert scheduler.run(lambda: "page", "page") == "page"
+
+    release.set()
+    for thread in [busy] + threads:
+        thread.join()
+
+    assert order == ["count", "group_by", "stats"]
+    assert scheduler.running_count == scheduler.waiting_count == 0
+
+
+def test_shared_result():
+    scheduler = QueryScheduler()
+    release = threading.Event()
+    calls = []
+
+    def query():
+        calls.append(1)
+        release.wait()
+        return [1, 2, 3]
+
+    first, first_results = run_in_thread(scheduler.run, query, "count", key="same")
+    wait_until(lambda: calls)
+    second, second_results = run_in_thread(scheduler.run, query, "count", key="same")
+    time.sleep(0.1)
+
+    release.set()
+    first.join()
+    second.join()
+
+    assert len(calls) == 1
+    assert first_results == second_results == [[1, 2, 3]]
+    # Each query gets its own list
+    assert first_results[0] is not second_results[0]
+    assert scheduler.shared_count == 1
+
+    # The key is free again
+    assert scheduler.run(lambda: 4, key="same") == 4
+
+
+def test_cancel_waiting_query():
+    scheduler = QueryScheduler(max_running=1)
+    release = threading.Event()
+    cancelled = threading.Event()
+
+    busy, _ = run_in_thread(scheduler.run, release.wait)
+    wait_until(lambda: scheduler.running_count == 1)
+
+    waiting, results = run_in_thread(
+        scheduler.run, lambda: "never", "stats", cancelled=cancelled.is_set
+    )
+    wait_until(lambda: scheduler.waiting_count == 1)
+    cancelled.set()
+    waiting.join()
+
+    assert isinstance(results[0], QueryCancelled)
+    assert scheduler.waiting_count == 0
+
+    release.set()
+    busy.join()
+
+
+def test_cancelled_owner():
+    """A query sharing the result of a cancelled query runs by itself"""
+    scheduler = QueryScheduler()
+    started = threading.Event()
+
+    def cancelled_query():
+        started.set()
+        time.sleep(0.1)
+        raise QueryCancelled("Query cancelled")
+
+    owner, owner_results = run_in_thread(scheduler.run, cancelled_query, key="same")
+    started.wait()
+    other, other_results = run_in_thread(scheduler.run, lambda: "done", key="same")
+    owner.join()
+    other.join()
+
+    assert isinstance(owner_results[0], QueryCancelled)
+    assert other_results == ["done"]
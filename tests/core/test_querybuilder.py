@@ -143,7 +143,7 @@ def test_condition_to_sql():
 
     assert (
         querybuilder.condition_to_sql({"gene": {"$regex": "CFTR.+"}})
-        == "`variants`.`gene` REGEXP 'CFTR.+'"
+        == "(instr(`variants`.`gene`, 'CFTR') > 0 AND `variants`.`gene` REGEXP 'CFTR.+')"
     )
 
     assert (
@@ -152,15 +152,238 @@ def test_condition_to_sql():
     )
 
     assert (
-        querybuilder.condition_to_sql({"samples.$all.gt": 1}, ["boby", "charles"])
-        == "(`sample_boby`.`gt` = 1 AND `sample_charles`.`gt` = 1)"
+        querybuilder.condition_to_sql({"samples.$all.gt": 1}, {"boby": 1, "charles": 2})
+        == "(SELECT COUNT(*) FROM genotypes WHERE `genotypes`.`variant_id` = `variants`.`id` AND `genotypes`.`sample_id` IN (1,2) AND `genotypes`.`gt` = 1) = 2"
     )
 
     assert (
-        querybuilder.condition_to_sql({"samples.$any.gt": 1}, ["boby", "charles"])
-        == "(`sample_boby`.`gt` = 1 OR `sample_charles`.`gt` = 1)"
+        querybuilder.condition_to_sql({"samples.$any.gt": 1}, {"boby": 1, "charles": 2})
+        == "EXISTS (SELECT 1 FROM genotypes WHERE `genotypes`.`variant_id` = `variants`.`id` AND `genotypes`.`sample_id` IN (1,2) AND `genotypes`.`gt` = 1)"
     )
 
+    assert (
+        querybuilder.condition_to_sql({"samples.$count>=2.gt": 1})
+        == "(SELECT COUNT(*) FROM genotypes WHERE `genotypes`.`variant_id` = `variants`.`id` AND `genotypes`.`gt` = 1) >= 2"
+    )
+
+    assert (
+        querybuilder.condition_to_sql({"samples.$all.gt": 1})
+        == "(SELECT COUNT(*) FROM genotypes WHERE `genotypes`.`variant_id` = `variants`.`id` AND `genotypes`.`gt` = 1) = (SELECT COUNT(*) FROM samples)"
+    )
+
+
+def test_condition_to_sql_with_params():
+
+    params = []
+    assert querybuilder.condition_to_sql({"chr": "chr3"}, params=params) == "`variants`.`chr` = ?"
+    assert params == ["chr3"]
+
+    params = []
+    assert (
+        querybuilder.condition_to_sql({"qual": {"$in": [1, 2, 3]}}, params=params)
+        == "`variants`.`qual` IN (?,?,?)"
+    )
+    assert params == [1, 2, 3]
+
+    params = []
+    assert (
+        querybuilder.condition_to_sql({"ann.gene": {"$in": {"$wordset": "boby"}}}, params=params)
+        == "`annotations`.`gene` IN (SELECT value FROM wordsets WHERE name = ?)"
+    )
+    assert params == ["boby"]
+
+    params = []
+    assert (
+        querybuilder.condition_to_sql({"comment": "C'est cool"}, params=params)
+        == "`variants`.`comment` = ?"
+    )
+    assert params == ["C'est cool"]
+
+    params = []
+    assert (
+        querybuilder.condition_to_sql({"gene": {"$regex": "CFTR"}}, params=params)
+        == "`variants`.`gene` LIKE ?"
+    )
+    assert params == ["%CFTR%"]
+
+    params = []
+    assert (
+        querybuilder.condition_to_sql({"ref": {"$ne": None}}, params=params)
+        == "`variants`.`ref` IS NOT NULL"
+    )
+    assert params == []
+
+    params = []
+    assert (
+        querybuilder.condition_to_sql({"samples.$any.gt": 1}, {"boby": 1, "charles": 2}, params)
+        == "EXISTS (SELECT 1 FROM genotypes WHERE `genotypes`.`variant_id` = `variants`.`id` AND `genotypes`.`sample_id` IN (1,2) AND `genotypes`.`gt` = ?)"
+    )
+    assert params == [1]
+
+
+def test_build_sql_query_with_params():
+    conn = create_conn()
+
+    query_a, params_a = querybuilder.build_sql_query_with_params(
+        conn, ["chr", "pos"], filters={"$and": [{"ref": "A"}, {"pos": {"$gt": 10}}]}
+    )
+    query_b, params_b = querybuilder.build_sql_query_with_params(
+        conn, ["chr", "pos"], filters={"$and": [{"ref": "G"}, {"pos": {"$gt": 20}}]}, offset=50
+    )
+
+    # Same statement, different values
+    assert query_a == query_b
+    assert params_a == ("A", 10, 50, 0)
+    assert params_b == ("G", 20, 50, 50)
+
+    # Bound and literal queries return the same variants
+    filters = {
+        "$and": [
+            {"ann.gene": {"$in": ["CICP23", "GJB2"]}},
+            {"alt": {"$regex": "^[CT]$"}},
+            {"$or": [{"favorite": False}, {"qual": None}]},
+        ]
+    }
+    for source in ("variants", "other"):
+        literal = querybuilder.build_sql_query(conn, ["chr", "pos"], source, filters, limit=None)
+        query, params = querybuilder.build_sql_query_with_params(
+            conn, ["chr", "pos"], source, filters, limit=None
+        )
+        assert "CICP23" not in query
+        assert [tuple(i) for i in conn.execute(query, params)] == [
+            tuple(i) for i in conn.execute(literal)
+        ]
+
+
+@pytest.mark.parametrize(
+    "order_by",
+    [[("id", True)], [("ref", False), ("id", True)], [("alt", True), ("pos", False), ("id", False)]],
+)
+@pytest.mark.parametrize("filters", [{}, {"$and": []}, {"$and": [{"pos": {"$gt": 10}}]}])
+def test_keyset_filters(order_by, filters):
+    conn = create_conn()
+    fields = ["chr", "pos", "ref", "alt"]
+
+    def read(filters, limit, offset=0):
+        query, params = querybuilder.build_sql_query_with_params(
+            conn, fields, filters=filters, order_by=order_by, limit=limit, offset=offset
+        )
+        return [dict(row) for row in conn.execute(query, params)]
+
+    expected = read(filters, None)
+    assert len(expected) > 3
+
+    # Read 2 rows at a time, starting after the last row read
+    observed = rows = read(filters, 2)
+    while rows:
+        rows = read(querybuilder.keyset_filters(filters, order_by, observed[-1]), 2)
+        observed = observed + rows
+
+    assert observed == expected
+
+    # NULL values can't be compared
+    assert querybuilder.keyset_filters(filters, [("qual", True)], {"qual": None}) is None
+    assert querybuilder.keyset_filters(filters, [("qual", True)], {"id": 1}) is None
+
+
+def test_build_group_by_query():
+    conn = create_conn()
+
+    # Only the joins required by the grouped field and the filters are made
+    query, params = querybuilder.build_group_by_query_with_params(
+        conn, ["chr"], filters={"$and": [{"pos": {"$gt": 10}}]}
+    )
+    assert query == (
+        "SELECT `variants`.`chr`, COUNT(DISTINCT `variants`.`id`) AS `count` FROM variants"
+        " WHERE ((`variants`.`pos` > ?)) AND NOT (`variants`.`chr` IS NULL) GROUP BY 1"
+    )
+    assert params == (10,)
+
+    query, params = querybuilder.build_group_by_query_with_params(
+        conn, ["chr", "ann.gene"], excluded_groups=[("11", "CFTR")]
+    )
+    assert "LEFT JOIN annotations" in query
+    assert query.endswith(
+        "NOT (`variants`.`chr` IS NULL AND `annotations`.`gene` IS NULL)"
+        " AND NOT ((`variants`.`chr` IS ? AND `annotations`.`gene` IS ?))"
+    )
+    assert params == ("11", "CFTR")
+
+
+def test_samples_ids_cache():
+    conn = sql.get_sql_connection(":memory:")
+    sql.create_database_schema(conn)
+    sql.insert_sample(conn, "TUMOR")
+
+    fields = ["chr", "samples.TUMOR.gt", "samples.NORMAL.gt"]
+    query = querybuilder.build_sql_query(conn, fields)
+    assert "`sample_TUMOR`.sample_id = 1" in query
+    assert "LEFT JOIN genotypes `sample_NORMAL`" not in query
+
+    # The cache is dropped when samples change
+    sql.insert_sample(conn, "NORMAL")
+    query = querybuilder.build_sql_query(conn, fields)
+    assert "`sample_NORMAL`.sample_id = 2" in query
+
+
+@pytest.mark.parametrize("selected_samples", [[], ["TUMOR"], ["TUMOR", "NORMAL"]])
+def test_samples_aggregate_filters(selected_samples):
+    """$any/$all/$count give the same variants as a join on each sample"""
+    conn = create_conn()
+    samples = selected_samples or [i["name"] for i in sql.get_samples(conn)]
+
+    genotypes = {}
+    for variant_id, sample_name, gt in conn.execute(
+        "SELECT variant_id, samples.name, gt FROM genotypes "
+        "JOIN samples ON samples.id = genotypes.sample_id"
+    ):
+        genotypes.setdefault(variant_id, {})[sample_name] = gt
+
+    for gt in (0, 1, 2):
+        matches = {
+            variant_id: sum(values.get(name) == gt for name in samples)
+            for variant_id, values in genotypes.items()
+        }
+        expected = {
+            "$any": {i for i, count in matches.items() if count > 0},
+            "$all": {i for i, count in matches.items() if count == len(samples)},
+            "$count>=2": {i for i, count in matches.items() if count >= 2},
+        }
+
+        for name, expected_ids in expected.items():
+            query = querybuilder.build_sql_query(
+                conn,
+                ["id"],
+                filters={"$and": [{f"samples.{name}.gt": gt}]},
+                limit=None,
+                selected_samples=selected_samples,
+            )
+            assert "LEFT JOIN genotypes" not in query
+            assert {i[0] for i in conn.execute(query)} == expected_ids, (name, gt)
+
+
+@pytest.mark.parametrize("name", ["$any", "$all", "$count>=0", "$count<2"])
+def test_samples_aggregate_unknown_samples(name):
+    """Unknown selected samples match no variant"""
+    conn = create_conn()
+    query = querybuilder.build_sql_query(
+        conn,
+        ["id"],
+        filters={"$and": [{f"samples.{name}.gt": 1}]},
+        limit=None,
+        selected_samples=["nobody"],
+    )
+    assert conn.execute(query).fetchall() == []
+
+    query, params = querybuilder.build_sql_query_with_params(
+        conn,
+        ["id"],
+        filters={"$and": [{f"samples.{name}.gt": 1}]},
+        limit=None,
+        selected_samples=["nobody"],
+    )
+    assert conn.execute(query, params).fetchall() == []
+
 
 def test_fields_to_vql():
     fields = [
@@ -245,8 +468,8 @@ def test_filters_to_sql():
 
     filters = {"$and": [{"pos": 10}, {"samples.$all.gt": 1}]}
 
-    observed = querybuilder.filters_to_sql(filters, ["boby", "charles"])
-    expected = "(`variants`.`pos` = 10 AND (`sample_boby`.`gt` = 1 AND `sample_charles`.`gt` = 1))"
+    observed = querybuilder.filters_to_sql(filters, {"boby": 1, "charles": 2})
+    expected = "(`variants`.`pos` = 10 AND (SELECT COUNT(*) FROM genotypes WHERE `genotypes`.`variant_id` = `variants`.`id` AND `genotypes`.`sample_id` IN (1,2) AND `genotypes`.`gt` = 1) = 2)"
 
     assert observed == expected
 
@@ -257,8 +480,8 @@ def test_filters_to_sql():
         ]
     }
 
-    observed = querybuilder.filters_to_sql(filters, ["boby", "charles"])
-    expected = "(`variants`.`pos` = 10 AND (`sample_boby`.`gt` = 1 OR `sample_charles`.`gt` = 1))"
+    observed = querybuilder.filters_to_sql(filters, {"boby": 1, "charles": 2})
+    expected = "(`variants`.`pos` = 10 AND EXISTS (SELECT 1 FROM genotypes WHERE `genotypes`.`variant_id` = `variants`.`id` AND `genotypes`.`sample_id` IN (1,2) AND `genotypes`.`gt` = 1))"
 
     assert observed == expected
 
@@ -449,7 +672,7 @@ def test_filters(filter_in, expected_sql, expected_vql):
             "source": "variants",
             "filters": {"$and": [{"alt": {"$regex": "C$"}}]},
         },
-        "SELECT DISTINCT `variants`.`id`,`variants`.`chr`,`variants`.`pos` FROM variants WHERE (`variants`.`alt` REGEXP 'C$') LIMIT 50 OFFSET 0",
+        "SELECT DISTINCT `variants`.`id`,`variants`.`chr`,`variants`.`pos` FROM variants WHERE ((instr(`variants`.`alt`, 'C') > 0 AND `variants`.`alt` REGEXP 'C$')) LIMIT 50 OFFSET 0",
         "SELECT chr,pos FROM variants WHERE alt =~ 'C$'",
     ),
     # Test different source
@@ -547,7 +770,7 @@ def test_filters(filter_in, expected_sql, expected_vql):
             "source": "variants",
             "filters": {"$and": [{"ref": {"$regex": "^[AG]$"}}, {"alt": {"$regex": "^[CT]$"}}]},
         },
-        "SELECT DISTINCT `variants`.`id`,`variants`.`chr`,`variants`.`pos`,`variants`.`ref`,`variants`.`alt` FROM variants WHERE (`variants`.`ref` REGEXP '^[AG]$' AND `variants`.`alt` REGEXP '^[CT]$') LIMIT 50 OFFSET 0",
+        "SELECT DISTINCT `variants`.`id`,`variants`.`chr`,`variants`.`pos`,`variants`.`ref`,`variants`.`alt` FROM variants WHERE ((`variants`.`ref` IS NOT NULL AND `variants`.`ref` REGEXP '^[AG]$') AND (`variants`.`alt` IS NOT NULL AND `variants`.`alt` REGEXP '^[CT]$')) LIMIT 50 OFFSET 0",
         "SELECT chr,pos,ref,alt FROM variants WHERE ref =~ '^[AG]$' AND alt =~ '^[CT]$'",
     ),
     # Test filters with not regex !
@@ -557,7 +780,7 @@ def test_filters(filter_in, expected_sql, expected_vql):
             "source": "variants",
             "filters": {"$and": [{"ref": {"$nregex": "^[AG]$"}}, {"alt": {"$nregex": "^[CT]$"}}]},
         },
-        "SELECT DISTINCT `variants`.`id`,`variants`.`chr`,`variants`.`pos`,`variants`.`ref`,`variants`.`alt` FROM variants WHERE (`variants`.`ref` NOT REGEXP '^[AG]$' AND `variants`.`alt` NOT REGEXP '^[CT]$') LIMIT 50 OFFSET 0",
+        "SELECT DISTINCT `variants`.`id`,`variants`.`chr`,`variants`.`pos`,`variants`.`ref`,`variants`.`alt` FROM variants WHERE ((`variants`.`ref` IS NOT NULL AND `variants`.`ref` NOT REGEXP '^[AG]$') AND (`variants`.`alt` IS NOT NULL AND `variants`.`alt` NOT REGEXP '^[CT]$')) LIMIT 50 OFFSET 0",
         "SELECT chr,pos,ref,alt FROM variants WHERE ref !~ '^[AG]$' AND alt !~ '^[CT]$'",
     ),
     # TEST HAS
@@ -587,9 +810,18 @@ def test_filters(filter_in, expected_sql, expected_vql):
             "source": "variants",
             "filters": {"$and": [{"samples.$any.gt": 1}]},
         },
-        "SELECT DISTINCT `variants`.`id`,`variants`.`chr`,`variants`.`pos` FROM variants LEFT JOIN genotypes `sample_TUMOR` ON `sample_TUMOR`.variant_id = variants.id AND `sample_TUMOR`.sample_id = 1 LEFT JOIN genotypes `sample_NORMAL` ON `sample_NORMAL`.variant_id = variants.id AND `sample_NORMAL`.sample_id = 2 WHERE ((`sample_TUMOR`.`gt` = 1 OR `sample_NORMAL`.`gt` = 1)) LIMIT 50 OFFSET 0",
+        "SELECT DISTINCT `variants`.`id`,`variants`.`chr`,`variants`.`pos` FROM variants WHERE (EXISTS (SELECT 1 FROM genotypes WHERE `genotypes`.`variant_id` = `variants`.`id` AND `genotypes`.`gt` = 1)) LIMIT 50 OFFSET 0",
         "SELECT chr,pos FROM variants WHERE samples[ANY].gt = 1",
     ),
+    (
+        {
+            "fields": ["chr", "pos"],
+            "source": "variants",
+            "filters": {"$and": [{"samples.$count>=2.gt": 1}]},
+        },
+        "SELECT DISTINCT `variants`.`id`,`variants`.`chr`,`variants`.`pos` FROM variants WHERE ((SELECT COUNT(*) FROM genotypes WHERE `genotypes`.`variant_id` = `variants`.`id` AND `genotypes`.`gt` = 1) >= 2) LIMIT 50 OFFSET 0",
+        "SELECT chr,pos FROM variants WHERE samples[COUNT>=2].gt = 1",
+    ),
     # ORDER BY
     (
         {
@@ -1,7 +1,9 @@
 import os
 import pytest
 import tempfile
-from cutevariant.core.report import SampleReport
+from cutevariant.core import sql
+from cutevariant.core.report import SampleReport, create_sample_reports, report_filenames
+from cutevariant.core.sql_progress import QueryCancelled
 
 TEMPLATE = """
 <!DOCTYPE html>
@@ -38,3 +40,102 @@ def test_sample_report(conn):
 
     os.remove(fp.name)
     os.remove(output.name)
+
+
+@pytest.fixture
+def project(file_conn):
+    """File database with classified genotypes"""
+    conn = file_conn
+    conn.execute("UPDATE genotypes SET classification = (variant_id % 3) WHERE gt > 0")
+    conn.execute("UPDATE variants SET classification = (id % 2) + 1")
+    conn.commit()
+    return conn.execute("PRAGMA database_list").fetchone()[2], conn
+
+
+def test_sample_report_data(project):
+    _, conn = project
+    sample_id = 2
+    sample_name = sql.get_sample(conn, sample_id)["name"]
+    report = SampleReport(conn, sample_id)
+    stats = report.get_stats()
+
+    expected = [
+        row["count"]
+        for row in sql.get_variant_groupby_for_samples(conn, "gt", [sample_id])
+        if row["gt"] >= 0
+    ]
+    assert [count for _, count in stats["var_per_gt"]["data"]] == expected
+
+    expected = sql.get_variant_groupby_for_samples(
+        conn, "genotypes.classification", [sample_id], 1
+    )
+    assert [count for _, count in stats["var_per_gt_classif"]["data"]] == [
+        row["count"] for row in expected
+    ]
+
+    # Only the genotype of the sample, with a classification >= threshold
+    variants = report.get_variants()
+    expected = conn.execute(
+        "SELECT variant_id FROM genotypes WHERE sample_id = ? AND classification >= 1",
+        (sample_id,),
+    )
+    assert variants
+    assert [variant["id"] for variant in variants] == sorted(row[0] for row in expected)
+    for variant in variants:
+        genotype = next(sql.get_genotypes(conn, variant["id"], ["gt"], [sample_name]))
+        assert variant["samples"]["name"] == sample_name
+        assert variant["samples"]["gt"] == genotype["gt"]
+        assert variant["variant_name"]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_create_sample_reports(project, tmp_path, processes):
+    path, conn = project
+    with open(tmp_path / "template.html", "w") as file:
+        file.write(TEMPLATE)
+
+    messages = []
+    sample_ids = [sample["id"] for sample in sql.get_samples(conn)]
+    reports = create_sample_reports(
+        path,
+        sample_ids,
+        str(tmp_path / "template.html"),
+        str(tmp_path / "reports"),
+        processes=processes,
+        progress_callback=messages.append,
+    )
+
+    assert list(reports) == sample_ids
+    assert messages[-1] == f"{len(sample_ids)}/{len(sample_ids)} reports created"
+    for sample_id, output in reports.items():
+        with open(output) as file:
+            assert sql.get_sample(conn, sample_id)["name"] in file.read()
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_create_sample_reports_cancelled(project, tmp_path, processes):
+    path, conn = project
+    with open(tmp_path / "template.html", "w") as file:
+        file.write(TEMPLATE)
+
+    sample_ids = [sample["id"] for sample in sql.get_samples(conn)]
+    with pytest.raises(QueryCancelled):
+        create_sample_reports(
+            path,
+            sample_ids,
+            str(tmp_path / "template.html"),
+            str(tmp_path / "reports"),
+            processes=processes,
+            cancelled=lambda: True,
+        )
+
+
+def test_report_filenames():
+    names = {1: "a b", 2: "a_b", 3: "A_B", 4: "a_b_2", 5: "c/d"}
+    filenames = report_filenames(names)
+
+    assert filenames[5] == "c_d.html"
+    # Colliding names, even case insensitively, get the sample id
+    assert filenames[1] == "a_b_1.html"
+    assert filenames[3] == "A_B_3.html"
+    assert len({filename.lower() for filename in filenames.values()}) == len(names)
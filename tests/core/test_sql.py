@@ -1,11 +1,13 @@
 from itertools import groupby
 import sqlite3
 import pytest
+import numpy as np
 import tempfile
 import copy
 import os
 import re
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
 from cutevariant.core import sql
 from cutevariant.core.reader import BedReader
@@ -555,13 +557,51 @@ def test_remove_index(conn: sqlite3.Connection):
 
 @pytest.mark.parametrize("field", ["pos", "qual"])
 def test_get_field_info(conn, field):
-    # TODO ...
-    metrics = ["min", "max", "median", "mean", "q1", "q3"]
-    # stats = sql.get_field_info(conn, field, metrics)
-    # TODO ....
-    # assert sorted(list(stats.keys())) == sorted(metrics)
+    metrics = ["count", "min", "max", "median", "mean", "std", "q1", "q3", "histogram"]
+    stats = sql.get_field_info(conn, field, metrics=metrics)
+    assert sorted(stats.keys()) == sorted(metrics)
 
-    # This test still needs improvement but at least kinda works...
+    values = [
+        row[field]
+        for row in conn.execute(f"SELECT {field} FROM variants WHERE {field} IS NOT NULL")
+    ]
+    assert stats["count"] == len(values)
+    if values:
+        quantiles = np.quantile(values, [0, 0.25, 0.5, 0.75, 1])
+        assert [stats[m] for m in ("min", "q1", "median", "q3", "max")] == pytest.approx(quantiles)
+        assert stats["mean"] == pytest.approx(np.mean(values))
+        assert stats["std"] == pytest.approx(np.std(values))
+        assert sum(stats["histogram"]["counts"]) == len(values)
+        assert len(stats["histogram"]["edges"]) == sql.HISTOGRAM_BINS + 1
+
+    # Custom metrics receive the sorted values
+    stats = sql.get_field_info(conn, field, metrics=[("sorted", lambda ar: list(ar))])
+    assert stats["sorted"] == sorted(values)
+
+    # Results are cached until the database changes
+    stats = sql.get_field_info(conn, "pos", metrics=["max"])
+    stats["max"] = 0
+    assert sql.get_field_info(conn, "pos", metrics=["max"])["max"] > 0
+    conn.execute("UPDATE variants SET pos = 999999999 WHERE id = 1")
+    assert sql.get_field_info(conn, "pos", metrics=["max"])["max"] == 999999999
+
+    # samples[ANY] filters consider the selected samples
+    filters = {"$and": [{"samples.$any.gt": {"$gte": 0}}]}
+    assert sql.get_field_info(conn, "pos", filters=filters, metrics=["count"])["count"] > 0
+    stats = sql.get_field_info(
+        conn, "pos", filters=filters, metrics=["count"], selected_samples=["nobody"]
+    )
+    assert stats["count"] == 0
+
+
+def test_read_values():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE data (value)")
+    conn.executemany("INSERT INTO data VALUES (?)", [(i if i % 3 else None,) for i in range(100)])
+
+    values = sql.read_values(conn.execute("SELECT value FROM data"), chunk_size=7)
+    assert values.dtype == np.float64
+    assert values.tolist() == [i for i in range(100) if i % 3]
 
 
 def test_create_connexion(conn):
@@ -591,6 +631,140 @@ def test_get_database_file_name():
     assert dbfile_name == returned_file_name
 
 
+def test_connection_pool(tmp_path):
+    dbfile_name = str(tmp_path / "project.db")
+    conn = sql.get_sql_connection(dbfile_name)
+    conn.execute("CREATE TABLE data (value INTEGER)")
+    conn.commit()
+
+    pool = sql.ConnectionPool(dbfile_name, size=1)
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first is not second
+
+    # Pooled connections are read only
+    with pytest.raises(sqlite3.OperationalError):
+        first.execute("INSERT INTO data VALUES (1)")
+
+    # Only one idle connection is kept, and it is reused
+    pool.release(first)
+    pool.release(second)
+    with pool.connection() as reused:
+        assert reused is first
+
+    # Pooled connections can be used from other threads
+    with ThreadPoolExecutor(1) as executor:
+        with pool.connection() as borrowed:
+            count = executor.submit(lambda: borrowed.execute("SELECT COUNT(*) FROM data"))
+            assert count.result().fetchone()[0] == 0
+
+    # Broken connections are replaced
+    first.close()
+    with pool.connection() as replaced:
+        assert replaced is not first
+
+    # So are connections to a replaced file
+    os.remove(dbfile_name)
+    sql.get_sql_connection(dbfile_name).execute("CREATE TABLE other (value INTEGER)")
+    with pool.connection() as replaced:
+        assert sql.table_exists(replaced, "other")
+
+    pool.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        pool.acquire()
+
+    assert sql.get_connection_pool(dbfile_name) is sql.get_connection_pool(dbfile_name)
+    sql.close_connection_pools()
+
+
+def test_connection_pool_max_connections(tmp_path):
+    dbfile_name = str(tmp_path / "project.db")
+    sql.get_sql_connection(dbfile_name).execute("CREATE TABLE data (value INTEGER)")
+
+    pool = sql.ConnectionPool(dbfile_name, max_connections=1, timeout=0.1)
+    pool.warm_up(4)
+    first = pool.acquire()
+
+    # Every connection is borrowed: acquire waits, then fails
+    with pytest.raises(sqlite3.OperationalError):
+        pool.acquire()
+
+    # A released connection wakes up a waiting borrower
+    with ThreadPoolExecutor(1) as executor:
+        waiting = executor.submit(pool.acquire, 10)
+        pool.release(first)
+        assert waiting.result() is first
+
+    # Discarded connections free their place
+    first.close()
+    pool.release(first)
+    with pool.connection() as replaced:
+        assert replaced is not first
+
+    pool.close()
+
+
+def test_journal_mode(tmp_path):
+    dbfile_name = str(tmp_path / "project.db")
+
+    # Project created with the rollback journal
+    old_conn = sqlite3.connect(dbfile_name)
+    old_conn.execute("CREATE TABLE data (value INTEGER)")
+    old_conn.commit()
+
+    # It can't be migrated while another process writes
+    old_conn.execute("BEGIN IMMEDIATE")
+    conn = sql.get_sql_connection(dbfile_name)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    conn.close()
+    old_conn.rollback()
+    old_conn.close()
+
+    # Migrated when opened
+    conn = sql.get_sql_connection(dbfile_name)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    # Readers are not blocked by a pending write
+    conn.execute("INSERT INTO data VALUES (1)")
+    assert conn.in_transaction
+    with sql.get_connection_pool(dbfile_name).connection() as reader:
+        assert reader.execute("SELECT COUNT(*) FROM data").fetchone()[0] == 0
+        conn.commit()
+        assert reader.execute("SELECT COUNT(*) FROM data").fetchone()[0] == 1
+
+    # Data is moved to the database file on close
+    sql.close_sql_connection(conn)
+    assert not os.path.exists(dbfile_name + "-wal")
+    sql.close_sql_connection(conn)
+
+
+def test_retry_when_busy(monkeypatch):
+    monkeypatch.setattr(sql, "POOL_RETRY_DELAY", 0)
+    calls = []
+
+    def locked(conn):
+        calls.append(conn)
+        if len(calls) < 3:
+            raise sqlite3.OperationalError("database is locked")
+        return len(calls)
+
+    assert sql.retry_when_busy(locked, None) == 3
+
+    calls.clear()
+    with pytest.raises(sqlite3.OperationalError):
+        sql.retry_when_busy(locked, None, retries=1)
+
+    # Other errors are not retried
+    def error(conn):
+        calls.append(conn)
+        raise sqlite3.OperationalError("no such table: boby")
+
+    calls.clear()
+    with pytest.raises(sqlite3.OperationalError):
+        sql.retry_when_busy(error, None)
+    assert len(calls) == 1
+
+
 def test_columns(conn):
     # Test if variant fields is in databases
     q = conn.execute("PRAGMA table_info(variants)")
@@ -743,6 +917,89 @@ def test_get_variant_as_group(conn):
     assert observed_genes == expected_genes
 
 
+def test_get_variant_as_group_multi_fields(conn):
+    groupby = ["chr", "ann.gene"]
+    # Distinct (variant, group) pairs
+    pairs = {
+        (variant["id"], variant["chr"], variant["ann.gene"])
+        for variant in sql.get_variants(conn, ["id", "chr", "ann.gene"], limit=None)
+    }
+    expected = Counter((chrom, gene) for _, chrom, gene in pairs)
+
+    groups = list(sql.get_variant_as_group(conn, groupby, limit=None))
+    assert {(i["chr"], i["ann.gene"]): i["count"] for i in groups} == expected
+    counts = [i["count"] for i in groups]
+    assert counts == sorted(counts, reverse=True)
+
+    # Top-k with the other bucket
+    groups = list(sql.get_variant_as_group(conn, groupby, limit=1, other=True))
+    top, other = groups
+    assert top["count"] == max(expected.values())
+    assert other["other"] and other["chr"] == sql.OTHER_GROUP
+    top_group = (top["chr"], top["ann.gene"])
+    assert other["count"] == len(
+        {variant_id for variant_id, *group in pairs if tuple(group) != top_group}
+    )
+
+    # No other bucket when all the groups are returned
+    assert "other" not in list(sql.get_variant_as_group(conn, groupby, other=True))[-1]
+
+
+def test_get_variant_positions(conn):
+    variants = list(sql.get_variants(conn, ["chr", "pos"], limit=None))
+    chrom = variants[0]["chr"]
+    window = sorted(i["pos"] for i in variants if i["chr"] == chrom)[:2]
+    expected = Counter(
+        i["pos"] for i in variants if i["chr"] == chrom and window[0] <= i["pos"] <= window[-1]
+    )
+
+    for name in (chrom, "chr" + chrom):
+        positions, counts = sql.get_variant_positions(conn, name, window[0], window[-1])
+        assert dict(zip(positions.tolist(), counts.tolist())) == expected
+
+    # Empty window
+    positions, counts = sql.get_variant_positions(conn, "unknown", 0, 10**9)
+    assert len(positions) == len(counts) == 0
+
+    # Filters are applied in the window
+    filters = {"$and": [{"pos": window[0]}]}
+    positions, _ = sql.get_variant_positions(conn, chrom, window[0], window[-1], filters=filters)
+    assert positions.tolist() == [window[0]]
+
+
+def test_field_values(conn):
+    # No dictionary yet
+    assert sql.get_field_values(conn, "ann.gene") is None
+
+    sql.update_field_values(conn)
+
+    def expected(query):
+        rows = conn.execute(query).fetchall()
+        # Most frequent first, then in case insensitive order
+        return [row[0] for row in sorted(rows, key=lambda row: (-row[1], row[0].lower()))]
+
+    query = "SELECT gene, COUNT(*) FROM annotations WHERE gene IS NOT NULL GROUP BY gene"
+    assert sql.get_field_values(conn, "ann.gene") == expected(query)
+    # Prefixes are case insensitive
+    assert sql.get_field_values(conn, "ann.gene", "GENE2") == ["gene2"]
+    assert sql.get_field_values(conn, "ann.gene", "x") == []
+    # Numeric fields have no dictionary
+    assert sql.get_field_values(conn, "pos") is None
+
+    # Triggers keep the dictionaries up to date
+    conn.execute("UPDATE annotations SET gene = 'KRAS' WHERE gene = 'gene2'")
+    conn.execute("INSERT INTO annotations (variant_id, gene) VALUES (1, 'KRAS')")
+    conn.execute("DELETE FROM annotations WHERE rowid = (SELECT MIN(rowid) FROM annotations)")
+    assert sql.get_field_values(conn, "ann.gene") == expected(query)
+    assert sql.get_field_values(conn, "ann.gene", "gene2") == []
+
+    # A truncated dictionary only has the most frequent values, without fallback
+    sql.update_field_values(conn, max_values=1)
+    assert sql.get_field_values(conn, "ann.gene", limit=1) == expected(query)[:1]
+    assert sql.get_field_values(conn, "ann.gene", limit=5) == expected(query)[:1]
+    assert sql.get_field_values(conn, "ann.gene", expected(query)[1]) == []
+
+
 def test_get_variant_groupby_for_samples(conn):
     groupby = "genotypes.gt"
     samples = [1]
@@ -754,6 +1011,62 @@ def test_get_variant_groupby_for_samples(conn):
     assert r == ({'classification': 0, 'count': 2},)
 
 
+@pytest.mark.parametrize("indexed", [True, False], ids=["indexed", "legacy"])
+def test_search_samples(conn, indexed):
+    for name, family, tags in (
+        ("Sacha2", "fam2", "exome,urgent"),
+        ("olivia", "fam2", "Exome"),
+        ("sam", "fam3", 'a"b,c\\d'),
+    ):
+        sql.insert_sample(conn, name)
+        conn.execute(
+            "UPDATE samples SET family_id = ?, tags = ? WHERE name = ?", (family, tags, name)
+        )
+    if indexed:
+        sql.update_sample_tags(conn)
+
+    def names(samples):
+        return [sample["name"] for sample in samples]
+
+    # Names are searched case insensitive, anywhere or at the start
+    assert names(sql.search_samples(conn, "SAC")) == ["sacha", "Sacha2"]
+    assert names(sql.search_samples(conn, "ACH")) == ["sacha", "Sacha2"]
+    assert names(sql.search_samples(conn, "ACH", prefix=True)) == []
+    assert names(sql.search_samples(conn, "SAC", prefix=True)) == ["sacha", "Sacha2"]
+    assert names(sql.search_samples(conn, "sa", families=["fam2"])) == ["Sacha2"]
+    assert names(sql.search_samples(conn, "", tags=["exome"])) == ["Sacha2", "olivia"]
+    assert names(sql.search_samples(conn, "", tags=['a"b', "c\\d"])) == ["sam"]
+    assert names(sql.search_samples(conn, "", tags=["exome"], classifications=[1])) == []
+    assert names(sql.search_samples(conn, "%")) == []
+
+    # Pages
+    assert names(sql.search_samples(conn, "", limit=2, offset=1)) == ["boby", "Sacha2"]
+    query = "tags:ex"
+    assert names(sql.get_samples_from_query(conn, query)) == ["Sacha2", "olivia"]
+    assert names(sql.get_samples_from_query(conn, query, limit=1, offset=1)) == ["olivia"]
+    assert names(sql.get_samples_from_query(conn, "family_id:fam3 boby")) == ["boby", "sam"]
+    assert names(sql.get_samples_from_query(conn, "OBY")) == ["boby"]
+
+    tags = sql.get_sample_tags(conn)
+    assert tags == sorted(tags, key=str.lower)
+    assert [tag.lower() for tag in tags].count("exome") == 1
+    assert {"urgent", 'a"b', "c\\d"} <= set(tags)
+    assert names(sql.get_samples_by_names(conn, ["olivia", "boby", "unknown"])) == [
+        "boby",
+        "olivia",
+    ]
+
+    # Tags follow the updates of the samples
+    conn.execute("UPDATE samples SET tags = 'urgent' WHERE name = 'olivia'")
+    conn.execute("DELETE FROM samples WHERE name = 'Sacha2'")
+    assert names(sql.search_samples(conn, "", tags=["exome"])) == []
+    assert names(sql.search_samples(conn, "", tags=["urgent"])) == ["olivia"]
+
+    # Any character may be used in the tags
+    conn.execute("UPDATE samples SET tags = 'a\tb,c\nd' WHERE name = 'olivia'")
+    assert names(sql.search_samples(conn, "", tags=["a\tb", "c\nd"])) == ["olivia"]
+
+
 def test_get_samples(conn):
     """Test default values of samples"""
     assert [sample["name"] for sample in sql.get_samples(conn)] == SAMPLES
@@ -1100,6 +1413,18 @@ def test_insert_selection_from_source(conn):
     assert selection["name"] == "test"
     assert selection["count"] == len(observed)
 
+    # The index is kept, ids are inserted in increasing order
+    index = "SELECT name FROM sqlite_master WHERE name = 'idx_selection_has_variant'"
+    assert conn.execute(index).fetchone()
+    ids = [
+        row[0]
+        for row in conn.execute(
+            "SELECT variant_id FROM selection_has_variant WHERE selection_id = ? ORDER BY rowid",
+            (selection["id"],),
+        )
+    ]
+    assert ids == sorted(ids)
+
 
 def test_insert_selection_from_samples(conn):
 
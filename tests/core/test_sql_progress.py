@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+from cutevariant.core import parallel
+from cutevariant.core.sql_progress import ProgressHandler, QueryCancelled, QueryTimeout
+
+# Endless query for sqlite, without any table
+HEAVY_QUERY = """
+WITH RECURSIVE counter(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM counter)
+SELECT COUNT(*) FROM counter
+"""
+
+
+@pytest.fixture
+def conn(file_conn, monkeypatch):
+    monkeypatch.setattr(parallel, "PARALLEL_WORKERS", 3)
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_VARIANTS", 0)
+    return file_conn
+
+
+def test_timeout(conn):
+    handler = ProgressHandler(budget=0.2)
+    start = time.perf_counter()
+    with pytest.raises(QueryTimeout):
+        handler.run(conn, lambda c: c.execute(HEAVY_QUERY).fetchone())
+
+    assert handler.timed_out
+    assert time.perf_counter() - start < 5
+    # The handler is removed; the connection is still usable
+    assert conn.progress_handler is None
+    assert conn.execute("SELECT COUNT(*) FROM variants").fetchone()[0] > 0
+
+
+def test_cancel(conn):
+    handler = ProgressHandler()
+    threading.Timer(0.2, handler.cancel).start()
+    with pytest.raises(QueryCancelled):
+        handler.run(conn, lambda c: c.execute(HEAVY_QUERY).fetchone())
+
+    assert not handler.timed_out
+
+
+def test_progress_callback(conn):
+    reports = []
+    handler = ProgressHandler(budget=0.5, callback=lambda *args: reports.append(args))
+    with pytest.raises(QueryTimeout):
+        handler.run(conn, lambda c: c.execute(HEAVY_QUERY).fetchone())
+
+    assert reports
+    steps, elapsed = reports[-1]
+    assert steps > 0 and 0 < elapsed <= 0.5
+
+
+def test_no_budget(conn):
+    handler = ProgressHandler(steps=1)
+    count = handler.run(conn, lambda c: c.execute("SELECT COUNT(*) FROM variants").fetchone()[0])
+    assert count == 11
+    assert handler.vm_steps > 0
+
+
+def test_parallel_cancel(conn):
+    """Worker connections of parallel queries use the handler of conn"""
+
+    def heavy(range_conn, filters):
+        return range_conn.execute(HEAVY_QUERY).fetchone()
+
+    handler = ProgressHandler(budget=0.2)
+    with pytest.raises(QueryTimeout):
+        handler.run(conn, lambda c: parallel.map_ranges(c, heavy))
@@ -0,0 +1,96 @@
+import re
+import random
+
+import pytest
+
+from cutevariant.core import sql, querybuilder
+from cutevariant.core.sql_regexp import regexp, regexp_prefilters, glob_escape, like_escape
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    [
+        ("CFTR", (None, ["CFTR"], False)),
+        ("^CFTR.+del", ("CFTR", ["del"], False)),
+        (r"\ACFTR", ("CFTR", [], False)),
+        ("(?m)^CFTR", (None, ["CFTR"], False)),
+        ("^[AG]$", (None, [], False)),
+        ("BRCA(1|2)", (None, ["BRCA"], False)),
+        ("c\\.(12)+del", (None, ["c.", "12", "del"], False)),
+        ("CF*TR", (None, ["C", "TR"], False)),
+        ("(?i)brca[12]", (None, ["brca"], True)),
+        ("(?i)^brca", (None, ["brca"], True)),
+        ("a|b", (None, [], False)),
+        ("[invalid", (None, [], False)),
+    ],
+)
+def test_regexp_prefilters(pattern, expected):
+    assert regexp_prefilters(pattern) == expected
+
+
+def test_escape():
+    assert glob_escape("a*b?[c]") == "a[*]b[?][[]c]"
+    assert like_escape("50%_\\") == "50\\%\\_\\\\"
+
+
+def test_regexp_function():
+    assert regexp("^CF", "CFTR")
+    assert not regexp("^TR", "CFTR")
+    assert regexp("^12", 123)
+    assert regexp("CFTR", None) is None
+
+
+def test_regexp_filters():
+    """Pre-filtered REGEXP conditions must return the same rows as a plain python search"""
+    conn = sql.get_sql_connection(":memory:")
+    conn.execute("CREATE TABLE variants (id INTEGER PRIMARY KEY, gene TEXT)")
+    values = ["CFTR", "cftr", "CFTR-AS1", "GJB2", "a*b", "50%", None, "c.12del", "c.1212del"]
+    conn.executemany("INSERT INTO variants (gene) VALUES (?)", [(v,) for v in values])
+
+    # Patterns without special characters are translated to LIKE: not tested here
+    patterns = ["^CF.+", "(?i)cftr$", r"a\*b", "50%$", "c\\.(12)+del", "^[A-Z]+$", "a|G"]
+
+    for pattern in patterns:
+        for operator in ("$regex", "$nregex"):
+            params = []
+            where = querybuilder.condition_to_sql({"gene": {operator: pattern}}, params=params)
+            observed = [
+                i[0] for i in conn.execute(f"SELECT gene FROM variants WHERE {where}", params)
+            ]
+
+            expected = [
+                v
+                for v in values
+                if v is not None and (regexp(pattern, v) == (operator == "$regex"))
+            ]
+            assert observed == expected, (pattern, operator, where)
+
+
+def test_prefiltered_regexp_matches_naive_regexp():
+    """Prefiltered REGEXP conditions count the same rows as a plain python REGEXP"""
+    conn = sql.get_sql_connection(":memory:")
+    conn.execute("CREATE TABLE annotations (variant_id INTEGER, gene TEXT)")
+
+    random.seed(42)
+    genes = [f"GENE{i}" for i in range(200)] + ["CFTR", "CFTR-AS1"] + [None] * 50
+    conn.executemany(
+        "INSERT INTO annotations VALUES (?,?)",
+        ((i, random.choice(genes)) for i in range(10_000)),
+    )
+
+    # Former implementation: python call for each row
+    conn.create_function(
+        "NAIVE_REGEXP", 2, lambda expr, item: re.search(expr, str(item)) is not None
+    )
+
+    for pattern in ("^CFTR.*", "GENE1[0-9]+5$", "^[A-Z]+$"):
+        naive = conn.execute(
+            "SELECT COUNT(*) FROM annotations WHERE gene IS NOT NULL AND NAIVE_REGEXP(?, gene)",
+            (pattern,),
+        ).fetchone()[0]
+
+        params = []
+        where = querybuilder.condition_to_sql({"ann.gene": {"$regex": pattern}}, params=params)
+        where = where.replace("`annotations`.", "")
+        observed = conn.execute(f"SELECT COUNT(*) FROM annotations WHERE {where}", params)
+        assert observed.fetchone()[0] == naive
@@ -1,5 +1,14 @@
 from pprint import pprint
-from cutevariant.core.vql import parse_one_vql
+
+import pytest
+import textx
+
+from cutevariant.core.vql import (
+    parse_one_vql,
+    parse_select_fast,
+    get_metamodel,
+    VQLSyntaxError,
+)
 
 # Test valid VQL cases
 VQL_TO_TREE_CASES = {
@@ -135,6 +144,12 @@
         "operator": "|",
         "target": "denovo",
     },
+    # Test 12 bis
+    "CREATE denovo = (A | B) & C - (D - E)": {
+        "cmd": "set_cmd",
+        "target": "denovo",
+        "expression": ("-", ("&", ("|", "A", "B"), "C"), ("-", "D", "E")),
+    },
     # Test 13
     'CREATE subset FROM variants INTERSECT "/home/sacha/test.bed"': {
         "cmd": "bed_cmd",
@@ -195,6 +210,14 @@
         "source": "variants",
         "order_by": [],
     },
+    # Test 21 Test COUNT
+    "SELECT chr,pos,ref,alt FROM variants WHERE samples[COUNT >= 2].gt = 1": {
+        "cmd": "select_cmd",
+        "fields": ["chr", "pos", "ref", "alt"],
+        "filters": {"$and": [{"samples.$count>=2.gt": {"$eq": 1.0}}]},
+        "source": "variants",
+        "order_by": [],
+    },
 }
 
 
@@ -216,3 +239,63 @@ def test_function():
 # generate all test cases
 for idx, (vql, expected) in enumerate(VQL_TO_TREE_CASES.items(), start=1):
     globals()[f"test_vql_{idx}"] = template_test_case(vql, expected)
+
+
+FAST_PARSER_CASES = list(VQL_TO_TREE_CASES) + [
+    "select chr from variants where a = null or b = 'NULL'",
+    "select chr from variants where a = 1 or b = 2 and c = 3",
+    "select chr from variants order by chr desc, pos asc, ref",
+    "SELECT chr FROM variants WHERE a = 1 ANDb = 2",
+    "SELECT chr FROM variants WHERE (a = 1 OR (b=2.5e3 AND c != -3)) AND d=.5",
+    "SELECT chr,pos FROM variants WHERE a !has 'x' and b !in (1, 'a\\'b', true)",
+    "SELECT chr FROM variants WHERE a = \"x\\\"y\" ORDER BY chr",
+    "SELECT chr FROM variants WHERE a = 1 ORDER BY pos DESC",
+    "SELECT chr FROM variants WHERE ann.gene =~ '^CF' Or ann.gene In ('GJB2')",
+    "SELECT chr FROM variants WHERE a = TRUE",
+    "SELECT chr FROM variants WHERE a = 1 AND",
+    "SELECT chr, FROM variants",
+    "SELECT chr FROM variants WHERE a = 1a",
+    "SELECT chr FROM variants WHERE a = 1 ORDER  BY chr",
+    "SELECT chr FROM variants WHERE samples['boby'].gt = 1",
+    "SELECT chr FROM variants WHERE a IN WORDSET['boby']",
+    "SELECT chr FROM variants WHERE a IN ((1))",
+    "SELECT chr FROM variants; COUNT FROM variants",
+    "SELECT chr FROM variants # comment",
+]
+
+
+def _typed(obj):
+    """Return a representation of obj which distinguishes 1, 1.0 and True"""
+    if isinstance(obj, dict):
+        return {k: _typed(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_typed(i) for i in obj)
+    return (type(obj).__name__, obj)
+
+
+def test_fast_parser():
+    """The fast parser returns the same object as textX, or gives up"""
+    for raw_vql in FAST_PARSER_CASES:
+        fast = parse_select_fast(raw_vql)
+        try:
+            expected = [i.value for i in get_metamodel().model_from_str(raw_vql).commands]
+        except textx.exceptions.TextXSyntaxError:
+            expected = None
+
+        if fast is not None:
+            assert [_typed(fast)] == _typed(expected), raw_vql
+
+    assert parse_select_fast("SELECT chr FROM variants WHERE pos > 3") is not None
+    assert parse_select_fast("SELECT samples['boby'].gt FROM variants") is None
+
+
+def test_parse_vql_cache():
+    raw_vql = "SELECT chr,pos FROM variants WHERE pos > 3"
+    first = parse_one_vql(raw_vql)
+    first["filters"]["$and"].clear()
+
+    # Cached objects are not modified by the callers
+    assert parse_one_vql(raw_vql)["filters"] == {"$and": [{"pos": {"$gt": 3.0}}]}
+
+    with pytest.raises(VQLSyntaxError):
+        parse_one_vql("chr FROM variants")
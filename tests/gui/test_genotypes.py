@@ -0,0 +1,21 @@
+from cutevariant.core import sql
+from cutevariant.gui.plugins.genotypes.widgets import GenotypesWidget
+
+from tests import utils
+
+
+def test_genotypes_without_selected_samples(qtbot, file_conn):
+    mainwindow = utils.create_mainwindow()
+    mainwindow.set_state_data("samples", [])
+
+    widget = GenotypesWidget()
+    qtbot.addWidget(widget)
+    widget.mainwindow = mainwindow
+    widget.on_open_project(file_conn)
+
+    # The genotypes of all the samples are shown
+    with qtbot.waitSignal(widget.model.load_finished, timeout=5000):
+        widget.on_refresh()
+    expected = [genotype["name"] for genotype in sql.get_genotypes(file_conn, 1)]
+    names = [widget.model.get_genotype(row)["name"] for row in range(widget.model.rowCount())]
+    assert names == expected
@@ -0,0 +1,81 @@
+import threading
+
+from cutevariant.core import sql
+from cutevariant.core.sql_progress import QueryCancelled
+from cutevariant.gui.sql_executor import SqlExecutor
+
+
+def test_submit(qtbot, file_conn):
+    executor = SqlExecutor()
+    results = []
+    main_thread = threading.current_thread()
+
+    def callback(result):
+        # Callbacks are called in the GUI thread
+        assert threading.current_thread() is main_thread
+        results.append(result)
+
+    with qtbot.waitCallback() as finished:
+        executor.submit(
+            file_conn,
+            sql.get_variants_count,
+            callback,
+            finished_callback=finished,
+            query_class="count",
+        )
+
+    assert results == [11]
+    assert executor.running_count() == 0
+
+
+def test_plugin_limit(qtbot, file_conn):
+    executor = SqlExecutor(thread_count=4, plugin_limits={"default": 1})
+    release = threading.Event()
+    order = []
+
+    def task(name):
+        def function(file_conn):
+            release.wait()
+            order.append(name)
+
+        return function
+
+    executor.submit(file_conn, task("busy"), plugin="stats")
+    for name, query_class in (("stats", "stats"), ("count", "count")):
+        executor.submit(file_conn, task(name), plugin="stats", query_class=query_class)
+
+    # The other plugins are not limited by the busy one
+    with qtbot.waitCallback() as other:
+        executor.submit(file_conn, lambda file_conn: None, other, plugin="genotypes")
+
+    assert executor.running_count("stats") == 1
+    assert executor.pending_count("stats") == 2
+
+    release.set()
+    qtbot.waitUntil(lambda: len(order) == 3)
+    executor.wait()
+
+    # Waiting tasks are started by priority
+    assert order == ["busy", "count", "stats"]
+
+
+def test_cancel(qtbot, file_conn):
+    executor = SqlExecutor(plugin_limits={"default": 1})
+    release = threading.Event()
+    errors = []
+    calls = []
+
+    executor.submit(file_conn, lambda file_conn: release.wait(), plugin="stats")
+    token = executor.submit(
+        file_conn, lambda file_conn: calls.append(1), error_callback=errors.append, plugin="stats"
+    )
+    token.cancel()
+    assert token.cancelled
+
+    release.set()
+    qtbot.waitUntil(lambda: len(errors) == 1)
+
+    # A task cancelled before its start is never executed
+    assert not calls
+    assert isinstance(errors[0], QueryCancelled)
+    assert token.is_done()
@@ -64,9 +64,11 @@ def slow_query(conn):
         )
 
     thread = SqlThread(conn, slow_query)
-    with qtbot.waitSignal(thread.error, timeout=2000):
+    with qtbot.waitSignal(thread.cancelled, timeout=2000):
         thread.start()
         time.sleep(1)
         thread.interrupt()
 
-    assert "interrupted" in thread.last_error
+    assert thread.last_error is None
+    assert thread.results is None
+    assert not thread.isRunning()
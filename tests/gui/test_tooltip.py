@@ -0,0 +1,75 @@
+from PySide6.QtGui import QStandardItem, QStandardItemModel
+from PySide6.QtWidgets import QTableView, QToolTip
+
+from cutevariant.core import sql
+from cutevariant.gui import tooltip
+from cutevariant import commons as cm
+
+
+def test_load_tooltip_data(file_conn):
+    samples = [sample["name"] for sample in sql.get_samples(file_conn)]
+    variant_ids = [1, 2]
+
+    data = tooltip.load_tooltip_data(file_conn, variant_ids, samples)
+
+    for variant_id in variant_ids:
+        assert data["variants"][variant_id] == {
+            k: v
+            for k, v in sql.get_variant(file_conn, variant_id).items()
+            if k not in ("annotations", "samples")
+        }
+        assert data["variant_names"][variant_id] == cm.find_variant_name(file_conn, variant_id)
+
+        fields = tooltip.get_sample_fields(file_conn)
+        for genotype in sql.get_genotypes(file_conn, variant_id, fields, samples):
+            assert data["genotypes"][(variant_id, genotype["name"])] == genotype
+
+    assert set(data["samples"]) == {sample["id"] for sample in sql.get_samples(file_conn)}
+
+
+def test_service(qtbot, file_conn):
+    service = tooltip.TooltipDataService()
+    sample = next(sql.get_samples(file_conn))["name"]
+
+    # Hovered before prefetch: placeholder, then loaded in the background
+    assert service.genotype(file_conn, 1, sample) is None
+    qtbot.waitUntil(lambda: (1, sample) in service.genotypes)
+
+    with qtbot.waitSignal(service.data_loaded):
+        service.prefetch(file_conn, [2, 3], [sample])
+    assert service.variant(file_conn, 3)["id"] == 3
+    assert service.variant_name(file_conn, 2) == cm.find_variant_name(file_conn, 2)
+
+    # Nothing to load
+    service.prefetch(file_conn, [2, 3], [sample])
+    assert not service._loading
+
+    # The cache is dropped when the database changes
+    sql.update_variant(file_conn, {"id": 1, "classification": 2})
+    assert service.variant(file_conn, 1) is None
+
+
+def test_refresh_loading_tooltip(qtbot):
+    model = QStandardItemModel(2, 2)
+    item = QStandardItem("cell")
+    item.setToolTip(tooltip.LOADING_TEXT)
+    model.setItem(1, 1, item)
+    view = QTableView()
+    view.setModel(model)
+    qtbot.addWidget(view)
+    view.show()
+    qtbot.waitExposed(view)
+
+    # The placeholder of the hovered cell is replaced when the data is loaded
+    pos = view.viewport().mapToGlobal(view.visualRect(model.index(1, 1)).center())
+    QToolTip.showText(pos, tooltip.LOADING_TEXT, view.viewport())
+    item.setToolTip("loaded")
+    tooltip.refresh_loading_tooltip(view, pos)
+    assert QToolTip.text() == "loaded"
+
+    # Other tooltips are kept
+    QToolTip.showText(pos, "other", view.viewport())
+    item.setToolTip("changed")
+    tooltip.refresh_loading_tooltip(view, pos)
+    assert QToolTip.text() == "other"
+    QToolTip.hideText()
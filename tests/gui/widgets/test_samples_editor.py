@@ -19,6 +19,25 @@ def test_model(qtmodeltester):
     qtmodeltester.check(model)
 
 
+def test_model_pages(qtmodeltester, monkeypatch):
+    conn = utils.create_conn()
+    sample_count = conn.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+    monkeypatch.setattr(SamplesEditorModel, "PAGE_SIZE", 1)
+    model = SamplesEditorModel(conn)
+
+    # Samples are fetched page by page
+    model.load()
+    assert model.rowCount() == 1
+    while model.canFetchMore():
+        model.fetchMore()
+    assert model.rowCount() == sample_count
+    assert [model.get_sample(row)["id"] for row in range(sample_count)] == sorted(
+        row[0] for row in conn.execute("SELECT id FROM samples")
+    )
+
+    qtmodeltester.check(model)
+
+
 def test_widget(qtbot):
     conn = utils.create_conn()
 
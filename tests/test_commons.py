@@ -13,6 +13,15 @@ def test_bytes_to_readable():
     assert cm.bytes_to_readable(1_099_511_627_776) == "1.0TB"
 
 
+def test_deep_getsizeof():
+
+    values = ["x" * 1000, "y" * 1000]
+    assert cm.deep_getsizeof(values) > 2000
+    # Shared objects are counted once
+    assert cm.deep_getsizeof([values, values]) < cm.deep_getsizeof(values) + 100
+    assert cm.deep_getsizeof({"a": values}) > cm.deep_getsizeof(values)
+
+
 def test_snake_to_camel():
 
     assert cm.snake_to_camel("query_view") == "QueryView"
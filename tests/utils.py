@@ -12,6 +12,7 @@ def __init__(self):
             "current_variant": {"id": 1},
             "executed_query_data": {"count": 100, "elapsed_time": 3.0},
             "samples": ["TUMOR"],
+            "page_variant_ids": [1],
             "order_by": [],
             "order_asc": True,
         }
@@ -66,3 +67,16 @@ def create_conn(file_name=None, annotation_parser=None):
     conn = sql.get_sql_connection(":memory:")
     sql.import_reader(conn, VcfReader(file_name, annotation_parser))
     return conn
+
+
+def create_file_conn(path, file_name=None, annotation_parser=None):
+    """Like create_conn, but the project is stored in the file at path
+
+    Use it when the tested code opens the database file itself (threads, workers).
+    """
+    if not file_name:
+        file_name = "examples/test.snpeff.vcf"
+        annotation_parser = "snpeff"
+    conn = sql.get_sql_connection(str(path))
+    sql.import_reader(conn, VcfReader(file_name, annotation_parser))
+    return conn